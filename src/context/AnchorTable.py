@@ -0,0 +1,139 @@
+import logging
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from fontTools.feaLib.variableScalar import VariableScalar
+
+if TYPE_CHECKING:
+    from .Font import Font
+    from .Layer import Layer
+
+log = logging.getLogger(__name__)
+
+
+class MissingAnchor(NamedTuple):
+    """An anchor (or a whole layer, if ``anchor`` is ``None``) which is
+    present on the default master but missing from another master."""
+
+    glyph: str
+    anchor: Optional[str]
+    master: str
+
+    def __str__(self):
+        if self.anchor is None:
+            return f"Glyph {self.glyph} has no layer in master {self.master}"
+        return f"Anchor {self.anchor} not found on glyph {self.glyph} in master {self.master}"
+
+
+class AnchorTable:
+    """The positions of every anchor of every glyph in every master.
+
+    The anchors defined on each glyph's default master layer are collected
+    once into a ``(masters, anchors, 2)`` coordinate array, with missing
+    values left as NaN. Variable anchors and compatibility problems are
+    then produced from that array instead of by looking up each glyph's
+    layers again for each anchor."""
+
+    def __init__(self, font: "Font"):
+        self.font = font
+        self.masters = list(font.masters)
+        default_index = self.masters.index(font.default_master)
+
+        layers = font._layers_by_master()
+        # Anchor names and glyph names of each column, in the order the
+        # ``Font._all_anchors`` dictionary is built.
+        self.entries: List[Tuple[str, str]] = []
+        for g in sorted(font.glyphs.keys()):
+            default_layer = layers[default_index].get(g)
+            if default_layer is None:
+                continue
+            has_mark = None
+            for a in _anchors_dict(default_layer).keys():
+                if a[0] == "_":
+                    if has_mark:
+                        log.warning(
+                            "Glyph %s tried to be in two mark classes (%s, %s). The first one will win.",
+                            g,
+                            has_mark,
+                            a,
+                        )
+                        continue
+                    has_mark = a
+                self.entries.append((g, a))
+
+        self.coordinates = np.full((len(self.masters), len(self.entries), 2), np.nan)
+        self.missing: List[MissingAnchor] = []
+        for mix, master in enumerate(self.masters):
+            master_layers = layers[mix]
+            current_glyph, anchors = None, None
+            for ix, (g, a) in enumerate(self.entries):
+                if g != current_glyph:
+                    current_glyph = g
+                    layer = master_layers.get(g)
+                    anchors = _anchors_dict(layer) if layer is not None else None
+                    if layer is None and not master.sparse:
+                        self.missing.append(
+                            MissingAnchor(g, None, master.name.get_default())
+                        )
+                if anchors is None:
+                    continue
+                anchor = anchors.get(a)
+                if anchor is None:
+                    self.missing.append(MissingAnchor(g, a, master.name.get_default()))
+                    continue
+                self.coordinates[mix, ix] = (anchor.x, anchor.y)
+
+        self.present = ~np.isnan(self.coordinates[:, :, 0])
+        # Master locations are in designspace; feature variations expect
+        # userspace locations
+        self.locations = [font.map_backward(m.location) for m in self.masters]
+
+    @property
+    def compatible(self) -> bool:
+        return not self.missing
+
+    def variable_anchors(
+        self,
+    ) -> Dict[str, Dict[str, Tuple[VariableScalar, VariableScalar]]]:
+        """Return a dictionary mapping anchor names to a dictionary of glyph
+        names to `(x, y)` tuples of `VariableScalar` objects, as used by
+        ``Font._all_anchors``. Masters which lack the anchor are skipped."""
+        result = {}
+        coordinates = self.coordinates.tolist()
+        present = self.present.T.tolist()
+        axes = self.font.axes
+        for ix, (g, a) in enumerate(self.entries):
+            x_vs = VariableScalar()
+            x_vs.axes = axes
+            y_vs = VariableScalar()
+            y_vs.axes = axes
+            for mix, here in enumerate(present[ix]):
+                if not here:
+                    continue
+                x, y = coordinates[mix][ix]
+                x_vs.add_value(self.locations[mix], _number(x))
+                y_vs.add_value(self.locations[mix], _number(y))
+            result.setdefault(a, {})[g] = (x_vs, y_vs)
+        return result
+
+    def static_anchors(self, master) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """Return the anchors of one master in the same form as
+        `variable_anchors`, but with plain ``(x, y)`` numbers. Anchors the
+        master lacks are left out."""
+        mix = self.masters.index(master)
+        coordinates = self.coordinates[mix].tolist()
+        present = self.present[mix].tolist()
+        result = {}
+        for ix, (g, a) in enumerate(self.entries):
+            if present[ix]:
+                x, y = coordinates[ix]
+                result.setdefault(a, {})[g] = (_number(x), _number(y))
+        return result
+
+
+def _anchors_dict(layer: "Layer"):
+    return {a.name: a for a in layer.anchors}
+
+
+def _number(value: float):
+    return int(value) if value.is_integer() else value
@@ -1,13 +1,76 @@
+from bisect import bisect_left
 from typing import List, Optional, Tuple
-from .BaseObject import BaseObject, I18NDictionary, Number
+from .BaseObject import DIRTY_FILE_SAVING, BaseObject, I18NDictionary, Number
 from dataclasses import dataclass, field
 import uuid
-from fontTools.varLib.models import normalizeValue, piecewiseLinearMap
-
+import numpy as np
+from fontTools.varLib.models import normalizeValue
 
 Tag = str
 
 
+class AxisMap:
+    """A piecewise-linear mapping compiled into sorted arrays.
+
+    Behaves like `fontTools.varLib.models.piecewiseLinearMap`: values
+    between two points are interpolated, and values outside the mapping
+    are shifted by the offset of the nearest end point."""
+
+    def __init__(self, mapping: List[Tuple[Number, Number]]):
+        pairs = sorted(dict(mapping).items())
+        self.keys = [k for k, _ in pairs]
+        self.values = [v for _, v in pairs]
+        self._keys_array = np.array(self.keys, dtype=float)
+        self._values_array = np.array(self.values, dtype=float)
+
+    def __call__(self, v: Number) -> Number:
+        keys, values = self.keys, self.values
+        if not keys:
+            return v
+        i = bisect_left(keys, v)
+        if i < len(keys) and keys[i] == v:
+            return values[i]
+        if i == 0:
+            return v + values[0] - keys[0]
+        if i == len(keys):
+            return v + values[-1] - keys[-1]
+        a, b = keys[i - 1], keys[i]
+        va, vb = values[i - 1], values[i]
+        return va + (vb - va) * (v - a) / (b - a)
+
+    def map_array(self, v) -> np.ndarray:
+        """Map an array of values at once."""
+        v = np.asarray(v, dtype=float)
+        if not self.keys:
+            return v.copy()
+        keys, values = self._keys_array, self._values_array
+        return np.where(
+            v < keys[0],
+            v + (values[0] - keys[0]),
+            np.where(
+                v > keys[-1], v + (values[-1] - keys[-1]), np.interp(v, keys, values)
+            ),
+        )
+
+
+class _CompiledAxis:
+    def __init__(self, axis: "Axis"):
+        self.forward = AxisMap(axis.map or [])
+        self.backward = AxisMap([(v, k) for k, v in (axis.map or [])])
+        if axis.min is None or axis.default is None or axis.max is None:
+            self.triple = None
+        else:
+            self.triple = (
+                self.forward(axis.min),
+                self.forward(axis.default),
+                self.forward(axis.max),
+            )
+
+
+# The fields which the compiled mapping of an axis is built from
+_COMPILED_FROM = frozenset(("map", "min", "default", "max"))
+
+
 @dataclass
 class _AxisFields:
     name: I18NDictionary = field(
@@ -17,12 +80,10 @@ class _AxisFields:
     id: str = field(
         default_factory=lambda: str(uuid.uuid1()),
         repr=False,
-        metadata={
-            "description": """An ID used to refer to this axis in the Master,
+        metadata={"description": """An ID used to refer to this axis in the Master,
 Layer and Instance `location` fields. (This is allows the user to change the
 axis tag without the locations becoming lost.) If not provided, one will be
-automatically generated on import from a UUID."""
-        },
+automatically generated on import from a UUID."""},
     )
     min: int = field(
         default=None,
@@ -66,6 +127,7 @@ class Axis(BaseObject, _AxisFields):
     """Represents an axis in a multiple master or variable font."""
 
     _write_one_line = True
+    _compiled_axis = None
 
     def __post_init__(self):
         # If they smacked my name with a bare string, replace with I18NDict
@@ -73,17 +135,59 @@ class Axis(BaseObject, _AxisFields):
             self.name = I18NDictionary.with_default(self.name)
         super().__post_init__()
 
+    def __setattr__(self, name, value):
+        if name in _COMPILED_FROM:
+            object.__setattr__(self, "_compiled_axis", None)
+        super().__setattr__(name, value)
+
+    def mark_dirty(self, context=DIRTY_FILE_SAVING, field_name=None, propagate=True):
+        # Changing the map in place must be followed by marking the axis
+        # dirty, as for any other object
+        object.__setattr__(self, "_compiled_axis", None)
+        super().mark_dirty(context, field_name, propagate)
+
+    @property
+    def _compiled(self) -> _CompiledAxis:
+        # The mapping and the designspace extent of the axis, rebuilt
+        # whenever one of the fields it depends on is assigned.
+        compiled = self._compiled_axis
+        if compiled is None:
+            compiled = _CompiledAxis(self)
+            object.__setattr__(self, "_compiled_axis", compiled)
+        return compiled
+
     def normalize_value(self, value: Number) -> float:
         """Return a normalized co-ordinate (-1.0 to 1.0) for the given value.
         The value provided is expected to be in userspace coordinates."""
-        return normalizeValue(
-            self.userspace_to_designspace(value),
-            (
-                self.userspace_to_designspace(self.min),
-                self.userspace_to_designspace(self.default),
-                self.userspace_to_designspace(self.max),
-            ),
-        )
+        return self.normalize_designspace_value(self.map_forward(value))
+
+    def normalize_designspace_value(self, value: Number) -> float:
+        """Return a normalized co-ordinate (-1.0 to 1.0) for the given value.
+        The value provided is expected to be in designspace coordinates."""
+        return normalizeValue(value, self._designspace_triple())
+
+    def normalize_array(self, values, designspace: bool = False) -> np.ndarray:
+        """Normalize an array of coordinates at once. The values are expected
+        to be in userspace coordinates unless ``designspace`` is true."""
+        v = np.asarray(values, dtype=float)
+        if not designspace:
+            v = self.map_forward_array(v)
+        lower, default, upper = self._designspace_triple()
+        v = np.clip(v, lower, upper)
+        below = (v - default) / (default - lower) if default != lower else 0.0
+        above = (v - default) / (upper - default) if upper != default else 0.0
+        return np.where(v < default, below, np.where(v > default, above, 0.0))
+
+    def _designspace_triple(self) -> Tuple[Number, Number, Number]:
+        triple = self._compiled.triple
+        if triple is None:
+            # Let normalizeValue complain about the missing values
+            triple = (
+                self.map_forward(self.min),
+                self.map_forward(self.default),
+                self.map_forward(self.max),
+            )
+        return triple
 
     def denormalize_value(self, value: float) -> Number:
         """Return a userspace coordinate for the given normalized value."""
@@ -133,13 +237,21 @@ class Axis(BaseObject, _AxisFields):
         """Map a location on this axis from userspace to designspace."""
         if not self.map:
             return v
-        return piecewiseLinearMap(v, dict(self.map))
+        return self._compiled.forward(v)
 
     def map_backward(self, v: Number) -> Number:
         """Map a location on this axis from designspace to userspace."""
         if not self.map:
             return v
-        return piecewiseLinearMap(v, {v: k for k, v in self.map})
+        return self._compiled.backward(v)
+
+    def map_forward_array(self, values) -> np.ndarray:
+        """Map an array of locations on this axis from userspace to designspace."""
+        return self._compiled.forward.map_array(values)
+
+    def map_backward_array(self, values) -> np.ndarray:
+        """Map an array of locations on this axis from designspace to userspace."""
+        return self._compiled.backward.map_array(values)
 
     # These are just better names
     def userspace_to_designspace(self, v: Number) -> Number:
@@ -5,6 +5,8 @@ from collections import namedtuple
 import datetime
 import weakref
 
+from . import stats
+
 
 class IncompatibleMastersError(ValueError):
     pass
@@ -135,6 +137,8 @@ is exported not as `_formatspecific` but as a simple underscore (`_`).
             field_name: Optional specific field that changed
             propagate: Whether to propagate dirty flag to parent
         """
+        if stats.enabled:
+            stats.count("mark_dirty")
         if self._dirty_flags is None:
             object.__setattr__(self, "_dirty_flags", {})
         self._dirty_flags[context] = True
@@ -149,6 +153,8 @@ is exported not as `_formatspecific` but as a simple underscore (`_`).
         if propagate:
             parent = self._get_parent()
             if parent is not None:
+                if stats.enabled:
+                    stats.count("mark_dirty.parent_hops")
                 parent.mark_dirty(context, propagate=True)
 
     def mark_clean(self, context=DIRTY_FILE_SAVING, recursive=False):
@@ -225,6 +231,7 @@ is exported not as `_formatspecific` but as a simple underscore (`_`).
                 # Mark dirty for all standard contexts
                 self.mark_dirty(DIRTY_FILE_SAVING, field_name=name, propagate=True)
                 self.mark_dirty(DIRTY_CANVAS_RENDER, field_name=name, propagate=True)
+                self.mark_dirty(DIRTY_COMPILE, field_name=name, propagate=True)
             else:
                 object.__setattr__(self, name, value)
         else:
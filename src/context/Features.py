@@ -1,8 +1,16 @@
+import hashlib
 import re
+from copy import deepcopy
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from fontTools.feaLib import ast
+from fontTools.feaLib.location import FeatureLibLocation
+from fontTools.feaLib.parser import SymbolTable
+from fontTools.misc.visitor import Visitor
 
 from .BaseObject import BaseObject
+from . import stats
 
 if TYPE_CHECKING:
     from context.Font import Font
@@ -10,6 +18,20 @@ if TYPE_CHECKING:
 PREFIX_MARKER = "# Prefix: "
 PREFIX_RE = re.compile(r"# Prefix: (.*)")
 
+# Characters which matter when splitting feature code. Semicolons only
+# end statements outside of blocks; inside a block only braces matter, and
+# everything up to the next one, comments and strings included, is
+# skipped in one match.
+_TOPLEVEL_TOKEN_RE = re.compile(r'[#"{};]')
+_BLOCK_SKIP_RE = re.compile(r'(?:[^#"{}]+|#[^\n]*|"[^"]*"?)*')
+# Whitespace, comments and include statements between top-level statements
+_SKIP_RE = re.compile(r"(?:\s+|#[^\n]*|include\s*\([^)]*\)[ \t]*;?)*")
+_COMMENT_RE = re.compile(r"#[^\n]*")
+_BLOCK_END_RE = re.compile(r"[ \t]*[\w.]*[ \t]*;?")
+_LINE_END_RE = re.compile(r"[ \t]*(?:\n|\Z)")
+_FEATURE_HEAD_RE = re.compile(r"feature\s+(\w+)\s*\Z")
+_CLASS_RE = re.compile(r"@([\w.\-]+)\s*=\s*\[(.*)\]\s*;\Z", re.S)
+
 
 @dataclass
 class Features(BaseObject):
@@ -39,68 +61,20 @@ class Features(BaseObject):
 
     @classmethod
     def from_fea(cls, fea: str, glyphNames=()) -> "Features":
-        """Load features from a .fea file."""
-        features = Features()
-        currentPrefix = "anonymous"
-
-        lines = fea.split("\n")
-        i = 0
-
-        while i < len(lines):
-            line = lines[i].strip()
-
-            # Handle glyph class definitions
-            if line.startswith("@") and "=" in line:
-                match = re.match(r"@(\w+)\s*=\s*\[(.*?)\];?", line)
-                if match:
-                    class_name = match.group(1)
-                    class_content = match.group(2).strip()
-                    features.classes[class_name] = class_content.split()
-                i += 1
-                continue
-
-            # Handle prefix markers
-            if line.startswith("# Prefix:"):
-                match = re.match(PREFIX_RE, line)
-                if match:
-                    currentPrefix = match.group(1)
-                i += 1
-                continue
-
-            # Handle feature blocks
-            if line.startswith("feature "):
-                match = re.match(r"feature\s+(\w+)\s*\{", line)
-                if match:
-                    feature_name = match.group(1)
-                    feature_code = ""
-                    i += 1
-
-                    # Collect lines until we find the closing brace
-                    brace_count = 1
-                    while i < len(lines) and brace_count > 0:
-                        curr_line = lines[i]
-                        brace_count += curr_line.count("{") - curr_line.count("}")
-
-                        if brace_count > 0:
-                            feature_code += curr_line + "\n"
-                        i += 1
-
-                    features.features.append((feature_name, feature_code.rstrip()))
-                    continue
-
-            # Everything else goes into prefixes
-            if line:  # Skip empty lines
-                if currentPrefix not in features.prefixes:
-                    features.prefixes[currentPrefix] = ""
-                features.prefixes[currentPrefix] += lines[i] + "\n"
+        """Load features from a .fea file.
 
-            i += 1
-
-        # Clean up trailing newlines in prefixes
-        for prefix in features.prefixes:
-            features.prefixes[prefix] = features.prefixes[prefix].rstrip("\n")
-
-        return features
+        Top-level glyph class definitions become ``classes``, feature blocks
+        become ``features`` and everything else is kept verbatim as prefix
+        code, split into named prefixes by ``# Prefix:`` comments. The code
+        is split in a single pass; braces and semicolons inside comments
+        and strings are ignored."""
+        splitter = _FeaSplitter(fea)
+        splitter.split()
+        return Features(
+            classes=splitter.classes,
+            prefixes=splitter.prefixes(),
+            features=splitter.features,
+        )
 
     def to_fea(self) -> str:
         """Dump features to a .fea file."""
@@ -115,43 +89,552 @@ class Features(BaseObject):
             fea += f"feature {name} {{\n{code}\n}} {name};\n"
         return fea
 
-    def as_ast(self, font: "Font") -> Dict[str, Any]:
-        from io import StringIO
-        from fontTools.feaLib import ast
-        from fontTools.feaLib.parser import Parser, SymbolTable
+    def __post_init__(self):
+        super().__post_init__()
+        self._ast_cache = {}
+        self._class_definitions_cache = None
+        self._references_cache = None
 
-        rv = {
-            "prefixes": {},
-            "features": [],
-        }
-        glyphnames = font.glyphs.keys()
-        lookups = SymbolTable()
-        glyphclasses = SymbolTable()
-        for name, glyphs in self.classes.items():
-            glyphcls = ast.GlyphClass(glyphs=[ast.GlyphName(g) for g in glyphs])
-            glyphclass = ast.GlyphClassDefinition(name, glyphcls)
-            glyphclasses.define(name, glyphclass)
+    def _class_definitions(self):
+        """Glyph class definitions for ``self.classes``, rebuilt only when
+        the classes change."""
+        key = _digest(repr(list(self.classes.items())))
+        cached = self._class_definitions_cache
+        if cached is None or cached[0] != key:
+            definitions = {}
+            for name, glyphs in self.classes.items():
+                # Glyph names are kept as strings, as the parser does
+                glyphcls = ast.GlyphClass()
+                for glyph in glyphs:
+                    if glyph.startswith("@") and glyph[1:] in definitions:
+                        glyphcls.add_class(ast.GlyphClassName(definitions[glyph[1:]]))
+                    else:
+                        glyphcls.append(glyph)
+                definitions[name] = ast.GlyphClassDefinition(name, glyphcls)
+            cached = (key, definitions)
+            self._class_definitions_cache = cached
+        return cached
 
+    def _blocks(self):
         for prefix, code in self.prefixes.items():
-            parser = Parser(StringIO(code), followIncludes=False, glyphNames=glyphnames)
-            parser.lookups_ = lookups
-            parser.glyphclasses_ = glyphclasses
-            try:
-                file = parser.parse()
-            except Exception as e:
-                raise ValueError(f"Error parsing feature code: {e}\n\nCode was: {code}")
-            rv["prefixes"][prefix] = file
-
+            yield "prefix", prefix, code
         for name, code in self.features:
             if name is not None and not code.startswith("feature " + name):
                 code = f"feature {name} {{\n{code}\n}} {name};"
-            parser = Parser(StringIO(code), followIncludes=False, glyphNames=glyphnames)
-            parser.lookups_ = lookups
-            parser.glyphclasses_ = glyphclasses
-            try:
-                file = parser.parse()
-            except Exception as e:
-                raise ValueError(f"Error parsing feature code: {e}\n\nCode was: {code}")
-            rv["features"].append((name, file))
+            yield "feature", name, code
+
+    def as_ast(self, font: "Font", readonly: bool = False) -> Dict[str, Any]:
+        """Parse the feature code into `fontTools.feaLib` ASTs.
 
+        Returns a dictionary with a ``prefixes`` dictionary and a ``features``
+        list of ``(tag, FeatureFile)`` tuples. Parsed blocks are cached by
+        the hash of their code, the code before them and the font's glyph
+        set, so only blocks which have changed since the last call are
+        parsed again.
+
+        If ``readonly`` is true, the cached ASTs themselves are returned and
+        must not be modified. Otherwise the caller gets a copy of them,
+        which it may change, and the cache is kept for later calls."""
+        entries = self._parse(font)
+        asts = [entry.ast for entry in entries]
+        if not readonly:
+            # Copied together, so that a block referring to the lookups or
+            # classes of another still refers to them in the copy
+            asts = _copy_ast(asts, {})
+
+        rv = {
+            "prefixes": {},
+            "features": [],
+        }
+        for entry, file in zip(entries, asts):
+            if entry.kind == "prefix":
+                rv["prefixes"][entry.name] = file
+            else:
+                rv["features"].append((entry.name, file))
         return rv
+
+    def _parse(self, font: "Font") -> List["_ParsedBlock"]:
+        """Parse each prefix and feature block, reusing cached blocks."""
+        from io import StringIO
+        from fontTools.feaLib.parser import Parser
+
+        classes_key, class_definitions = self._class_definitions()
+        key = _digest("%s:%s" % (font.glyphs.version, classes_key))
+        cache = self._ast_cache
+        entries = []
+        parser_state = None
+        for kind, name, code in self._blocks():
+            key = _digest("%s:%s:%s:%s" % (key, kind, name, code))
+            entry = cache.get(key) if parser_state is None else None
+            if stats.enabled:
+                stats.count(
+                    "features.blocks_reused"
+                    if entry is not None
+                    else "features.blocks_parsed"
+                )
+            if entry is None:
+                if parser_state is None:
+                    parser_state = _ParserState(
+                        set(font.glyphs.keys()), class_definitions, entries
+                    )
+                parser = Parser(StringIO(code), followIncludes=False)
+                parser.glyphNames_ = parser_state.glyphnames
+                parser.lookups_ = parser_state.lookups
+                parser.glyphclasses_ = parser_state.glyphclasses
+                parser_state.start_block()
+                try:
+                    file = parser.parse()
+                except Exception as e:
+                    raise ValueError(
+                        f"Error parsing feature code: {e}\n\nCode was: {code}"
+                    )
+                entry = parser_state.end_block(key, kind, name, file)
+            entries.append(entry)
+
+        self._ast_cache = {entry.key: entry for entry in entries}
+        return entries
+
+    def glyph_references(self, font: "Font") -> "GlyphReferenceIndex":
+        """Return an index from glyph names to the classes, prefixes and
+        features which reference them.
+
+        The glyphs referenced by each block are remembered alongside its
+        cached AST, so only blocks which have changed since the last call
+        are visited again."""
+        entries = self._parse(font)
+        key = (self._class_definitions()[0], tuple(entry.key for entry in entries))
+        cached = self._references_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        index = GlyphReferenceIndex()
+        for ix, (name, glyphs) in enumerate(self.classes.items()):
+            used = {("class", g[1:]) for g in glyphs if g.startswith("@")}
+            index.add(
+                GlyphReference("class", name, ix),
+                [g for g in glyphs if not g.startswith("@")],
+                used,
+                [("class", name)],
+            )
+        counts = {"prefix": 0, "feature": 0}
+        for entry in entries:
+            if entry.references is None:
+                visitor = FeaAppearsVisitor()
+                visitor.visit(entry.ast)
+                entry.references = visitor
+            reference = GlyphReference(entry.kind, entry.name, counts[entry.kind])
+            counts[entry.kind] += 1
+            index.add(
+                reference,
+                entry.references.appearances,
+                entry.references.used,
+                entry.references.defined,
+            )
+
+        self._references_cache = (key, index)
+        return index
+
+
+stats.instrument(Features, "as_ast")
+
+
+class GlyphReference(NamedTuple):
+    """A part of the feature code which references a glyph.
+
+    ``kind`` is ``"class"``, ``"prefix"`` or ``"feature"``, ``name`` is the
+    class name, prefix name or feature tag, and ``index`` is the position of
+    the class, prefix or feature in `Features`."""
+
+    kind: str
+    name: str
+    index: int
+
+
+_KIND_ORDER = {"class": 0, "prefix": 1, "feature": 2}
+
+
+class GlyphReferenceIndex:
+    """The result of `Features.glyph_references`.
+
+    As well as the glyphs each part of the feature code references, the
+    index knows which glyph classes, mark classes and lookups each part
+    defines and uses, so that the parts which depend on a changed class
+    or lookup can be found too."""
+
+    def __init__(self):
+        self._references: Dict[str, List[GlyphReference]] = {}
+        self._users: Dict[Tuple[str, str], List[GlyphReference]] = {}
+        self._defines: Dict[GlyphReference, Iterable[Tuple[str, str]]] = {}
+
+    def add(self, reference: GlyphReference, glyphs, used, defined):
+        for glyph in glyphs:
+            self._references.setdefault(glyph, []).append(reference)
+        for symbol in used:
+            self._users.setdefault(symbol, []).append(reference)
+        self._defines[reference] = defined
+
+    def __getitem__(self, glyph: str) -> List[GlyphReference]:
+        """The parts of the feature code referencing ``glyph``, in order."""
+        return self._references.get(glyph, [])
+
+    def __contains__(self, glyph: str) -> bool:
+        return glyph in self._references
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._references)
+
+    def __len__(self) -> int:
+        return len(self._references)
+
+    def referencing(
+        self, glyphs: Iterable[str], dependents: bool = True
+    ) -> List[GlyphReference]:
+        """The parts of the feature code which reference any of ``glyphs``,
+        in order. If ``dependents`` is true, parts which use a class or
+        lookup defined by one of those parts are included as well."""
+        found = set()
+        for glyph in glyphs:
+            found.update(self._references.get(glyph, ()))
+        pending = list(found) if dependents else []
+        while pending:
+            for symbol in self._defines.get(pending.pop(), ()):
+                for user in self._users.get(symbol, ()):
+                    if user not in found:
+                        found.add(user)
+                        pending.append(user)
+        return sorted(found, key=lambda r: (_KIND_ORDER[r.kind], r.index))
+
+
+class FeaAppearsVisitor(Visitor):
+    """Collects the names of the glyphs referenced in a feature AST.
+
+    Named glyph classes, mark classes and lookups are not followed; the
+    ``(kind, name)`` of those which are used and defined are collected in
+    ``used`` and ``defined`` instead."""
+
+    def __init__(self):
+        self.appearances = set()
+        self.used = set()
+        self.defined = set()
+
+
+@FeaAppearsVisitor.register(ast.GlyphName)
+def visit(visitor, gn, *args, **kwargs):
+    visitor.appearances.add(gn.glyph)
+    return False
+
+
+@FeaAppearsVisitor.register(ast.GlyphClass)
+def visit(visitor, gc, *args, **kwargs):
+    for glyph in gc.glyphs:
+        if isinstance(glyph, str):
+            visitor.appearances.add(glyph)
+        else:
+            visitor.visit(glyph, *args, **kwargs)
+    return False
+
+
+@FeaAppearsVisitor.register(ast.GlyphClassName)
+def visit(visitor, gcn, *args, **kwargs):
+    visitor.used.add(("class", gcn.glyphclass.name))
+    return False
+
+
+@FeaAppearsVisitor.register(ast.MarkClassName)
+def visit(visitor, mcn, *args, **kwargs):
+    visitor.used.add(("class", mcn.markClass.name))
+    return False
+
+
+@FeaAppearsVisitor.register(ast.LookupReferenceStatement)
+def visit(visitor, st, *args, **kwargs):
+    visitor.used.add(("lookup", st.lookup.name))
+    return False
+
+
+@FeaAppearsVisitor.register(ast.GlyphClassDefinition)
+def visit(visitor, gcd, *args, **kwargs):
+    visitor.defined.add(("class", gcd.name))
+    return True
+
+
+@FeaAppearsVisitor.register(ast.MarkClassDefinition)
+def visit(visitor, mcd, *args, **kwargs):
+    visitor.defined.add(("class", mcd.markClass.name))
+    visitor.visitAttr(mcd, "glyphs", mcd.glyphs, *args, **kwargs)
+    return False
+
+
+@FeaAppearsVisitor.register(ast.LookupBlock)
+def visit(visitor, block, *args, **kwargs):
+    visitor.defined.add(("lookup", block.name))
+    return True
+
+
+@FeaAppearsVisitor.register(ast.LigatureSubstStatement)
+def visit(visitor, ligature, *args, **kwargs):
+    visitor.appearances.add(ligature.replacement)
+    return True
+
+
+@FeaAppearsVisitor.register(
+    (ast.ChainContextPosStatement, ast.ChainContextSubstStatement)
+)
+def visit(visitor, st, *args, **kwargs):
+    for attr in ("prefix", "glyphs", "suffix"):
+        visitor.visitAttr(st, attr, getattr(st, attr), *args, **kwargs)
+    for lookups in st.lookups:
+        for lookup in lookups or ():
+            if lookup is not None:
+                visitor.used.add(("lookup", lookup.name))
+    return False
+
+
+@FeaAppearsVisitor.register(tuple)
+def visit(visitor, items, *args, **kwargs):
+    # Positioning rules and ignore statements keep glyphs in tuples
+    visitor.visitList(items, *args, **kwargs)
+    return False
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+_IMMUTABLE = (str, int, float, type(None), FeatureLibLocation)
+
+
+def _copy_ast(value, memo: Dict[int, Any]):
+    """Deep-copy feaLib AST nodes and the containers holding them, sharing
+    strings and locations, which are immutable. This is a good deal faster
+    than `copy.deepcopy` or parsing the code again."""
+    if isinstance(value, _IMMUTABLE):
+        return value
+    copied = memo.get(id(value))
+    if copied is not None:
+        return copied
+    if isinstance(value, list):
+        copied = memo[id(value)] = []
+        copied.extend([_copy_ast(item, memo) for item in value])
+    elif isinstance(value, tuple):
+        copied = memo[id(value)] = tuple(_copy_ast(item, memo) for item in value)
+    elif isinstance(value, dict):
+        copied = memo[id(value)] = type(value)()
+        for key, item in value.items():
+            copied[key] = _copy_ast(item, memo)
+    elif hasattr(value, "__dict__"):
+        copied = memo[id(value)] = object.__new__(type(value))
+        copied.__dict__ = {
+            key: _copy_ast(item, memo) for key, item in value.__dict__.items()
+        }
+    else:
+        copied = memo[id(value)] = deepcopy(value, memo)
+    return copied
+
+
+class _RecordingSymbolTable(SymbolTable):
+    """A symbol table which remembers what was defined in it, so that
+    the definitions made by a cached block can be replayed."""
+
+    def __init__(self):
+        super().__init__()
+        self.defined = []
+
+    def define(self, name, item):
+        super().define(name, item)
+        self.defined.append((name, item))
+
+
+class _ParsedBlock:
+    __slots__ = (
+        "key",
+        "kind",
+        "name",
+        "ast",
+        "lookups",
+        "glyphclasses",
+        "references",
+    )
+
+    def __init__(self, key, kind, name, ast, lookups, glyphclasses):
+        self.key = key
+        self.kind = kind
+        self.name = name
+        self.ast = ast
+        # Symbols this block defined, to be replayed if a later block
+        # must be parsed
+        self.lookups = lookups
+        self.glyphclasses = glyphclasses
+        # FeaAppearsVisitor for the block, filled in by glyph_references
+        self.references = None
+
+
+class _ParserState:
+    """Symbol tables shared by the parsers of consecutive blocks, set up
+    as they were after parsing the blocks which came from the cache."""
+
+    def __init__(self, glyphnames, class_definitions, cached_entries):
+        self.glyphnames = glyphnames
+        self.lookups = _RecordingSymbolTable()
+        self.glyphclasses = _RecordingSymbolTable()
+        for name, definition in class_definitions.items():
+            self.glyphclasses.define(name, definition)
+        for entry in cached_entries:
+            for name, item in entry.lookups:
+                self.lookups.define(name, item)
+            for name, item in entry.glyphclasses:
+                self.glyphclasses.define(name, item)
+
+    def start_block(self):
+        self.lookups.defined = []
+        self.glyphclasses.defined = []
+
+    def end_block(self, key, kind, name, file) -> _ParsedBlock:
+        return _ParsedBlock(
+            key, kind, name, file, self.lookups.defined, self.glyphclasses.defined
+        )
+
+
+class _FeaSplitter:
+    """Splits feature code into glyph classes, feature blocks and prefix
+    code in one pass over the text.
+
+    Only the structural tokens (comments, strings, braces and top-level
+    semicolons) are visited, and whole comments and strings are skipped
+    with ``str.find``, or within blocks together with the code around
+    them; classes and features are cut out of the text
+    as slices, and the text between them is assigned to the current
+    prefix."""
+
+    def __init__(self, fea: str):
+        self.fea = fea
+        self.classes: Dict[str, List[str]] = {}
+        self.features: List[Tuple[str, str]] = []
+        self.prefix = "anonymous"
+        self.prefix_parts: Dict[str, List[str]] = {}
+        # End of the text which has been assigned so far
+        self.assigned = 0
+        # The last run of whitespace, comments and includes skipped over
+        self.skipped = (-1, -1)
+
+    def split(self):
+        fea = self.fea
+        pos = 0
+        depth = 0
+        # Where the current top-level statement may start
+        statement = 0
+        # (tag, statement start, body start) of an open feature block
+        feature = None
+        while True:
+            if depth:
+                start = _BLOCK_SKIP_RE.match(fea, pos).end()
+                if start == len(fea):
+                    break
+            else:
+                token = _TOPLEVEL_TOKEN_RE.search(fea, pos)
+                if token is None:
+                    break
+                start = token.start()
+            char = fea[start]
+            if char == "#":
+                pos = fea.find("\n", start)
+                if pos < 0:
+                    pos = len(fea)
+                if self.statement_start(statement) < start:
+                    continue
+                statement = pos
+                marker = PREFIX_RE.match(fea, start, pos)
+                if marker:
+                    self.take(start, pos)
+                    self.prefix = marker.group(1).strip()
+            elif char == '"':
+                pos = fea.find('"', start + 1) + 1 or len(fea)
+            elif char == "{":
+                pos = start + 1
+                if not depth:
+                    head_start = self.statement_start(statement)
+                    head = _FEATURE_HEAD_RE.match(fea, head_start, start)
+                    if head:
+                        feature = (head.group(1), head_start, pos)
+                depth += 1
+            elif char == "}":
+                pos = start + 1
+                if not depth:
+                    continue
+                depth -= 1
+                if depth:
+                    continue
+                pos = _BLOCK_END_RE.match(fea, pos).end()
+                if feature:
+                    tag, head_start, body = feature
+                    self.add_feature(tag, fea[body:start])
+                    self.take(head_start, pos)
+                    feature = None
+                statement = pos
+            else:
+                pos = start + 1
+                head_start = self.statement_start(statement)
+                if fea.startswith("@", head_start):
+                    self.add_class(head_start, pos)
+                statement = pos
+
+        if feature:
+            # Unterminated feature block
+            tag, start, body = feature
+            self.add_feature(tag, fea[body:])
+            self.take(start, len(fea))
+        self.prefix_parts.setdefault(self.prefix, []).append(fea[self.assigned :])
+
+    def statement_start(self, pos: int) -> int:
+        """Return where the top-level statement following ``pos`` starts,
+        skipping whitespace, comments and include statements, which need
+        not end with a semicolon.
+
+        Statements are looked for after each comment and include of a run
+        of them, so the end of the run is remembered and each run is only
+        skipped over once."""
+        start, end = self.skipped
+        if start <= pos <= end:
+            return end
+        start = pos
+        pos = _SKIP_RE.match(self.fea, pos).end()
+        self.skipped = (start, pos)
+        return pos
+
+    def take(self, start: int, end: int):
+        """Remove ``fea[start:end]`` from the prefix code, together with
+        the whitespace around it if it takes up whole lines."""
+        fea = self.fea
+        newline = fea.rfind("\n", self.assigned, start)
+        line_start = newline + 1 if newline >= 0 else self.assigned
+        if fea[line_start:start].strip():
+            line_start = start
+        self.prefix_parts.setdefault(self.prefix, []).append(
+            fea[self.assigned : line_start]
+        )
+        line_end = _LINE_END_RE.match(fea, end)
+        self.assigned = line_end.end() if line_end else end
+
+    def add_class(self, start: int, end: int):
+        text = self.fea[start:end]
+        if "#" in text:
+            text = _COMMENT_RE.sub("", text)
+        match = _CLASS_RE.match(text)
+        if match:
+            self.classes[match.group(1)] = match.group(2).split()
+            self.take(start, end)
+
+    def add_feature(self, tag: str, body: str):
+        # Drop the remainder of the line opening the block
+        first_line = _LINE_END_RE.match(body)
+        if first_line:
+            body = body[first_line.end() :]
+        self.features.append((tag, body.rstrip()))
+
+    def prefixes(self) -> Dict[str, str]:
+        prefixes = {}
+        for name, parts in self.prefix_parts.items():
+            lines = [line for line in "".join(parts).split("\n") if line.strip()]
+            if lines:
+                prefixes[name] = "\n".join(lines)
+        return prefixes
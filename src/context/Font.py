@@ -2,18 +2,21 @@ import functools
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from fontTools.feaLib.variableScalar import VariableScalar
 from fontTools.varLib.models import VariationModel
 
+from .AnchorTable import AnchorTable
 from .Axis import Axis, Tag
 from .BaseObject import BaseObject, IncompatibleMastersError, Number
 from .Features import Features
 from .Glyph import GlyphList
 from .Instance import Instance
+from .Layer import Layer
 from .Master import Master
 from .Names import Names
+from . import stats
 
 log = logging.getLogger(__name__)
 
@@ -73,6 +76,9 @@ font.glyphs.append(newglyph)
 
 glyph_ampersand = font.glyphs["ampersand"]
 ```
+
+Glyphs may also be found by position, with `font.glyphs.at(0)`, and
+`font.glyphs.index("ampersand")` gives the position of a glyph.
             """,
         },
     )
@@ -137,6 +143,7 @@ class Font(_FontFields, BaseObject):
         # Set parent for names, features
         self.names._set_parent(self)
         self.features._set_parent(self)
+        self._variation_model_cache = None
 
     def _mark_children_clean(self, context):
         """Recursively mark children clean."""
@@ -152,6 +159,19 @@ class Font(_FontFields, BaseObject):
         self.names.mark_clean(context, recursive=False)
         self.features.mark_clean(context, recursive=False)
 
+    # Derived data which is computed once and kept until _clear_caches
+    _CACHED_PROPERTIES = (
+        "default_master",
+        "_master_map",
+        "_all_kerning",
+        "_all_anchors",
+    )
+
+    def _clear_caches(self):
+        """Forget derived data, so that it is recomputed after edits."""
+        for name in self._CACHED_PROPERTIES:
+            self.__dict__.pop(name, None)
+
     def __repr__(self):
         return "<Font '%s' (%i masters)>" % (
             self.names.familyName.get_default(),
@@ -159,14 +179,15 @@ class Font(_FontFields, BaseObject):
         )
 
     def save(self, filename: str = None, **kwargs):
-        """Save the font to a Context format file. Any additional keyword
-        arguments are passed to the save method of the Context converter.
+        """Save the font to a Context format file, or compile it to a
+        ``.ttf`` or ``.otf`` binary, depending on the filename's suffix.
+        Any additional keyword arguments are passed to the save method of
+        the converter.
 
         Args:
             filename: Path to save the font. If not provided, uses the font's
                      stored filename (from where it was loaded).
         """
-        from context.convertors.nfsf import Context
         from context.convertors import Convert
 
         # Use stored filename if no filename provided
@@ -176,10 +197,12 @@ class Font(_FontFields, BaseObject):
             filename = self.filename
 
         convertor = Convert(filename)
-        result = Context.save(self, convertor, **kwargs)
+        result = convertor.save(self, **kwargs)
 
-        # Update the stored filename after successful save
-        self.filename = filename
+        # Update the stored filename after successful save, unless the
+        # font was exported to a format which cannot be loaded again
+        if convertor.load_convertor():
+            self.filename = filename
 
         return result
 
@@ -228,23 +251,68 @@ class Font(_FontFields, BaseObject):
     def _master_map(self):
         return {m.id: m for m in self.masters}
 
-    @functools.cached_property
-    def unicode_map(self) -> Dict[int, str]:
-        """Return a dictionary mapping Unicode codepoints to glyph names."""
-        unicodes = {}
-        for g in self.glyphs:
-            for u in g.codepoints:
-                if u is not None:
-                    unicodes[u] = g.name
-        return unicodes
+    @property
+    def unicode_map(self) -> Mapping[int, str]:
+        """Return a mapping of Unicode codepoints to glyph names, which
+        follows changes to the glyphs."""
+        return self.glyphs.codepoint_map()
+
+    def _axes_key(self) -> tuple:
+        return tuple(
+            (a.tag, a.min, a.default, a.max, tuple(map(tuple, a.map or ())))
+            for a in self.axes
+        )
+
+    def normalize_location(self, location: dict[Tag, Number]) -> dict[Tag, float]:
+        """Normalize a location in the same coordinates as `Master.location`
+        to the -1.0 to 1.0 range used by the variation model. Axes which
+        are not in the location are taken to be at their default."""
+        return {
+            a.tag: (
+                a.normalize_designspace_value(location[a.tag])
+                if a.tag in location
+                else 0.0
+            )
+            for a in self.axes
+        }
 
     def variation_model(self) -> VariationModel:
         """Return a `fontTools.varLib.models.VariationModel` object representing
-        the font's axes and masters. This is used for generating variable fonts."""
-        return VariationModel(
-            [m.normalized_location for m in self.masters],
-            axisOrder=[a.tag for a in self.axes],
+        the font's axes and masters. This is used for generating variable fonts.
+
+        The model is cached, and rebuilt when the axes or the master locations
+        change."""
+        key = (
+            self._axes_key(),
+            tuple(tuple((m.location or {}).items()) for m in self.masters),
         )
+        cache = self._variation_model_cache
+        if cache is None or cache.key != key:
+            model = VariationModel(
+                [m.normalized_location for m in self.masters],
+                axisOrder=[a.tag for a in self.axes],
+            )
+            cache = _VariationModelCache(key, model)
+            self._variation_model_cache = cache
+        return cache.model
+
+    def variation_scalars(self, location: dict[Tag, Number]) -> List[float]:
+        """Return the scalars of each of the variation model's supports at the
+        given location, for use with `VariationModel.interpolateFromDeltasAndScalars`.
+        Scalars are cached per location, so evaluating many sets of deltas at
+        the same location only computes them once."""
+        self.variation_model()
+        return self._variation_model_cache.scalars(location, self.normalize_location)[0]
+
+    def interpolate(self, master_values: List[Any], location: dict[Tag, Number]):
+        """Interpolate a value at the given location from a list of values,
+        one per master in the order of `Font.masters`. The location is in
+        the same coordinates as `Master.location`."""
+        model = self.variation_model()
+        master_scalars = self._variation_model_cache.scalars(
+            location, self.normalize_location
+        )[1]
+        return model.interpolateFromValuesAndScalars(master_values, master_scalars)
 
     @functools.cached_property
     def _all_kerning(self):
@@ -262,31 +330,43 @@ class Font(_FontFields, BaseObject):
                         left,
                         right,
                     )
-                kern.add_value(m.location, thiskern)
+                kern.add_value(self.map_backward(m.location), thiskern)
             kerndict[(left, right)] = kern
         return kerndict
 
+    def _layers_by_master(self, glyphs=None) -> List[Dict[str, Layer]]:
+        """For each master, map glyph names (of all glyphs, or of the named
+        ``glyphs``) to the glyph's layer in that master, in a single pass over
+        the layers. As with `Master.get_glyph_layer`, the first layer
+        assigned to a master wins."""
+        index = {m.id: ix for ix, m in enumerate(self.masters)}
+        layers = [{} for _ in self.masters]
+        if glyphs is None:
+            glyphs = self.glyphs
+        else:
+            glyphs = [self.glyphs[g] for g in glyphs if g in self.glyphs]
+        for glyph in glyphs:
+            for layer in glyph.layers:
+                mix = index.get(layer._master)
+                if mix is not None and glyph.name not in layers[mix]:
+                    layers[mix][glyph.name] = layer
+        return layers
+
+    def anchor_table(self) -> AnchorTable:
+        """Return an `AnchorTable` holding the position of every anchor of
+        every glyph in every master. Its ``missing`` attribute lists all
+        anchors which are not present in all masters."""
+        return AnchorTable(self)
+
     @functools.cached_property
     def _all_anchors(self):
-        _all_anchors_dict = {}
-        for g in sorted(self.glyphs.keys()):
-            default_layer = self.default_master.get_glyph_layer(g)
-            has_mark = None
-            for a in default_layer.anchors_dict.keys():
-                if a[0] == "_":
-                    if has_mark:
-                        log.warning(
-                            "Glyph %s tried to be in two mark classes (%s, %s). The first one will win.",
-                            g,
-                            has_mark,
-                            a,
-                        )
-                        continue
-                    has_mark = a
-                if a not in _all_anchors_dict:
-                    _all_anchors_dict[a] = {}
-                _all_anchors_dict[a][g] = self.get_variable_anchor(g, a)
-        return _all_anchors_dict
+        table = self.anchor_table()
+        if table.missing:
+            raise IncompatibleMastersError(
+                "Anchors are not compatible across masters:\n"
+                + "\n".join(str(missing) for missing in table.missing)
+            )
+        return table.variable_anchors()
 
     def get_variable_anchor(
         self, glyph, anchorname
@@ -301,15 +381,65 @@ class Font(_FontFields, BaseObject):
         y_vs.axes = self.axes
         for m in self.masters:
             layer = m.get_glyph_layer(glyph)
-            if anchorname not in layer.anchors_dict:
+            anchor = layer.anchors_dict.get(anchorname) if layer else None
+            if anchor is None:
                 raise IncompatibleMastersError(
                     f"Anchor {anchorname} not found on glyph {glyph} in master {m}"
                 )
-            anchor = m.get_glyph_layer(glyph).anchors_dict[anchorname]
-            x_vs.add_value(self.map_forward(m.location), anchor.x)
-            y_vs.add_value(self.map_forward(m.location), anchor.y)
+            location = self.map_backward(m.location)
+            x_vs.add_value(location, anchor.x)
+            y_vs.add_value(location, anchor.y)
         return (x_vs, y_vs)
 
     def exported_glyphs(self) -> List[str]:
         """Return a list of glyph names that are marked for export."""
-        return [g.name for g in self.glyphs if g.exported]
+        return [g.name for g in self.glyphs.where(exported=True)]
+
+    def subset(
+        self,
+        glyphs: Optional[Iterable[str]] = None,
+        unicodes: Optional[Iterable[int]] = None,
+    ) -> "Font":
+        """Return a new font with only the glyphs named in ``glyphs``, the
+        glyphs encoding the codepoints in ``unicodes`` and ``.notdef``,
+        together with the glyphs they use as components and the glyphs the
+        feature code can substitute for them. Kerning, kern groups and
+        feature code are subset to those glyphs.
+
+        The new font shares every object which does not depend on the glyph
+        set with this one, such as the axes, the names and the nodes of the
+        glyphs' paths, rather than copying them."""
+        from context.subset import subset_font
+
+        return subset_font(self, glyphs, unicodes)
+
+
+stats.instrument_cached(Font, Font._CACHED_PROPERTIES)
+
+
+class _VariationModelCache:
+    """A variation model together with the scalars of recently used
+    locations."""
+
+    MAX_LOCATIONS = 1024
+
+    def __init__(self, key, model: VariationModel):
+        self.key = key
+        self.model = model
+        self._scalars = {}
+
+    def scalars(self, location, normalize) -> Tuple[List[float], List[float]]:
+        """Return the support scalars and the master scalars at a location,
+        normalizing it with ``normalize`` if it has not been seen before."""
+        key = tuple(sorted(location.items()))
+        scalars = self._scalars.get(key)
+        if scalars is None:
+            normalized = normalize(location)
+            scalars = (
+                self.model.getScalars(normalized),
+                self.model.getMasterScalars(normalized),
+            )
+            if len(self._scalars) >= self.MAX_LOCATIONS:
+                del self._scalars[next(iter(self._scalars))]
+            self._scalars[key] = scalars
+        return scalars
@@ -1,10 +1,16 @@
-from typing import Optional, List
+import functools
+import itertools
+import operator
+from collections import Counter
+from collections.abc import ItemsView, KeysView, Mapping, ValuesView
+from typing import Any, Dict, Iterable, Iterator, Optional, List, Set, Tuple
 
 from dataclasses import dataclass, field
 from .BaseObject import BaseObject
 from .Layer import Layer
 from fontTools.misc.filenames import userNameToFileName
 import os
+import weakref
 
 
 @dataclass
@@ -20,9 +26,30 @@ class _GlyphFields:
     direction: str = field(default="LTR", repr=False)
 
 
+# The fields by which a GlyphList can find glyphs
+_INDEXED_FIELDS = frozenset(("codepoints", "category", "exported"))
+
+
 @dataclass
 class Glyph(BaseObject, _GlyphFields):
     _write_one_line = True
+    # The GlyphList holding the glyph, told when indexed fields change
+    _glyph_list_ref = None
+
+    def __setattr__(self, name, value):
+        if name in _INDEXED_FIELDS and self._glyph_list_ref is not None:
+            glyphs = self._glyph_list_ref()
+            if glyphs is not None:
+                old = getattr(self, name)
+                super().__setattr__(name, value)
+                glyphs._reindex(self, name, old)
+                return
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_glyph_list_ref", None)
+        return state
 
     def _mark_children_clean(self, context):
         """Recursively mark children clean."""
@@ -34,10 +61,252 @@ class Glyph(BaseObject, _GlyphFields):
         return os.path.join("glyphs", (userNameToFileName(self.name) + ".nfsglyph"))
 
 
+# Glyph set versions are unique across all glyph lists, so that a cache
+# keyed on a version cannot confuse two different lists.
+_glyph_set_versions = itertools.count()
+
+
+# Whether a slot of a GlyphList's order holds a glyph rather than a hole
+_present = functools.partial(operator.is_not, None)
+
+
+class _GlyphIndex:
+    """The names of the glyphs of a GlyphList by codepoint, and by the
+    value of each other indexed field."""
+
+    def __init__(self, items: Iterable[Tuple[str, Glyph]]):
+        self.codepoints: Dict[int, List[str]] = {}
+        self.fields: Dict[str, Dict[Any, Set[str]]] = {
+            field: {} for field in _INDEXED_FIELDS if field != "codepoints"
+        }
+        for name, glyph in items:
+            self.add(name, glyph)
+
+    def add(self, name: str, glyph: Glyph):
+        self._add_codepoints(name, glyph.codepoints)
+        for field, index in self.fields.items():
+            index.setdefault(getattr(glyph, field), set()).add(name)
+
+    def discard(self, name: str, glyph: Glyph):
+        self._discard_codepoints(name, glyph.codepoints)
+        for field, index in self.fields.items():
+            self._discard(index, getattr(glyph, field), name)
+
+    def update(self, name: str, field: str, old, new):
+        if field == "codepoints":
+            self._discard_codepoints(name, old)
+            self._add_codepoints(name, new)
+        else:
+            index = self.fields[field]
+            self._discard(index, old, name)
+            index.setdefault(new, set()).add(name)
+
+    def _add_codepoints(self, name: str, codepoints):
+        for codepoint in codepoints or ():
+            if codepoint is not None:
+                self.codepoints.setdefault(codepoint, []).append(name)
+
+    def _discard_codepoints(self, name: str, codepoints):
+        for codepoint in codepoints or ():
+            names = self.codepoints.get(codepoint)
+            if names and name in names:
+                names.remove(name)
+                if not names:
+                    del self.codepoints[codepoint]
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[str]], value, name: str):
+        names = index.get(value)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del index[value]
+
+
+class _CodepointMap(Mapping):
+    """Codepoints to the name of the glyph which has each, read from the
+    index of a GlyphList; if several glyphs have a codepoint, the last one
+    given it."""
+
+    def __init__(self, index: _GlyphIndex):
+        self._codepoints = index.codepoints
+
+    def __getitem__(self, codepoint: int) -> str:
+        return self._codepoints[codepoint][-1]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._codepoints)
+
+    def __len__(self) -> int:
+        return len(self._codepoints)
+
+
 class GlyphList(dict):
+    """The glyphs of a font, by name and in order.
+
+    A dictionary from glyph names to glyphs which also keeps their order
+    like a list: iterating over it yields the glyphs in order, `at` gives
+    the glyph at a position and `index` the position (the glyph ID) of a
+    name. Glyphs are renamed in place with `rename`, and added or removed
+    in bulk with `extend` and `remove`. `where` finds glyphs by codepoint,
+    category or export state, from indexes built on first use and then
+    kept up to date as glyphs change. (The indexes follow fields which
+    are assigned, such as ``glyph.codepoints = [0x41]``, but not lists
+    changed in place.)
+
+    The order is kept as a list of names and a list of glyphs. Removing a
+    glyph leaves a hole in them, and the holes are only squeezed out, into
+    new lists, when positions are next needed. As the lists are otherwise
+    only appended to, iterating does not copy them, and any number of
+    loops over the glyphs can run at once, even while glyphs are added or
+    removed; a loop sees the glyphs it started with, minus those removed.
+    """
+
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__()
         self._parent_font = None
+        self._names: List[Optional[str]] = []
+        self._glyphs: List[Optional[Glyph]] = []
+        # Name -> index in the lists
+        self._positions: Dict[str, int] = {}
+        self._holes = 0
+        self._index: Optional[_GlyphIndex] = None
+        self._version = next(_glyph_set_versions)
+        for name, glyph in dict(*args, **kwargs).items():
+            self._add(name, glyph)
+
+    @property
+    def version(self) -> int:
+        """A number which changes whenever glyphs are added, removed or
+        renamed."""
+        return self._version
+
+    def _changed(self):
+        self._version = next(_glyph_set_versions)
+
+    def _add(self, name, glyph):
+        if name in self:
+            self._forget(name, dict.__getitem__(self, name))
+            self._glyphs[self._positions[name]] = glyph
+        else:
+            self._positions[name] = len(self._names)
+            self._names.append(name)
+            self._glyphs.append(glyph)
+        dict.__setitem__(self, name, glyph)
+        glyph._glyph_list_ref = weakref.ref(self)
+        if self._index is not None:
+            self._index.add(name, glyph)
+
+    def _forget(self, name, glyph):
+        if glyph._glyph_list_ref is not None and glyph._glyph_list_ref() is self:
+            glyph._glyph_list_ref = None
+        if self._index is not None:
+            self._index.discard(name, glyph)
+
+    def _discard(self, name):
+        glyph = dict.pop(self, name)
+        self._forget(name, glyph)
+        position = self._positions.pop(name)
+        self._names[position] = None
+        self._glyphs[position] = None
+        self._holes += 1
+        if self._holes > len(self):
+            self._compact()
+        return glyph
+
+    def _compact(self):
+        if not self._holes:
+            return
+        # New lists, leaving any running loops with the old ones
+        self._names = list(filter(_present, self._names))
+        self._glyphs = list(filter(_present, self._glyphs))
+        self._positions = {name: ix for ix, name in enumerate(self._names)}
+        self._holes = 0
+
+    def __setitem__(self, key, value):
+        self._add(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._discard(key)
+        self._changed()
+
+    def pop(self, key, *default):
+        if key in self:
+            result = self._discard(key)
+        elif default:
+            result = default[0]
+        else:
+            raise KeyError(key)
+        self._changed()
+        return result
+
+    def popitem(self):
+        if not self:
+            raise KeyError("popitem(): glyph list is empty")
+        self._compact()
+        name = self._names[-1]
+        glyph = self._discard(name)
+        self._changed()
+        return name, glyph
+
+    def clear(self):
+        for name, glyph in dict.items(self):
+            self._forget(name, glyph)
+        super().clear()
+        self._names, self._glyphs, self._positions = [], [], {}
+        self._holes = 0
+        self._index = None
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self._add(key, value)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def keys(self):
+        return _GlyphNames(self)
+
+    def values(self):
+        return _GlyphValues(self)
+
+    def items(self):
+        return _GlyphItems(self)
+
+    def __iter__(self) -> Iterator[Glyph]:
+        glyphs = self._glyphs
+        # Glyphs appended later are not visited
+        return filter(_present, itertools.islice(glyphs, len(glyphs)))
+
+    def __reversed__(self) -> Iterator[Glyph]:
+        return filter(_present, reversed(self._glyphs))
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (list(self.items()),),
+            {"_parent_font": self._parent_font},
+        )
+
+    def at(self, index: int) -> Glyph:
+        """The glyph at a position in the list."""
+        self._compact()
+        return self._glyphs[index]
+
+    def index(self, name: str) -> int:
+        """The position of a glyph in the list, that is, its glyph ID."""
+        self._compact()
+        return self._positions[name]
 
     def _set_parent_font(self, font):
         """Set the parent font for dirty tracking."""
@@ -46,11 +315,120 @@ class GlyphList(dict):
     def append(self, thing):
         self[thing.name] = thing
         # Mark font dirty when glyph is added
+        self._mark_font_dirty()
+
+    def extend(self, glyphs: Iterable[Glyph]):
+        """Append several glyphs."""
+        for glyph in glyphs:
+            self._add(glyph.name, glyph)
+        self._changed()
+        self._mark_font_dirty()
+
+    def insert(self, index: int, glyph: Glyph):
+        """Insert a glyph before the given position."""
+        if glyph.name in self:
+            raise ValueError("There is already a glyph called %s" % glyph.name)
+        self._compact()
+        self._add(glyph.name, glyph)
+        # It was added at the end; move it into place, in new lists
+        names, glyphs = self._names[:-1], self._glyphs[:-1]
+        names.insert(index, glyph.name)
+        glyphs.insert(index, glyph)
+        self._names, self._glyphs = names, glyphs
+        self._positions = {name: ix for ix, name in enumerate(names)}
+        self._changed()
+        self._mark_font_dirty()
+
+    def remove(self, names: Iterable[str]):
+        """Remove the glyphs with the given names, if there are any."""
+        for name in names:
+            if name in self:
+                self._discard(name)
+        self._changed()
+        self._mark_font_dirty()
+
+    def check_rename(self, mapping: Dict[str, str]) -> Dict[str, str]:
+        """Check that renaming glyphs with ``mapping`` would not give two
+        glyphs the same name, raising `ValueError` if it would, without
+        changing anything. Returns the part of the mapping which renames
+        glyphs in the list."""
+        renamed = {
+            old: new for old, new in mapping.items() if old in self and old != new
+        }
+        new_names = Counter(renamed.values())
+        for name, count in new_names.items():
+            if count > 1 or (name in self and name not in renamed):
+                raise ValueError("Renaming gives two glyphs the name %s" % name)
+        return renamed
+
+    def rename(self, mapping: Dict[str, str]):
+        """Rename glyphs in place, keeping their order. ``mapping`` maps
+        old names to new ones; names not in the list are ignored."""
+        renamed = self.check_rename(mapping)
+        if not renamed:
+            return
+        # Take all the renamed glyphs out first, as they may swap names
+        moved = [
+            (new, dict.pop(self, old), self._positions.pop(old))
+            for old, new in renamed.items()
+        ]
+        for (old, _new), (name, glyph, position) in zip(renamed.items(), moved):
+            dict.__setitem__(self, name, glyph)
+            self._positions[name] = position
+            self._names[position] = name
+            glyph.name = name
+            if self._index is not None:
+                self._index.discard(old, glyph)
+                self._index.add(name, glyph)
+        self._changed()
+        self._mark_font_dirty()
+
+    def _indexes(self) -> _GlyphIndex:
+        if self._index is None:
+            self._index = _GlyphIndex(self.items())
+        return self._index
+
+    def _reindex(self, glyph: Glyph, field: str, old):
+        """Update the indexes after a field of a glyph has changed."""
+        if self._index is not None and dict.get(self, glyph.name) is glyph:
+            self._index.update(glyph.name, field, old, getattr(glyph, field))
+
+    def where(self, codepoint: Optional[int] = None, **fields) -> List[Glyph]:
+        """The glyphs, in order, with the given codepoint and field values,
+        for example ``where(category="mark", exported=True)``. Only
+        ``codepoint``, ``category`` and ``exported`` can be asked for."""
+        index = self._indexes()
+        selections = []
+        if codepoint is not None:
+            selections.append(index.codepoints.get(codepoint, ()))
+        for field, value in fields.items():
+            if field not in index.fields:
+                raise ValueError("Glyphs cannot be looked up by %s" % field)
+            selections.append(index.fields[field].get(value, ()))
+        if not selections:
+            return list(self)
+        selections.sort(key=len)
+        names = set(selections[0]).intersection(*selections[1:])
+        positions = self._positions
+        return [
+            dict.__getitem__(self, name) for name in sorted(names, key=positions.get)
+        ]
+
+    def codepoint_map(self) -> Mapping[int, str]:
+        """A live mapping of codepoints to the names of their glyphs."""
+        return _CodepointMap(self._indexes())
+
+    def _mark_font_dirty(self):
         if self._parent_font:
-            from .BaseObject import DIRTY_FILE_SAVING, DIRTY_CANVAS_RENDER
+            from .BaseObject import (
+                DIRTY_FILE_SAVING,
+                DIRTY_CANVAS_RENDER,
+                DIRTY_COMPILE,
+            )
 
             self._parent_font.mark_dirty(DIRTY_FILE_SAVING, field_name="glyphs")
             self._parent_font.mark_dirty(DIRTY_CANVAS_RENDER, field_name="glyphs")
+            self._parent_font.mark_dirty(DIRTY_COMPILE, field_name="glyphs")
 
     def write(self, stream, indent):
         stream.write(b"[")
@@ -64,15 +442,26 @@ class GlyphList(dict):
                 stream.write(b"\n")
         stream.write(b"]")
 
-    def __iter__(self) -> "GlyphList":
-        self._n = 0
-        self._values = list(self.values())
-        return self
 
-    def __next__(self) -> Glyph:
-        if self._n < len(self._values):
-            result = self._values[self._n]
-            self._n += 1
-            return result
-        else:
-            raise StopIteration
+class _GlyphNames(KeysView):
+    def __iter__(self) -> Iterator[str]:
+        names = self._mapping._names
+        return filter(_present, itertools.islice(names, len(names)))
+
+    def __reversed__(self) -> Iterator[str]:
+        return filter(_present, reversed(self._mapping._names))
+
+
+class _GlyphValues(ValuesView):
+    def __iter__(self) -> Iterator[Glyph]:
+        return iter(self._mapping)
+
+
+class _GlyphItems(ItemsView):
+    def __iter__(self) -> Iterator[Tuple[str, Glyph]]:
+        names, glyphs = self._mapping._names, self._mapping._glyphs
+        count = len(names)
+        pairs = zip(itertools.islice(names, count), itertools.islice(glyphs, count))
+        for name, glyph in pairs:
+            if name is not None:
+                yield name, glyph
@@ -3,6 +3,7 @@ from dataclasses import dataclass, field
 from functools import cached_property
 from typing import TYPE_CHECKING, Dict, List, Optional
 
+from fontTools.misc.transform import Identity
 from fontTools.pens.boundsPen import BoundsPen
 from fontTools.pens.recordingPen import DecomposingRecordingPen
 from fontTools.ufoLib.pointPen import (
@@ -16,6 +17,7 @@ from .BaseObject import BaseObject, Color
 from .Guide import Guide
 from .Node import Node, FROM_PEN_TYPE
 from .Shape import Shape
+from . import stats
 
 if TYPE_CHECKING:
     from .Font import Font
@@ -172,7 +174,7 @@ class Layer(BaseObject, _LayerFields):
                 )
             pen.endPath()
         for component in self.components:
-            pen.addComponent(component.ref, component.transform)
+            pen.addComponent(component.ref, component.transform or Identity)
 
     def clearContours(self):
         self.shapes = []
@@ -187,6 +189,10 @@ class Layer(BaseObject, _LayerFields):
         pen.replay(self.getPen())
 
 
+stats.instrument(Layer, "draw")
+stats.instrument(Layer, "drawPoints")
+
+
 class LayerPen(AbstractPointPen):
     def __init__(self, target):
         self.target = target
@@ -4,6 +4,7 @@ from typing import Optional, Union
 from .Layer import Layer
 from .BaseObject import BaseObject, I18NDictionary
 from .Guide import Guide
+from . import stats
 
 # Anything which can be varied in MVAR is a master-specific metric
 CORE_METRICS = [
@@ -108,6 +109,7 @@ class Master(BaseObject, _MasterFields):
         # If they smacked my name with a bare string, replace with I18NDict
         if isinstance(self.name, str):
             self.name = I18NDictionary.with_default(self.name)
+        self._normalized_location_cache = None
 
     def _mark_children_clean(self, context):
         """Recursively mark children clean."""
@@ -122,7 +124,13 @@ class Master(BaseObject, _MasterFields):
 
     @property
     def normalized_location(self) -> dict[str, float]:
-        return {a.tag: a.normalize_value(self.location[a.tag]) for a in self.font.axes}
+        # Cached until the location or the font's axes change
+        key = (tuple((self.location or {}).items()), self.font._axes_key())
+        cache = self._normalized_location_cache
+        if cache is None or cache[0] != key:
+            cache = (key, self.font.normalize_location(self.location or {}))
+            self._normalized_location_cache = cache
+        return dict(cache[1])
 
     @property
     def xHeight(self) -> Union[int, float]:
@@ -149,3 +157,6 @@ class Master(BaseObject, _MasterFields):
         ]:
             return False
         return True
+
+
+stats.instrument(Master, "get_glyph_layer")
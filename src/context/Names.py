@@ -1,5 +1,5 @@
 from .BaseObject import BaseObject, I18NDictionary
-from dataclasses import dataclass, asdict, fields
+from dataclasses import dataclass, fields
 
 OPENTYPE_NAMES = [
     "copyright",
@@ -27,6 +27,32 @@ OPENTYPE_NAMES = [
     "WWSSubfamilyName",
 ]
 
+# fontTools name table names, and the fields which provide them in order
+# of preference
+FONTTOOLS_NAMES = {
+    "copyright": ["copyright"],
+    "familyName": ["styleMapFamilyName", "familyName"],
+    "styleName": ["styleMapStyleName", "styleName"],
+    "uniqueFontIdentifier": ["uniqueID"],
+    "fullName": ["fullName"],
+    "version": ["version"],
+    "psName": ["postscriptName"],
+    "trademark": ["trademark"],
+    "manufacturer": ["manufacturer"],
+    "designer": ["designer"],
+    "description": ["description"],
+    "vendorURL": ["manufacturerURL"],
+    "designerURL": ["designerURL"],
+    "licenseDescription": ["license"],
+    "licenseInfoURL": ["licenseURL"],
+    "typographicFamily": ["typographicFamily"],
+    "typographicSubfamily": ["typographicSubfamily"],
+    "compatibleFullName": ["compatibleFullName"],
+    "sampleText": ["sampleText"],
+    "wwsFamilyName": ["WWSFamilyName"],
+    "wwsSubfamilyName": ["WWSSubfamilyName"],
+}
+
 
 @dataclass
 class Names(BaseObject):
@@ -64,16 +90,21 @@ class Names(BaseObject):
                 setattr(self, k.name, I18NDictionary())
 
     def as_nametable_dict(self):
+        """Return the names as a dictionary suitable for passing to
+        `fontTools.fontBuilder.FontBuilder.setupNameTable`. Names in more
+        than one language are given as dictionaries of language tags."""
         rv = {}
-        ft_names = {
-            "manufacturerURL": "vendorURL",
-            "license": "licenseDescription",
-            "licenseURL": "licenseInfoURL",
-        }
-        for k, v in asdict(self).items():
-            if not v:
+        for ft_name, attrs in FONTTOOLS_NAMES.items():
+            for attr in attrs:
+                value = getattr(self, attr)
+                if value:
+                    break
+            else:
                 continue
-            rv[ft_names.get(k, k)] = v.default_or_dict()
+            if len(value) > 1:
+                rv[ft_name] = value.as_fonttools_dict
+            else:
+                rv[ft_name] = value.get_default()
         return rv
 
     def __getitem__(self, key):
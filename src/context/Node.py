@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+from . import stats
+
 TO_PEN_TYPE = {"o": None, "c": "curve", "l": "line", "q": "qcurve"}
 FROM_PEN_TYPE = {v: k for k, v in TO_PEN_TYPE.items()}
 
@@ -12,13 +14,12 @@ class Node:
     userdata: str = None
 
     def write(self, stream, _indent):
+        x, y = _number(self.x), _number(self.y)
         if not self.userdata:
-            stream.write(('[%i,%i,"%s"]' % (self.x, self.y, self.type)).encode())
+            stream.write(('[%s,%s,"%s"]' % (x, y, self.type)).encode())
         else:
             stream.write(
-                (
-                    '[%i,%i,"%s", "%s"]' % (self.x, self.y, self.type, self.userdata)
-                ).encode()
+                ('[%s,%s,"%s", "%s"]' % (x, y, self.type, self.userdata)).encode()
             )
 
     @property
@@ -28,3 +29,13 @@ class Node:
     @property
     def pen_type(self):
         return TO_PEN_TYPE[self.type[0]]
+
+
+stats.instrument(Node, "write")
+
+
+def _number(value) -> str:
+    # Keep the fractions of coordinates which are not whole numbers
+    if value == int(value):
+        return "%i" % value
+    return repr(float(value))
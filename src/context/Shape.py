@@ -24,6 +24,12 @@ class _ShapeFields:
 
 @dataclass
 class Shape(BaseObject, _ShapeFields):
+    def __post_init__(self):
+        super().__post_init__()
+        # Transforms are loaded from JSON as lists
+        if self.transform is not None and not isinstance(self.transform, Transform):
+            self.transform = Transform(*self.transform)
+
     def _mark_children_clean(self, context):
         """Recursively mark children clean."""
         # Nodes don't inherit from BaseObject, so nothing to clean
@@ -45,7 +51,8 @@ class Shape(BaseObject, _ShapeFields):
     def component_layer(self) -> Optional["Layer"]:
         if not self.is_component:
             return None
-        return self._layer.master.get_glyph_layer(self.ref)
+        layer = self._layer or self._get_parent()
+        return layer.master.get_glyph_layer(self.ref)
 
     @property
     def pos(self):
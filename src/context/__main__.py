@@ -1,19 +1,17 @@
 import argparse
 import logging
 import sys
+import time
 
-from context import load
-from context.fontFilters import FILTERS, parse_filter
+from context import load, trace
+from context.fontFilters import FILTERS, parse_filter, run_filters
 
 LOG_FORMAT = "%(message)s"
 
 logger = logging.getLogger(__name__)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        prog="context", description="Load and manipulate Context format files"
-    )
+def _add_log_level(parser):
     parser.add_argument(
         "--log-level",
         "-l",
@@ -21,6 +19,179 @@ def main():
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
         default="INFO",
     )
+
+
+def _setup_logging(level):
+    try:
+        from rich.logging import RichHandler
+
+        handlers = [RichHandler()]
+    except ImportError:
+        handlers = [logging.StreamHandler()]
+
+    logging.basicConfig(
+        level=level, format=LOG_FORMAT, datefmt="[%X]", handlers=handlers
+    )
+
+
+def _load_or_exit(filename, log_level):
+    try:
+        logger.info("Reading %s", filename)
+        return load(filename)
+    except Exception as e:
+        if log_level == "DEBUG":
+            raise e
+        logger.error("Couldn't read %s: %s", filename, e)
+        sys.exit(1)
+
+
+def check(argv):
+    """Report glyphs whose master layers are not compatible."""
+    from context.compatibility import check_compatibility
+
+    parser = argparse.ArgumentParser(
+        prog="context check",
+        description="Check that the masters of a Context file are compatible",
+    )
+    _add_log_level(parser)
+    parser.add_argument("--glyph", "-g", help="Only check this glyph", action="append")
+    parser.add_argument("input", metavar="IN", help="Input Context file")
+    args = parser.parse_args(argv)
+    _setup_logging(args.log_level)
+
+    font = _load_or_exit(args.input, args.log_level)
+    report = check_compatibility(font, args.glyph)
+    for incompatibility in report:
+        logger.error("%s", incompatibility)
+    logger.info(
+        "Checked %i glyphs: %i incompatible",
+        report.checked,
+        len(report.glyphs),
+    )
+    return 0 if report.compatible else 1
+
+
+def batch(argv):
+    """Convert many files, reporting the time each took and any failures."""
+    from context.batch import glob_jobs, read_manifest, run_batch
+
+    parser = argparse.ArgumentParser(
+        prog="context batch",
+        description="Load, filter and save many Context files in a pool of "
+        "processes. The files are listed in a JSON manifest of "
+        '{"input": ..., "output": ..., "filters": [...]} objects, or '
+        "matched by --glob.",
+    )
+    _add_log_level(parser)
+    parser.add_argument("manifest", metavar="MANIFEST", nargs="?", help="JSON manifest")
+    parser.add_argument("--glob", "-g", help="Convert the files matching this pattern")
+    parser.add_argument(
+        "--output-dir", "-o", default=".", help="Directory for --glob outputs"
+    )
+    parser.add_argument(
+        "--suffix",
+        "-s",
+        default=".babelfont",
+        help="Extension of --glob outputs, such as .ttf (default: .babelfont)",
+    )
+    parser.add_argument(
+        "--filter",
+        "-f",
+        help="Filter to apply to files which do not list their own",
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="Number of processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        help="Most files queued for the processes at once (default: two per process)",
+    )
+    parser.add_argument(
+        "--worker-log-level",
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Log level of the conversions (default: WARNING)",
+    )
+    args = parser.parse_args(argv)
+    _setup_logging(args.log_level)
+
+    if (args.manifest is None) == (args.glob is None):
+        parser.error("give either a manifest or --glob")
+    if args.glob:
+        jobs = glob_jobs(args.glob, args.output_dir, args.suffix, args.filter)
+    else:
+        try:
+            jobs = read_manifest(args.manifest, args.filter)
+        except (OSError, ValueError) as e:
+            logger.error("Couldn't read %s: %s", args.manifest, e)
+            return 1
+    if not jobs:
+        logger.warning("Nothing to convert")
+        return 0
+
+    failed = 0
+    start = time.perf_counter()
+    for result in run_batch(jobs, args.jobs, args.in_flight, args.worker_log_level):
+        timings = ", ".join("%s %.2fs" % item for item in result.timings.items())
+        if result.ok:
+            logger.info("%s: %.2fs (%s)", result.job.input, result.seconds, timings)
+        else:
+            failed += 1
+            logger.error("%s: %s", result.job.input, result.error)
+    logger.info(
+        "Converted %i of %i files in %.2fs",
+        len(jobs) - failed,
+        len(jobs),
+        time.perf_counter() - start,
+    )
+    return 1 if failed else 0
+
+
+def serve(argv):
+    """Keep fonts loaded and answer requests about them on a Unix socket."""
+    from context.server import serve as serve_fonts
+
+    parser = argparse.ArgumentParser(
+        prog="context serve",
+        description="Keep Context files loaded in memory and answer JSON-RPC "
+        "requests about them, one per line, on a Unix socket",
+    )
+    _add_log_level(parser)
+    parser.add_argument("--socket", "-s", required=True, help="Path of the socket")
+    args = parser.parse_args(argv)
+    _setup_logging(args.log_level)
+
+    try:
+        serve_fonts(args.socket)
+    except FileExistsError as e:
+        logger.error("Couldn't serve: %s", e)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+COMMANDS = {
+    "check": check,
+    "batch": batch,
+    "serve": serve,
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        prog="context",
+        description="Load and manipulate Context format files",
+        epilog="Other commands: "
+        + ", ".join("context %s" % command for command in COMMANDS),
+    )
+    _add_log_level(parser)
     parser.add_argument(
         "--filter",
         "-f",
@@ -33,48 +204,56 @@ def main():
         action="append",
         choices=FILTERS.keys(),
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="Number of processes to filter and compile glyphs in, or 0 for "
+        "one per CPU (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write how long each stage took to FILE, in Chrome trace format",
+    )
     parser.add_argument("input", metavar="IN", help="Input Context file")
     parser.add_argument("output", metavar="OUT", help="Output Context file")
     args = parser.parse_args()
-
+    _setup_logging(args.log_level)
+    if args.trace:
+        trace.start()
     try:
-        from rich.logging import RichHandler
+        status = _convert(args)
+    finally:
+        if args.trace:
+            trace.save(args.trace)
+    sys.exit(status)
 
-        handlers = [RichHandler()]
-    except ImportError:
-        handlers = [logging.StreamHandler()]
 
-    logging.basicConfig(
-        level=args.log_level, format=LOG_FORMAT, datefmt="[%X]", handlers=handlers
-    )
-
-    try:
-        logger.info("Reading %s", args.input)
-        font = load(args.input)
-    except Exception as e:
-        if args.log_level == "DEBUG":
-            raise e
-        logger.error("Couldn't read %s: %s", args.input, e)
-        sys.exit(1)
+def _convert(args) -> int:
+    with trace.span("Load", file=args.input):
+        font = _load_or_exit(args.input, args.log_level)
 
     filters = args.filter or []
     if args.disable_filter:
         filters = [f for f in filters if f not in args.disable_filter]
 
-    for filter in filters:
-        fltr, filterargs = parse_filter(filter)
-        fltr(font, filterargs)
+    jobs = args.jobs or None
+    with trace.span("Filters", filters=len(filters)):
+        run_filters(font, [parse_filter(f) for f in filters], jobs=jobs)
 
     try:
         logger.info("Saving %s", args.output)
-        font.save(args.output)
+        with trace.span("Save", file=args.output):
+            font.save(args.output, jobs=jobs)
     except Exception as e:
         logger.error("Couldn't write %s: %s", args.output, e)
         if args.log_level == "DEBUG":
             raise e
-        sys.exit(1)
+        return 1
 
-    sys.exit(0)
+    return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+"""Convert many fonts in one run, across a pool of processes.
+
+Each `BatchJob` loads one input file, applies its filters and saves the
+result, in a worker process which is reused for many files, so that the
+interpreter starts and the modules are imported only once per worker. A
+failing file is reported in its `BatchResult` and does not stop the
+others, even if it kills its worker process."""
+
+import glob
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Generator, Iterable, Iterator, List, NamedTuple, Optional
+
+import orjson
+
+
+class BatchJob(NamedTuple):
+    input: str
+    output: str
+    filters: List[str] = []
+
+
+class BatchResult(NamedTuple):
+    job: BatchJob
+    # Seconds spent loading, filtering and saving
+    timings: Dict[str, float]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.timings.values())
+
+
+def read_manifest(filename: str, filters: Iterable[str] = ()) -> List[BatchJob]:
+    """Read jobs from a JSON manifest: a list of objects with ``input`` and
+    ``output`` paths, relative to the manifest, and optionally a list of
+    ``filters`` (by default, ``filters``)."""
+    with open(filename, "rb") as fh:
+        entries = orjson.loads(fh.read())
+    base = os.path.dirname(os.path.abspath(filename))
+    jobs = []
+    for ix, entry in enumerate(entries):
+        if "input" not in entry or "output" not in entry:
+            raise ValueError(
+                "Entry %i of %s needs an input and an output" % (ix, filename)
+            )
+        jobs.append(
+            BatchJob(
+                os.path.join(base, entry["input"]),
+                os.path.join(base, entry["output"]),
+                list(entry.get("filters", filters)),
+            )
+        )
+    return jobs
+
+
+def glob_jobs(
+    pattern: str, output_dir: str, suffix: str, filters: Iterable[str] = ()
+) -> List[BatchJob]:
+    """Jobs saving each file matching ``pattern`` into ``output_dir``, with
+    its extension replaced by ``suffix`` (for example ``.ttf``)."""
+    return [
+        BatchJob(
+            path,
+            os.path.join(
+                output_dir, os.path.splitext(os.path.basename(path))[0] + suffix
+            ),
+            list(filters),
+        )
+        for path in sorted(glob.glob(pattern))
+    ]
+
+
+def convert(job: BatchJob) -> BatchResult:
+    """Load, filter and save one file, catching any error."""
+    from context import load
+    from context.fontFilters import parse_filter, run_filters
+
+    timings = {}
+    stage = "load"
+    start = time.perf_counter()
+    try:
+        font = load(job.input)
+        timings[stage] = time.perf_counter() - start
+
+        stage, start = "filters", time.perf_counter()
+        run_filters(font, [parse_filter(f) for f in job.filters])
+        timings[stage] = time.perf_counter() - start
+
+        stage, start = "save", time.perf_counter()
+        directory = os.path.dirname(job.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The batch is already spread over the processes
+        font.save(job.output, jobs=1)
+        timings[stage] = time.perf_counter() - start
+    except Exception as e:
+        timings[stage] = time.perf_counter() - start
+        return BatchResult(job, timings, "%s failed: %s" % (stage, e))
+    return BatchResult(job, timings)
+
+
+def run_batch(
+    jobs: Iterable[BatchJob],
+    processes: Optional[int] = None,
+    in_flight: Optional[int] = None,
+    log_level=None,
+) -> Iterator[BatchResult]:
+    """Convert the jobs in ``processes`` worker processes (by default, one
+    per CPU), with at most ``in_flight`` jobs (by default, two per process)
+    submitted at a time. Results are yielded as the jobs finish."""
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for job in jobs:
+            yield _convert_here(job, log_level)
+        return
+    in_flight = max(1, in_flight or processes * 2)
+    todo = iter(jobs)
+    # When a worker process dies, every job running in the pool fails with
+    # it. Those jobs are run again one at a time in a new pool, to tell the
+    # job which killed the worker from the others.
+    suspects: List[BatchJob] = []
+    while True:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_start_worker, initargs=(log_level,)
+        ) as pool:
+            broken = yield from _run_pool(pool, todo, suspects, in_flight)
+        if not broken:
+            return
+        if len(broken) == 1:
+            yield BatchResult(broken[0], {}, "the worker process died")
+        else:
+            suspects.extend(broken)
+
+
+def _run_pool(
+    pool: ProcessPoolExecutor,
+    todo: Iterator[BatchJob],
+    suspects: List[BatchJob],
+    in_flight: int,
+) -> Generator[BatchResult, None, List[BatchJob]]:
+    """Run the ``suspects`` one at a time, then the jobs in ``todo``, until
+    they are done or a worker dies. Return the jobs which were running when
+    the pool broke."""
+    running = {}
+    while True:
+        if suspects:
+            if not running:
+                job = suspects.pop(0)
+                running[pool.submit(convert, job)] = job
+        else:
+            for job in todo:
+                running[pool.submit(convert, job)] = job
+                if len(running) >= in_flight:
+                    break
+        if not running:
+            return []
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+            wait(running)
+            done = list(running)
+        broken = []
+        for future in done:
+            job = running.pop(future)
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                broken.append(job)
+            elif error is not None:
+                yield BatchResult(job, {}, "failed: %s" % error)
+            else:
+                yield future.result()
+        if broken:
+            return broken
+
+
+def _start_worker(log_level):
+    if log_level is not None:
+        # Forked workers inherit the parent's handlers
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger().setLevel(log_level)
+
+
+def _convert_here(job: BatchJob, log_level) -> BatchResult:
+    # Converting in this process: the conversion logs at the workers' level,
+    # and the caller's level is back in place for the result
+    if log_level is None:
+        return convert(job)
+    root = logging.getLogger()
+    previous = root.level
+    root.setLevel(log_level)
+    try:
+        return convert(job)
+    finally:
+        root.setLevel(previous)
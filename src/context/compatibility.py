@@ -0,0 +1,153 @@
+"""Check that a font's master layers are compatible for interpolation.
+
+For every glyph, the layer in each master is reduced to a structural
+signature: its contour count, the node types of each contour, the
+components it references and the names of its anchors. Each part of the
+signature is hashed, and the hashes of all glyphs in all masters are
+compared against the default master in a single NumPy operation. Only
+the layers which differ are then examined again to describe the
+problem."""
+
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from context.Font import Font
+    from context.Layer import Layer
+
+# The parts of a layer's structural signature, in array order
+ASPECTS = ("contours", "nodes", "components", "anchors")
+_MISSING = 0
+
+
+class Incompatibility(NamedTuple):
+    """A problem with one glyph's layer in one master."""
+
+    glyph: str
+    master: str
+    kind: str  # "layer" or one of ASPECTS
+    detail: str
+
+    def __str__(self):
+        return f"{self.glyph} in master {self.master}: {self.detail}"
+
+
+class CompatibilityReport:
+    """The result of `check_compatibility`."""
+
+    def __init__(self, incompatibilities: List[Incompatibility], checked: int):
+        self.incompatibilities = incompatibilities
+        self.checked = checked
+
+    @property
+    def compatible(self) -> bool:
+        return not self.incompatibilities
+
+    @property
+    def glyphs(self) -> List[str]:
+        """The names of the incompatible glyphs, in font order."""
+        return list(dict.fromkeys(i.glyph for i in self.incompatibilities))
+
+    def for_glyph(self, glyph: str) -> List[Incompatibility]:
+        return [i for i in self.incompatibilities if i.glyph == glyph]
+
+    def __iter__(self):
+        return iter(self.incompatibilities)
+
+    def __len__(self):
+        return len(self.incompatibilities)
+
+
+def layer_signature(layer: "Layer") -> tuple:
+    """Return the structural signature of a layer, one entry per aspect."""
+    paths = layer.paths
+    return (
+        len(paths),
+        tuple("".join(node.type[0] for node in path.nodes or ()) for path in paths),
+        tuple(c.ref for c in layer.components),
+        tuple(sorted(a.name for a in layer.anchors)),
+    )
+
+
+def _hash(value) -> int:
+    # Reserve zero for missing layers
+    return hash(value) or 1
+
+
+def check_compatibility(
+    font: "Font", glyphs: Optional[Iterable[str]] = None
+) -> CompatibilityReport:
+    """Check that every glyph (or every glyph in ``glyphs``) has a layer
+    in each master with the same structure as its default master layer.
+    Sparse masters may omit layers. All incompatibilities are reported,
+    not just the first."""
+    masters = font.masters
+    default_index = masters.index(font.default_master)
+    names = list(font.glyphs.keys()) if glyphs is None else list(glyphs)
+    layers = font._layers_by_master(None if glyphs is None else names)
+    master_names = [m.name.get_default() for m in masters]
+
+    empty = (_MISSING,) * len(ASPECTS)
+    columns = []
+    for master_layers in layers:
+        column = []
+        for name in names:
+            layer = master_layers.get(name)
+            if layer is None:
+                column.append(empty)
+            else:
+                column.append(tuple(_hash(part) for part in layer_signature(layer)))
+        columns.append(column)
+    # (glyphs, masters, aspects)
+    signatures = np.array(columns, dtype=np.int64).reshape(
+        len(masters), len(names), len(ASPECTS)
+    )
+    signatures = signatures.transpose(1, 0, 2)
+
+    present = signatures[:, :, 0] != _MISSING
+    reference = signatures[:, default_index : default_index + 1]
+    mismatched = (signatures != reference) & present[:, :, None]
+    mismatched &= present[:, default_index, None, None]
+    sparse = np.array([m.sparse for m in masters], dtype=bool)
+    missing = ~present & ~sparse[None, :]
+
+    problems = {}
+    for gix, mix in zip(*np.nonzero(missing)):
+        problems.setdefault((gix, mix), []).append(
+            Incompatibility(names[gix], master_names[mix], "layer", "no layer")
+        )
+    for gix, mix in zip(*np.nonzero(mismatched.any(axis=2))):
+        name = names[gix]
+        expected = layer_signature(layers[default_index][name])
+        actual = layer_signature(layers[mix][name])
+        problems.setdefault((gix, mix), []).extend(
+            Incompatibility(name, master_names[mix], kind, detail)
+            for kind, detail in _describe(expected, actual)
+        )
+    incompatibilities = [i for key in sorted(problems) for i in problems[key]]
+    return CompatibilityReport(incompatibilities, len(names))
+
+
+def _describe(expected: tuple, actual: tuple):
+    contours, nodes, components, anchors = zip(expected, actual)
+    if contours[0] != contours[1]:
+        yield "contours", "has %i contours, expected %i" % (contours[1], contours[0])
+    elif nodes[0] != nodes[1]:
+        for ix, (want, got) in enumerate(zip(*nodes)):
+            if want != got:
+                yield "nodes", "contour %i has nodes %r, expected %r" % (ix, got, want)
+    if components[0] != components[1]:
+        yield "components", "has components %s, expected %s" % (
+            ", ".join(components[1]) or "none",
+            ", ".join(components[0]) or "none",
+        )
+    if anchors[0] != anchors[1]:
+        lacking = sorted(set(anchors[0]) - set(anchors[1]))
+        extra = sorted(set(anchors[1]) - set(anchors[0]))
+        parts = []
+        if lacking:
+            parts.append("missing anchors " + ", ".join(lacking))
+        if extra:
+            parts.append("extra anchors " + ", ".join(extra))
+        yield "anchors", "; ".join(parts)
@@ -0,0 +1,20 @@
+"""Compile Context fonts to OpenType binaries.
+
+The compiler works directly from the object model: outlines come from the
+master layers, metrics and names from the font, and OpenType layout from
+the feature code and anchors via `context.fontFilters.featureWriters`.
+The font itself is never modified; use the usual filters (for example
+``dropUnexportedGlyphs`` or ``renameGlyphs``) before compiling if their
+effects are wanted in the binary."""
+
+from context.compiler.session import CompileSession
+from context.compiler.static import FORMATS, compile_static, glyph_order
+from context.compiler.variable import compile_variable
+
+__all__ = [
+    "FORMATS",
+    "CompileSession",
+    "compile_static",
+    "compile_variable",
+    "glyph_order",
+]
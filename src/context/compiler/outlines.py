@@ -0,0 +1,194 @@
+"""Compile glyph outlines, optionally across a pool of processes.
+
+Layers are first reduced to tuples of numbers and strings in the calling
+process, decomposing any components which the output cannot express, so
+that only small picklable data is sent to the worker processes."""
+
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from fontTools.cu2qu import curves_to_quadratic
+from fontTools.misc.transform import Identity, Transform
+from fontTools.pens.cu2quPen import Cu2QuPointPen
+from fontTools.pens.pointPen import PointToSegmentPen, ReverseContourPointPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPointPen
+
+from context import trace
+from context.Layer import Layer
+
+log = logging.getLogger(__name__)
+
+# Below this many glyphs, starting worker processes costs more than it saves
+POOL_MIN_GLYPHS = 256
+
+Point = Tuple[float, float, Optional[str]]
+
+
+class OutlineData(NamedTuple):
+    """A glyph's outline in one master, reduced to plain data."""
+
+    name: str
+    width: float
+    contours: Tuple[Tuple[Point, ...], ...]
+    components: Tuple[Tuple[str, Tuple[float, ...]], ...]
+
+    @property
+    def has_curves(self) -> bool:
+        return any(point[2] == "curve" for c in self.contours for point in c)
+
+    @property
+    def structure(self) -> tuple:
+        """The point types and component references, which must match
+        between masters for the outlines to interpolate."""
+        return (
+            tuple(tuple(point[2] for point in c) for c in self.contours),
+            tuple(ref for ref, _ in self.components),
+        )
+
+
+def outline_data(
+    name: str,
+    layer: Layer,
+    layers: Dict[str, Layer],
+    decompose: Callable[[Layer, str, Transform], bool],
+) -> OutlineData:
+    """Reduce ``layer`` to an `OutlineData`. ``layers`` maps glyph names to
+    their layers in the same master, and ``decompose(layer, ref, transform)``
+    decides whether a component is replaced by its outlines."""
+    contours = list(_contours(layer, Identity))
+    components = []
+    for component in layer.components:
+        transform = Transform(*component.transform) if component.transform else Identity
+        if decompose(layer, component.ref, transform):
+            contours.extend(_flatten(component.ref, transform, layers, name))
+        else:
+            components.append((component.ref, tuple(transform)))
+    return OutlineData(name, layer.width, tuple(contours), tuple(components))
+
+
+def _contours(layer: Layer, transform: Transform):
+    for path in layer.paths:
+        if transform is Identity:
+            yield tuple((n.x, n.y, n.pen_type) for n in path.nodes)
+        else:
+            yield tuple(
+                transform.transformPoint((n.x, n.y)) + (n.pen_type,) for n in path.nodes
+            )
+
+
+def _flatten(ref: str, transform: Transform, layers: Dict[str, Layer], within: str):
+    layer = layers.get(ref)
+    if layer is None:
+        log.warning("Glyph %s uses missing component %s; skipping it", within, ref)
+        return
+    yield from _contours(layer, transform)
+    for component in layer.components:
+        inner = Transform(*component.transform) if component.transform else Identity
+        yield from _flatten(component.ref, transform.transform(inner), layers, within)
+
+
+def _draw(data: OutlineData, pen):
+    for contour in data.contours:
+        pen.beginPath()
+        for x, y, segment_type in contour:
+            pen.addPoint((x, y), segmentType=segment_type)
+        pen.endPath()
+    for ref, transform in data.components:
+        pen.addComponent(ref, transform)
+
+
+def compile_ttf_glyph(data: OutlineData, max_err: float, reverse_direction: bool):
+    """Compile a `glyf` table glyph, converting cubic curves to quadratic."""
+    # Components which glyf cannot express were decomposed by outline_data
+    pen = TTGlyphPointPen(
+        {ref for ref, _ in data.components}, handleOverflowingTransforms=False
+    )
+    if data.has_curves:
+        _draw(data, Cu2QuPointPen(pen, max_err, reverse_direction=reverse_direction))
+    elif reverse_direction:
+        _draw(data, ReverseContourPointPen(pen))
+    else:
+        _draw(data, pen)
+    return pen.glyph()
+
+
+def compatible_quadratic(
+    datas: Sequence[OutlineData], max_err: float
+) -> List[OutlineData]:
+    """Convert the cubic curves of the same glyph in several masters to
+    quadratic curves with the same number of points in every master. The
+    outlines must have the same `OutlineData.structure`."""
+    if not any(data.has_curves for data in datas):
+        return list(datas)
+    converted = zip(
+        *(
+            _quadratic_contours([data.contours[i] for data in datas], max_err)
+            for i in range(len(datas[0].contours))
+        )
+    )
+    return [
+        data._replace(contours=contours) for data, contours in zip(datas, converted)
+    ]
+
+
+def _quadratic_contours(contours, max_err: float):
+    first = contours[0]
+    if not any(point[2] == "curve" for point in first):
+        return contours
+    count = len(first)
+    results = [[] for _ in contours]
+    for i, (_, _, segment_type) in enumerate(first):
+        if segment_type is None:
+            continue
+        # Off-curve points belong to the next on-curve point, wrapping
+        # around the start of closed contours
+        start = i - 1
+        while start > i - count and first[start % count][2] is None:
+            start -= 1
+        if segment_type == "curve" and i - start == 3:
+            curves = [[c[k % count][:2] for k in range(start, i + 1)] for c in contours]
+            splines = curves_to_quadratic(curves, [max_err] * len(curves))
+            for result, spline, c in zip(results, splines, contours):
+                result.extend((x, y, None) for x, y in spline[1:-1])
+                result.append((c[i][0], c[i][1], "qcurve"))
+        else:
+            for result, c in zip(results, contours):
+                result.extend(c[k % count] for k in range(start + 1, i + 1))
+    return [tuple(result) for result in results]
+
+
+def compile_cff_glyph(data: OutlineData) -> list:
+    """Compile a Type 2 charstring program for a glyph with no components."""
+    pen = T2CharStringPen(data.width, None)
+    _draw(data, PointToSegmentPen(pen))
+    return pen.getCharString().program
+
+
+def compile_outlines(
+    items: Sequence, worker: Callable, jobs: Optional[int] = None
+) -> List:
+    """Apply ``worker`` to each item, in a pool of ``jobs`` processes (by
+    default, one per CPU) if there are enough items to make it worthwhile.
+    ``worker`` must be picklable, for example a module-level function or a
+    `functools.partial` of one."""
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(items) < POOL_MIN_GLYPHS:
+        jobs = 1
+    with trace.span("Compile outlines", glyphs=len(items), jobs=jobs):
+        if jobs == 1:
+            return [worker(item) for item in items]
+        chunksize = max(1, len(items) // (jobs * 4))
+        log.debug("Compiling %i outlines in %i processes", len(items), jobs)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(worker, items, chunksize=chunksize))
+
+
+def ttf_worker(max_err: float, reverse_direction: bool) -> Callable:
+    return functools.partial(
+        compile_ttf_glyph, max_err=max_err, reverse_direction=reverse_direction
+    )
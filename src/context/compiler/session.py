@@ -0,0 +1,338 @@
+"""Keep a compiled font up to date with edits to the object model.
+
+A `CompileSession` compiles a font once, and afterwards recompiles only
+what the objects which are dirty in the ``DIRTY_COMPILE`` context affect:
+the outlines and metrics of edited glyphs (and of the glyphs which use
+them as components), the character map if codepoints changed, and the
+layout tables if the feature code, anchors or glyph categories changed.
+Anything else (masters, axes, names, adding or removing glyphs, ...)
+causes a full compile."""
+
+import functools
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.ttLib import TTFont
+
+from context.BaseObject import DIRTY_COMPILE
+from context.Font import Font
+from context.Layer import Layer
+from context.fontFilters.featureWriters import CACHED_TABLES, build_all_features
+
+from .outlines import OutlineData, compile_outlines, ttf_worker
+from .static import FORMATS, build_static, character_map, master_outlines
+from .variable import (
+    add_matrices,
+    advance_widths,
+    build_variable,
+    glyph_items,
+    update_hvar,
+    variable_glyph,
+)
+
+# Glyph fields which change the glyph order
+_ORDER_FIELDS = {"name", "exported"}
+
+
+class _Changes(NamedTuple):
+    glyphs: Set[str]
+    cmap: bool
+    layout: bool
+
+    def __bool__(self):
+        return bool(self.glyphs or self.cmap or self.layout)
+
+
+class CompileSession:
+    """A compiled TrueType binary of a font, which `update` keeps in step
+    with edits to the font.
+
+    Fonts with axes and several masters are compiled as variable fonts
+    unless ``variable`` is false. Only edits which mark objects dirty are
+    seen: assigning to a field does, but changing a list in place (for
+    example ``layer.shapes.append(...)``) must be followed by
+    ``layer.mark_dirty(DIRTY_COMPILE)``.
+
+    After each `update`, ``recompiled`` holds the names of the glyphs
+    whose outlines were recompiled and ``full`` tells whether the whole
+    font was."""
+
+    def __init__(
+        self,
+        font: Font,
+        format: str = "ttf",
+        variable: Optional[bool] = None,
+        jobs: Optional[int] = None,
+    ):
+        if format not in FORMATS:
+            raise ValueError(
+                "Unknown format %s; expected one of %s" % (format, FORMATS)
+            )
+        if variable is None:
+            variable = format == "ttf" and bool(font.axes) and len(font.masters) > 1
+        self.font = font
+        self.format = format
+        self.variable = variable
+        self.jobs = jobs
+        self.ttFont: Optional[TTFont] = None
+        self.recompiled: Set[str] = set()
+        self.full = False
+
+    def update(self) -> TTFont:
+        """Bring the compiled font up to date and return it."""
+        changes = self._changes() if self.ttFont is not None else None
+        if changes is None:
+            self._compile()
+        else:
+            self.full = False
+            self.recompiled = set()
+            if changes:
+                self.font._clear_caches()
+                if not self._apply(changes):
+                    self._compile()
+                    changes = None
+        self._mark_clean(changes)
+        return self.ttFont
+
+    def _compile(self):
+        font = self.font
+        font._clear_caches()
+        if self.variable:
+            self.ttFont, items, self._matrices = build_variable(font, self.jobs)
+            order = self.ttFont.getGlyphOrder()
+            self._widths = dict(zip(order, map(advance_widths, items)))
+            self._curves = {
+                name
+                for name, (_, datas) in zip(order, items)
+                if any(data.has_curves for data in datas)
+            }
+        else:
+            self.ttFont, outlines = build_static(font, self.format, self.jobs)
+            self._curves = {data.name for data in outlines if data.has_curves}
+        self._glyph_set = (id(font.glyphs), font.glyphs.version)
+        self._hvar_rows: Dict[str, int] = {}
+        # Kept up to date with the edited glyphs, so that updates need not
+        # look at every glyph of the font
+        self._layers: List[Dict[str, Layer]] = font._layers_by_master()
+        self._components: Dict[str, Set[str]] = {}
+        self._users: Dict[str, Set[str]] = {}
+        self._index_components(font.glyphs.keys())
+        self.full = True
+        self.recompiled = set(self.ttFont.getGlyphOrder())
+
+    def _changes(self) -> Optional[_Changes]:
+        """What needs recompiling, or ``None`` if everything does."""
+        font = self.font
+        if not font.is_dirty(DIRTY_COMPILE):
+            return _Changes(set(), False, False)
+        # Binary CFF charstrings are not updated in place
+        if self.format != "ttf":
+            return None
+        if (id(font.glyphs), font.glyphs.version) != self._glyph_set:
+            return None
+        if font.get_dirty_fields(DIRTY_COMPILE) - {"features"}:
+            return None
+        others = [*font.masters, *font.axes, *font.instances, font.names]
+        if any(obj.is_dirty(DIRTY_COMPILE) for obj in others):
+            return None
+
+        layout = "features" in font.get_dirty_fields(DIRTY_COMPILE) or (
+            font.features.is_dirty(DIRTY_COMPILE)
+        )
+        glyphs = set()
+        cmap = False
+        for glyph in font.glyphs:
+            if not glyph.is_dirty(DIRTY_COMPILE):
+                continue
+            fields = glyph.get_dirty_fields(DIRTY_COMPILE)
+            if fields & _ORDER_FIELDS:
+                return None
+            cmap = cmap or "codepoints" in fields
+            layout = layout or "category" in fields
+            dirty_layers = [
+                layer for layer in glyph.layers if layer.is_dirty(DIRTY_COMPILE)
+            ]
+            if "layers" in fields or dirty_layers:
+                glyphs.add(glyph.name)
+            if "layers" in fields or any(map(_anchors_dirty, dirty_layers)):
+                layout = True
+        return _Changes(glyphs, cmap, layout)
+
+    def _apply(self, changes: _Changes) -> bool:
+        """Recompile the changed parts of the font. Return false if they
+        cannot be recompiled on their own."""
+        ttFont = self.ttFont
+        order = ttFont.getGlyphOrder()
+        if changes.glyphs:
+            self._index_glyphs(changes.glyphs)
+            names = _with_users(self._users, changes.glyphs)
+            names = [name for name in order if name in names]
+            if names and not self._recompile(names):
+                return False
+        if changes.cmap:
+            FontBuilder(font=ttFont).setupCharacterMap(character_map(self.font, order))
+        if changes.layout:
+            for tag in CACHED_TABLES:
+                if tag in ttFont:
+                    del ttFont[tag]
+            build_all_features(self.font, ttFont)
+        return True
+
+    def _index_glyphs(self, names: Set[str]):
+        """Update the layers of each master and the users of components
+        after the glyphs in ``names`` were edited."""
+        for layers, edited in zip(self._layers, self.font._layers_by_master(names)):
+            for name in names:
+                layers.pop(name, None)
+            layers.update(edited)
+        self._index_components(names)
+
+    def _index_components(self, names: Iterable[str]):
+        glyphs = self.font.glyphs
+        for name in names:
+            refs = {
+                component.ref
+                for layer in glyphs[name].layers
+                for component in layer.components
+            }
+            old = self._components.get(name, set())
+            for ref in old - refs:
+                self._users[ref].discard(name)
+            for ref in refs - old:
+                self._users.setdefault(ref, set()).add(name)
+            self._components[name] = refs
+
+    def _recompile(self, names: List[str]) -> bool:
+        font = self.font
+        order = self.ttFont.getGlyphOrder()
+        if self.variable:
+            items = glyph_items(font, order, names, self._layers)
+            curves = {
+                name
+                for name, (_, datas) in zip(names, items)
+                if any(data.has_curves for data in datas)
+            }
+        else:
+            outlines = [
+                data or OutlineData(name, 0, (), ())
+                for name, data in zip(
+                    names,
+                    master_outlines(
+                        font,
+                        font.default_master,
+                        order,
+                        True,
+                        glyphs=names,
+                        by_master=self._layers,
+                    ),
+                )
+            ]
+            curves = {data.name for data in outlines if data.has_curves}
+        # The contour direction depends on whether any glyph has curves
+        all_curves = (self._curves - set(names)) | curves
+        if bool(all_curves) != bool(self._curves):
+            return False
+        self._curves = all_curves
+
+        max_err = font.upm / 1000
+        glyf = self.ttFont["glyf"]
+        if self.variable:
+            default_index = font.masters.index(font.default_master)
+            add_matrices(self._matrices, font.variation_model(), items, default_index)
+            worker = functools.partial(
+                variable_glyph,
+                matrices=self._matrices,
+                max_err=max_err,
+                reverse_direction=bool(self._curves),
+                optimize=True,
+            )
+            results = compile_outlines(items, worker, self.jobs)
+            gvar = self.ttFont["gvar"]
+            default_widths = {}
+            changed_widths = {}
+            for name, item, (glyph, variations) in zip(names, items, results):
+                glyf[name] = glyph
+                if variations:
+                    gvar.variations[name] = variations
+                else:
+                    gvar.variations.pop(name, None)
+                present, datas = item
+                default_widths[name] = round(
+                    datas[self._matrices[present].default].width
+                )
+                widths = advance_widths(item)
+                if widths != self._widths[name]:
+                    changed_widths[name] = self._widths[name] = widths
+            if changed_widths:
+                update_hvar(
+                    self.ttFont, changed_widths, self._matrices, self._hvar_rows
+                )
+        else:
+            worker = ttf_worker(max_err, reverse_direction=bool(self._curves))
+            for data, glyph in zip(
+                outlines, compile_outlines(outlines, worker, self.jobs)
+            ):
+                glyf[data.name] = glyph
+            default_widths = {data.name: round(data.width) for data in outlines}
+
+        hmtx = self.ttFont["hmtx"]
+        for name in _by_depth(glyf, names):
+            glyph = glyf[name]
+            glyph.recalcBounds(glyf)
+            hmtx[name] = (default_widths[name], getattr(glyph, "xMin", 0))
+        self.recompiled = set(names)
+        return True
+
+    def _mark_clean(self, changes: Optional[_Changes]):
+        font = self.font
+        if changes is None:
+            font.mark_clean(DIRTY_COMPILE, recursive=True)
+            return
+        for glyph in font.glyphs:
+            if glyph.is_dirty(DIRTY_COMPILE):
+                glyph.mark_clean(DIRTY_COMPILE, recursive=True)
+        font.features.mark_clean(DIRTY_COMPILE)
+        font.mark_clean(DIRTY_COMPILE)
+
+
+def _anchors_dirty(layer) -> bool:
+    return "anchors" in layer.get_dirty_fields(DIRTY_COMPILE) or any(
+        anchor.is_dirty(DIRTY_COMPILE) for anchor in layer.anchors
+    )
+
+
+def _with_users(users: Dict[str, Set[str]], names: Set[str]) -> Set[str]:
+    """The named glyphs and every glyph which uses one of them as a
+    component, directly or indirectly, given the glyphs which use each
+    glyph as a component."""
+    result = set(names)
+    todo = list(names)
+    while todo:
+        for user in users.get(todo.pop(), ()):
+            if user not in result:
+                result.add(user)
+                todo.append(user)
+    return result
+
+
+def _by_depth(glyf, names: List[str]) -> List[str]:
+    """Order glyphs so that components come before the glyphs using them,
+    as the bounds of a composite glyph depend on its components'."""
+    depths = {}
+
+    def depth(name):
+        if name not in depths:
+            depths[name] = 0
+            glyph = glyf[name]
+            if glyph.isComposite():
+                depths[name] = 1 + max(
+                    (
+                        depth(c.glyphName)
+                        for c in glyph.components
+                        if c.glyphName in glyf
+                    ),
+                    default=0,
+                )
+        return depths[name]
+
+    return sorted(names, key=depth)
@@ -0,0 +1,251 @@
+import logging
+from typing import Collection, Dict, List, Optional, Tuple
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.ttLib import TTFont
+
+from context import trace
+from context.Font import Font
+from context.Layer import Layer
+from context.Master import Master
+from context.fontFilters.featureWriters import build_all_features
+from context.fontFilters.fillOpentype import opentype_values
+
+from .outlines import (
+    OutlineData,
+    compile_cff_glyph,
+    compile_outlines,
+    outline_data,
+    ttf_worker,
+)
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("ttf", "otf")
+
+
+def glyph_order(font: Font) -> List[str]:
+    """The names of the exported glyphs, with ``.notdef`` first."""
+    order = font.exported_glyphs()
+    if ".notdef" in order:
+        order.remove(".notdef")
+    return [".notdef"] + order
+
+
+def compile_static(
+    font: Font,
+    format: str = "ttf",
+    jobs: Optional[int] = None,
+    master: Optional[Master] = None,
+) -> TTFont:
+    """Compile one master of a font (by default, the default master) into
+    a static TrueType (``format="ttf"``) or CFF (``format="otf"``) font.
+
+    Unexported glyphs are left out, and components which refer to them
+    are decomposed. Outlines are compiled in ``jobs`` processes (by
+    default, one per CPU) for large fonts. The font is not modified."""
+    return build_static(font, format, jobs, master)[0]
+
+
+def build_static(
+    font: Font,
+    format: str = "ttf",
+    jobs: Optional[int] = None,
+    master: Optional[Master] = None,
+) -> Tuple[TTFont, List[OutlineData]]:
+    """Like `compile_static`, but also return the outline data of the
+    glyphs, from which parts of the font can be recompiled."""
+    if format not in FORMATS:
+        raise ValueError("Unknown format %s; expected one of %s" % (format, FORMATS))
+    is_ttf = format == "ttf"
+    master = master or font.default_master
+    if master.sparse:
+        raise ValueError("Cannot compile sparse master %s on its own" % master.id)
+    order = glyph_order(font)
+    fb = new_builder(font, order, is_ttf)
+    with trace.span("Collect outlines", glyphs=len(order)):
+        outlines = [
+            data or OutlineData(name, 0, (), ())
+            for name, data in zip(order, master_outlines(font, master, order, is_ttf))
+        ]
+    if is_ttf:
+        metrics = _setup_glyf(fb, font, outlines, jobs)
+    else:
+        metrics = _setup_cff(fb, font, outlines, jobs)
+    setup_tables(fb, font, metrics, master)
+
+    build_all_features(font, fb.font, master=master)
+    return fb.font, outlines
+
+
+def character_map(font: Font, order: List[str]) -> Dict[int, str]:
+    """Map the codepoints of the glyphs in ``order`` to their names."""
+    exported = set(order)
+    return {
+        u: glyph.name
+        for glyph in font.glyphs
+        if glyph.name in exported
+        for u in glyph.codepoints
+        if u is not None
+    }
+
+
+def new_builder(font: Font, order: List[str], is_ttf: bool) -> FontBuilder:
+    """A `FontBuilder` with the glyph order and character map set up."""
+    fb = FontBuilder(font.upm, isTTF=is_ttf)
+    fb.setupGlyphOrder(order)
+    fb.setupCharacterMap(character_map(font, order))
+    return fb
+
+
+def master_outlines(
+    font: Font,
+    master: Master,
+    order: List[str],
+    is_ttf: bool,
+    decomposed: Collection[str] = (),
+    glyphs: Optional[List[str]] = None,
+    by_master: Optional[List[Dict[str, Layer]]] = None,
+) -> List[Optional[OutlineData]]:
+    """Reduce the layers of the glyphs in ``order`` (or only of those in
+    ``glyphs``) in ``master`` to outline data, decomposing components as
+    the format requires, and all components of the glyphs in
+    ``decomposed``. Glyphs which have no layer in the master are ``None``.
+    ``by_master`` saves looking up the layers of all glyphs again if the
+    caller already has them from `Font._layers_by_master`."""
+    exported = set(order)
+    if by_master is None:
+        by_master = font._layers_by_master()
+    layers = by_master[font.masters.index(master)]
+
+    def decompose(layer, ref, transform):
+        if not is_ttf or ref not in exported:
+            return True
+        # glyf glyphs cannot mix contours and components
+        return bool(layer.paths) or overflows(transform)
+
+    outlines = []
+    for name in order if glyphs is None else glyphs:
+        layer = layers.get(name)
+        if layer is None:
+            if name == ".notdef":
+                outlines.append(_notdef(font))
+                continue
+            if not master.sparse:
+                log.warning("Glyph %s has no layer in master %s", name, master.id)
+            outlines.append(None)
+        elif name in decomposed:
+            outlines.append(outline_data(name, layer, layers, lambda *_: True))
+        else:
+            outlines.append(outline_data(name, layer, layers, decompose))
+    return outlines
+
+
+def overflows(transform) -> bool:
+    """Whether a component's scale is outside the F2Dot14 range which glyf
+    tables can store."""
+    return any(not -2 <= value < 2 for value in transform[:4])
+
+
+def _notdef(font: Font) -> OutlineData:
+    width = round(font.upm / 2)
+    stem = round(font.upm / 20)
+    height = round(font.upm * 0.7)
+    outer = (
+        (stem, 0, "line"),
+        (stem, height, "line"),
+        (width - stem, height, "line"),
+        (width - stem, 0, "line"),
+    )
+    inner = (
+        (stem * 2, stem, "line"),
+        (width - stem * 2, stem, "line"),
+        (width - stem * 2, height - stem, "line"),
+        (stem * 2, height - stem, "line"),
+    )
+    return OutlineData(".notdef", width, (outer, inner), ())
+
+
+def _setup_glyf(fb: FontBuilder, font: Font, outlines, jobs) -> Dict:
+    reverse_direction = any(data.has_curves for data in outlines)
+    worker = ttf_worker(max_err=font.upm / 1000, reverse_direction=reverse_direction)
+    glyphs = dict(
+        zip((data.name for data in outlines), compile_outlines(outlines, worker, jobs))
+    )
+    fb.setupGlyf(glyphs)
+    return glyf_metrics(fb, outlines)
+
+
+def glyf_metrics(fb: FontBuilder, outlines) -> Dict:
+    """The advance widths and left side bearings of the glyf glyphs."""
+    glyf = fb.font["glyf"]
+    return {
+        data.name: (round(data.width), getattr(glyf[data.name], "xMin", 0))
+        for data in outlines
+    }
+
+
+def _setup_cff(fb: FontBuilder, font: Font, outlines, jobs) -> Dict:
+    programs = compile_outlines(outlines, compile_cff_glyph, jobs)
+    charstrings = {
+        data.name: T2CharString(program=program)
+        for data, program in zip(outlines, programs)
+    }
+    names = nametable(font)
+    fb.setupCFF(
+        _default_string(names["psName"]),
+        {"FullName": _default_string(names["fullName"])},
+        charstrings,
+        {},
+    )
+    cff_charstrings = fb.font["CFF "].cff.topDictIndex[0].CharStrings
+    metrics = {}
+    for data in outlines:
+        bounds = cff_charstrings[data.name].calcBounds(cff_charstrings)
+        metrics[data.name] = (round(data.width), bounds[0] if bounds else 0)
+    return metrics
+
+
+def setup_tables(fb: FontBuilder, font: Font, metrics: Dict, master: Master):
+    """Add the metrics, naming and other required tables, with the values
+    from ``master``."""
+    fb.setupHorizontalMetrics(metrics)
+    fb.setupHorizontalHeader()
+    fb.setupNameTable(nametable(font))
+    fb.setupOS2()
+    fb.setupPost(keepGlyphNames=fb.isTTF)
+    fb.setupMaxp()
+    apply_opentype_values(font, fb.font, master)
+
+
+def _default_string(value) -> str:
+    if isinstance(value, dict):
+        return value.get("en", next(iter(value.values())))
+    return value
+
+
+def nametable(font: Font) -> Dict:
+    """The font's names for `FontBuilder.setupNameTable`, with the names
+    every font needs filled in if they are not set."""
+    names = font.names.as_nametable_dict()
+    family = font.names.familyName.get_default() or "Untitled"
+    names.setdefault("familyName", family)
+    style = _default_string(names.setdefault("styleName", "Regular"))
+    names.setdefault("fullName", "%s %s" % (family, style))
+    ps_name = names.setdefault("psName", ("%s-%s" % (family, style)).replace(" ", ""))
+    version = names.setdefault("version", "Version %i.%03i" % font.version)
+    names.setdefault(
+        "uniqueFontIdentifier",
+        "%s;%s" % (_default_string(version), _default_string(ps_name)),
+    )
+    return names
+
+
+def apply_opentype_values(font: Font, ttFont: TTFont, master: Optional[Master] = None):
+    """Set the values from `fill_opentype_values` on the font's tables."""
+    for (table, key), value in opentype_values(font, master).items():
+        if table not in ttFont:
+            log.warning("Cannot set %s.%s: no %s table", table, key, table)
+            continue
+        setattr(ttFont[table], key, value)
@@ -0,0 +1,460 @@
+"""Compile a variable TrueType font from all the masters of a font.
+
+The outlines of each glyph in every master are reduced to arrays of
+point coordinates, and the gvar deltas of all the points are found with a
+single matrix product: for a given set of masters, the deltas of the
+variation model's supports are a fixed linear combination of the master
+values, so the matrix of that combination is computed once and applied
+to every glyph. The same matrices give the HVAR deltas of the advance
+widths of all glyphs at once."""
+
+import functools
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.fixedTools import otRound
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables import otTables as ot
+from fontTools.ttLib.tables.TupleVariation import TupleVariation
+from fontTools.varLib.builder import buildVarData, buildVarIdxMap, buildVarRegion
+from fontTools.varLib.models import VariationModel, allEqual, normalizeValue
+from fontTools.varLib.mvar import MVAR_ENTRIES
+from fontTools.varLib.varStore import OnlineVarStoreBuilder
+
+from context import trace
+from context.Font import Font
+from context.Layer import Layer
+from context.fontFilters.featureWriters import build_all_features
+from context.fontFilters.fillOpentype import opentype_values
+
+from .outlines import (
+    OutlineData,
+    compatible_quadratic,
+    compile_outlines,
+    compile_ttf_glyph,
+)
+from .static import (
+    _default_string,
+    glyf_metrics,
+    glyph_order,
+    master_outlines,
+    new_builder,
+    overflows,
+    setup_tables,
+)
+
+log = logging.getLogger(__name__)
+
+# Which masters have a glyph, in the order of Font.masters
+Presence = Tuple[bool, ...]
+
+
+class DeltaMatrix:
+    """The linear map from the values of a set of masters to the deltas
+    of the supports of their variation model."""
+
+    def __init__(self, model: VariationModel, present: Presence, default: int):
+        submodel, _ = model.getSubModel([True if p else None for p in present])
+        count = sum(present)
+        self.supports = submodel.supports
+        self.matrix = np.array(
+            submodel.getDeltas([row.copy() for row in np.eye(count)])
+        )
+        # The position of the default master among the present masters
+        self.default = sum(present[:default])
+
+    def deltas(self, values: np.ndarray) -> np.ndarray:
+        """Return the rounded deltas for ``values``, an array whose first
+        dimension runs over the present masters."""
+        return np.floor(np.tensordot(self.matrix, values, axes=1) + 0.5)
+
+
+def compile_variable(
+    font: Font, jobs: Optional[int] = None, optimize: bool = True
+) -> TTFont:
+    """Compile all masters of a font into a variable TrueType font.
+
+    Glyphs missing from sparse masters, or whose outlines in a master are
+    not compatible with the default master, do not vary in that master.
+    Glyph variations are computed in ``jobs`` processes (by default, one
+    per CPU) for large fonts; if ``optimize`` is true, deltas which can be
+    inferred are dropped from the gvar table. The font is not modified."""
+    return build_variable(font, jobs, optimize)[0]
+
+
+def build_variable(
+    font: Font, jobs: Optional[int] = None, optimize: bool = True
+) -> Tuple[TTFont, List[Tuple[Presence, Tuple[OutlineData, ...]]], Dict]:
+    """Like `compile_variable`, but also return the `glyph_items` of the
+    glyphs and their delta matrices, from which parts of the font can be
+    recompiled."""
+    if not font.axes or len(font.masters) < 2:
+        raise ValueError("A variable font needs axes and at least two masters")
+    default = font.default_master
+    if default.sparse:
+        raise ValueError("The default master %s cannot be sparse" % default.id)
+    default_index = font.masters.index(default)
+    model = font.variation_model()
+    axis_tags = [a.tag for a in font.axes]
+
+    order = glyph_order(font)
+    fb = new_builder(font, order, True)
+    with trace.span("Collect outlines", glyphs=len(order)):
+        items = glyph_items(font, order)
+        matrices = {}
+        add_matrices(matrices, model, items, default_index)
+
+    worker = functools.partial(
+        variable_glyph,
+        matrices=matrices,
+        max_err=font.upm / 1000,
+        reverse_direction=any(d.has_curves for _, datas in items for d in datas),
+        optimize=optimize,
+    )
+    results = compile_outlines(items, worker, jobs)
+    fb.setupGlyf({name: glyph for name, (glyph, _) in zip(order, results)})
+    defaults = [datas[matrices[present].default] for present, datas in items]
+    setup_tables(fb, font, glyf_metrics(fb, defaults), default)
+
+    _setup_fvar(fb, font)
+    _setup_avar(fb.font, font)
+    fb.setupGvar(
+        {
+            name: variations
+            for name, (_, variations) in zip(order, results)
+            if variations
+        }
+    )
+    setup_hvar(fb.font, order, [advance_widths(item) for item in items], matrices)
+    _setup_mvar(fb.font, font, model, axis_tags)
+
+    build_all_features(font, fb.font)
+    return fb.font, items, matrices
+
+
+def glyph_items(
+    font: Font,
+    order: List[str],
+    glyphs: Optional[List[str]] = None,
+    by_master: Optional[List[Dict[str, Layer]]] = None,
+) -> List[Tuple[Presence, Tuple[OutlineData, ...]]]:
+    """For each glyph in ``order`` (or in ``glyphs``), the masters it is
+    present in and its outlines in those masters, ready for `variable_glyph`.
+    ``by_master`` is as for `master_outlines`."""
+    glyphs = order if glyphs is None else glyphs
+    if by_master is None:
+        by_master = font._layers_by_master()
+    default_index = font.masters.index(font.default_master)
+    decomposed = _decomposed_glyphs(by_master, glyphs)
+    outlines = [
+        master_outlines(font, master, order, True, decomposed, glyphs, by_master)
+        for master in font.masters
+    ]
+    return [
+        _glyph_item(font, name, [datas[i] for datas in outlines], default_index)
+        for i, name in enumerate(glyphs)
+    ]
+
+
+def add_matrices(
+    matrices: Dict[Presence, DeltaMatrix],
+    model: VariationModel,
+    items: Sequence[Tuple[Presence, Sequence[OutlineData]]],
+    default_index: int,
+):
+    """Add the delta matrices which ``items`` need to ``matrices``."""
+    for present, _ in items:
+        if present not in matrices:
+            matrices[present] = DeltaMatrix(model, present, default_index)
+
+
+def advance_widths(item: Tuple[Presence, Sequence[OutlineData]]):
+    present, datas = item
+    return present, tuple(otRound(data.width) for data in datas)
+
+
+def _decomposed_glyphs(by_master: List[Dict[str, Layer]], order: List[str]) -> set:
+    """The glyphs whose components must be decomposed in every master,
+    because glyf or gvar cannot express them in one of the masters."""
+    decomposed = set()
+    for name in order:
+        layers = [layers[name] for layers in by_master if name in layers]
+        transforms = set()
+        for layer in layers:
+            if layer.paths and layer.components:
+                decomposed.add(name)
+            for index, component in enumerate(layer.components):
+                transform = tuple(component.transform or (1, 0, 0, 1, 0, 0))
+                if overflows(transform):
+                    decomposed.add(name)
+                # gvar can only vary the offsets of components
+                transforms.add((index, transform[:4]))
+        if len({index for index, _ in transforms}) != len(transforms):
+            decomposed.add(name)
+    return decomposed
+
+
+def _glyph_item(
+    font: Font, name: str, datas: List[Optional[OutlineData]], default_index: int
+) -> Tuple[Presence, Tuple[OutlineData, ...]]:
+    default = datas[default_index]
+    if default is None:
+        # master_outlines has already warned about the missing layer
+        datas = [None] * len(datas)
+        datas[default_index] = default = OutlineData(name, 0, (), ())
+    structure = default.structure
+    for index, data in enumerate(datas):
+        if data is not None and data.structure != structure:
+            log.warning(
+                "Glyph %s in master %s is not compatible with the default master;"
+                " it will not vary there",
+                name,
+                font.masters[index].id,
+            )
+            datas[index] = None
+    present = tuple(data is not None for data in datas)
+    return present, tuple(data for data in datas if data is not None)
+
+
+def _gvar_coordinates(glyph, width: float) -> np.ndarray:
+    if glyph.isComposite():
+        points = np.array([(c.x, c.y) for c in glyph.components], dtype=float)
+    elif glyph.numberOfContours > 0:
+        points = np.array(glyph.coordinates.array, dtype=float).reshape(-1, 2)
+    else:
+        points = np.zeros((0, 2))
+    # The phantom points of the glyph's metrics; the left side bearing
+    # point is at the origin since the lsb is the glyph's xMin.
+    phantoms = np.array([(0, 0), (otRound(width), 0), (0, 0), (0, 0)], dtype=float)
+    return np.concatenate([points.reshape(-1, 2), phantoms])
+
+
+def _end_points(glyph) -> List[int]:
+    if glyph.isComposite():
+        return list(range(len(glyph.components)))
+    if glyph.numberOfContours > 0:
+        return list(glyph.endPtsOfContours)
+    return []
+
+
+def variable_glyph(
+    item: Tuple[Presence, Sequence[OutlineData]],
+    matrices: Dict[Presence, DeltaMatrix],
+    max_err: float,
+    reverse_direction: bool,
+    optimize: bool,
+):
+    """Compile the default glyf glyph and the gvar variations of one glyph
+    from its outlines in the masters where it is present."""
+    present, datas = item
+    matrix = matrices[present]
+    datas = compatible_quadratic(datas, max_err)
+    glyphs = [compile_ttf_glyph(data, max_err, reverse_direction) for data in datas]
+    glyph = glyphs[matrix.default]
+    coordinates = np.stack(
+        [_gvar_coordinates(g, data.width) for g, data in zip(glyphs, datas)]
+    )
+    deltas = matrix.deltas(coordinates).astype(int)
+
+    variations = []
+    origin = [tuple(point) for point in coordinates[matrix.default].tolist()]
+    for support, delta in zip(matrix.supports[1:], deltas[1:]):
+        if not delta.any():
+            continue
+        variation = TupleVariation(support, [tuple(point) for point in delta.tolist()])
+        if optimize:
+            variation.optimize(
+                origin, _end_points(glyph), isComposite=glyph.isComposite()
+            )
+        variations.append(variation)
+    return glyph, variations
+
+
+def _setup_fvar(fb: FontBuilder, font: Font):
+    axes = [
+        (a.tag, a.min, a.default, a.max, a.name.as_fonttools_dict or a.tag)
+        for a in font.axes
+    ]
+    defaults = {a.tag: a.default for a in font.axes}
+    instances = []
+    for instance in font.instances:
+        if instance.variable:
+            continue
+        location = dict(defaults)
+        location.update(font.map_backward(instance.location or {}))
+        instances.append(
+            {
+                "location": location,
+                "stylename": instance.localisedStyleName,
+                "postscriptfontname": (
+                    _default_string(instance.postScriptFontName)
+                    if instance.postScriptFontName
+                    else None
+                ),
+            }
+        )
+    fb.setupFvar(axes, instances)
+    for axis, fvar_axis in zip(font.axes, fb.font["fvar"].axes):
+        if axis.hidden:
+            fvar_axis.flags |= 0x1
+
+
+def _setup_avar(ttFont: TTFont, font: Font):
+    if not any(a.map for a in font.axes):
+        return
+    avar = ttFont["avar"] = newTable("avar")
+    avar.segments = {}
+    for axis in font.axes:
+        segments = avar.segments[axis.tag] = {-1.0: -1.0, 0.0: 0.0, 1.0: 1.0}
+        triple = (axis.min, axis.default, axis.max)
+        for user, design in axis.map or ():
+            segments[normalizeValue(user, triple)] = axis.normalize_designspace_value(
+                design
+            )
+
+
+def setup_hvar(
+    ttFont: TTFont,
+    order: List[str],
+    widths: List[Tuple[Presence, Tuple[int, ...]]],
+    matrices: Dict[Presence, DeltaMatrix],
+):
+    """Build the HVAR table from the advance widths of each glyph in the
+    masters where it is present, as returned by `advance_widths`."""
+    # The widths of all glyphs present in the same masters share a matrix
+    groups = {}
+    for index, (present, _) in enumerate(widths):
+        groups.setdefault(present, []).append(index)
+    axis_tags = [axis.axisTag for axis in ttFont["fvar"].axes]
+    builder = OnlineVarStoreBuilder(axis_tags)
+    var_indices = [None] * len(order)
+    for present, indices in groups.items():
+        matrix = matrices[present]
+        values = np.array([widths[i][1] for i in indices], dtype=float)
+        deltas = matrix.deltas(values.T).T.astype(int)
+        builder.setSupports(matrix.supports)
+        for index, row in zip(indices, deltas.tolist()):
+            var_indices[index] = builder.storeDeltas(row)
+    store = builder.finish()
+    mapping = store.optimize(use_NO_VARIATION_INDEX=False)
+
+    hvar = ttFont["HVAR"] = newTable("HVAR")
+    hvar.table = ot.HVAR()
+    hvar.table.Version = 0x00010000
+    hvar.table.VarStore = store
+    hvar.table.AdvWidthMap = buildVarIdxMap(
+        [mapping[index] for index in var_indices], order
+    )
+    hvar.table.LsbMap = hvar.table.RsbMap = None
+
+
+def update_hvar(
+    ttFont: TTFont,
+    widths: Dict[str, Tuple[Presence, Tuple[int, ...]]],
+    matrices: Dict[Presence, DeltaMatrix],
+    rows: Dict[str, int],
+):
+    """Change the HVAR deltas of the glyphs in ``widths``, which maps their
+    names to their `advance_widths`, and leave the other glyphs alone.
+
+    Rows of the variation store may be shared between glyphs, so the new
+    deltas go into rows of their own. ``rows`` maps glyph names to the
+    rows earlier updates added, which are overwritten rather than adding
+    more rows each time a glyph changes."""
+    hvar = ttFont["HVAR"].table
+    store = hvar.VarStore
+    axis_tags = [axis.axisTag for axis in ttFont["fvar"].axes]
+    region_list = store.VarRegionList.Region
+    regions = {
+        _region_key(
+            {
+                tag: (axis.StartCoord, axis.PeakCoord, axis.EndCoord)
+                for tag, axis in zip(axis_tags, region.VarRegionAxis)
+            }
+        ): index
+        for index, region in enumerate(region_list)
+    }
+    var_datas = {
+        tuple(data.VarRegionIndex): ix for ix, data in enumerate(store.VarData)
+    }
+    changed = set()
+    for name, (present, values) in widths.items():
+        matrix = matrices[present]
+        deltas = matrix.deltas(np.array(values, dtype=float)).astype(int).tolist()
+        supports = matrix.supports
+        # The default master's support carries no deltas
+        if supports and not supports[0]:
+            supports, deltas = supports[1:], deltas[1:]
+        region_indices = []
+        for support in supports:
+            key = _region_key(support)
+            if key not in regions:
+                regions[key] = len(region_list)
+                region_list.append(buildVarRegion(support, axis_tags))
+            region_indices.append(regions[key])
+        region_indices = tuple(region_indices)
+
+        var_idx = rows.get(name)
+        if var_idx is None or (
+            tuple(store.VarData[var_idx >> 16].VarRegionIndex) != region_indices
+        ):
+            outer = var_datas.get(region_indices)
+            if outer is None or len(store.VarData[outer].Item) == 0xFFFF:
+                outer = var_datas[region_indices] = len(store.VarData)
+                store.VarData.append(buildVarData(region_indices, [], optimize=False))
+            data = store.VarData[outer]
+            var_idx = rows[name] = (outer << 16) | len(data.Item)
+            data.Item.append(deltas)
+        else:
+            store.VarData[var_idx >> 16].Item[var_idx & 0xFFFF] = deltas
+        changed.add(var_idx >> 16)
+        hvar.AdvWidthMap.mapping[name] = var_idx
+
+    for outer in changed:
+        data = store.VarData[outer]
+        data.ItemCount = len(data.Item)
+        data.calculateNumShorts()
+    store.VarDataCount = len(store.VarData)
+    store.VarRegionList.RegionCount = len(region_list)
+
+
+def _region_key(support: Dict[str, Tuple[float, float, float]]) -> tuple:
+    # Axes on which a region does not peak do not limit it
+    return tuple(sorted(item for item in support.items() if item[1][1] != 0))
+
+
+def _setup_mvar(
+    ttFont: TTFont, font: Font, model: VariationModel, axis_tags: List[str]
+):
+    # Sparse masters do not carry font-wide metrics
+    model, masters = model.getSubModel([None if m.sparse else m for m in font.masters])
+    values = [opentype_values(font, master) for master in masters]
+    builder = OnlineVarStoreBuilder(axis_tags)
+    builder.setModel(model)
+    records = []
+    for tag, key in sorted(MVAR_ENTRIES.items()):
+        master_values = [v.get(key) for v in values]
+        if None in master_values or allEqual(master_values):
+            continue
+        _, var_index = builder.storeMasters(master_values)
+        record = ot.MetricsValueRecord()
+        record.ValueTag = tag
+        record.VarIdx = var_index
+        records.append(record)
+    if not records:
+        return
+    store = builder.finish()
+    mapping = store.optimize()
+    for record in records:
+        record.VarIdx = mapping[record.VarIdx]
+
+    mvar = ttFont["MVAR"] = newTable("MVAR")
+    mvar.table = ot.MVAR()
+    mvar.table.Version = 0x00010000
+    mvar.table.Reserved = 0
+    mvar.table.VarStore = store
+    mvar.table.ValueRecordSize = 8
+    mvar.table.ValueRecordCount = len(records)
+    mvar.table.ValueRecord = records
@@ -1,6 +1,6 @@
 import logging
 
-from context.fontFilters import parse_filter
+from context.fontFilters import parse_filter, run_filters
 
 logger = logging.getLogger(__name__)
 
@@ -40,9 +40,7 @@ class BaseConvertor:
         self.compile_only = compile_only
         loaded = self._load()
         if filters:
-            for f in cls.LOAD_FILTERS:
-                fltr, filterargs = parse_filter(f)
-                fltr(loaded, filterargs)
+            run_filters(loaded, [parse_filter(f) for f in cls.LOAD_FILTERS])
 
         return loaded
 
@@ -53,6 +51,7 @@ class BaseConvertor:
         # Pass on information to child
         self.filename = convertor.filename
         self.scratch = convertor.scratch
+        self.kwargs = kwargs
         return self._save()
 
     def _load(self):
@@ -67,18 +66,23 @@ class Convert:
         self.filename = filename
         self.scratch = {}
 
-    def load_convertor(self, **kwargs):
+    @staticmethod
+    def convertors():
         from context.convertors.nfsf import Context
+        from context.convertors.opentype import OpenType
+
+        return [Context, OpenType]
 
-        if Context.can_load(self, **kwargs):
-            return Context
+    def load_convertor(self, **kwargs):
+        for c in self.convertors():
+            if c.can_load(self, **kwargs):
+                return c
         return None
 
     def save_convertor(self, **kwargs):
-        from context.convertors.nfsf import Context
-
-        if Context.can_save(self, **kwargs):
-            return Context
+        for c in self.convertors():
+            if c.can_save(self, **kwargs):
+                return c
         return None
 
     def load(self, **kwargs):
@@ -11,6 +11,7 @@ from context import (
     Node,
     Shape,
 )
+from context import stats, trace
 from context.convertors import BaseConvertor
 from pathlib import Path
 import orjson
@@ -28,9 +29,27 @@ class Context(BaseConvertor):
         return orjson.loads(contents)
 
     def _load(self):
-        names = self._load_file("names.json")
-        info = self._load_file("info.json")
-        glyphs = self._load_file("glyphs.json")
+        with trace.span("Parse JSON", file=self.filename) as args:
+            names = self._load_file("names.json")
+            info = self._load_file("info.json")
+            glyphs = [Glyph(**g) for g in self._load_file("glyphs.json")]
+            layers = [self._load_file(glyph.babelfont_filename) for glyph in glyphs]
+            args["glyphs"] = len(glyphs)
+        with trace.span("Inflate objects", glyphs=len(glyphs)):
+            self._inflate(names, info, glyphs, layers)
+        with trace.span("Load features"):
+            self._load_features()
+
+        # Store the filename for later saving
+        self.font.filename = self.filename
+
+        # Mark entire font as clean for file_saving since it matches disk state
+        # But keep dirty for canvas_render so UI knows to draw
+        self._mark_all_clean_for_file_saving(self.font)
+
+        return self.font
+
+    def _inflate(self, names, info, glyphs, layers):
         self.font._formatspecific = info.get("_", {})
         for k, v in names.items():
             if k in self.font.names.__dataclass_fields__:
@@ -50,27 +69,10 @@ class Context(BaseConvertor):
 
         self._load_masters(info.get("masters", []))
 
-        for g in glyphs:
-            glyph = Glyph(**g)
-            glyph._set_parent(self.font)
-            self.font.glyphs.append(glyph)
-            for json_layer in self._load_file(glyph.babelfont_filename):
-                layer = self._inflate_layer(json_layer)
-                layer._glyph = glyph
-                layer._set_parent(glyph)
-                glyph.layers.append(layer)
+        for glyph, json_layers in zip(glyphs, layers):
+            self._inflate_glyph(glyph, json_layers)
 
         self._load_metadata(info)
-        self._load_features()
-
-        # Store the filename for later saving
-        self.font.filename = self.filename
-
-        # Mark entire font as clean for file_saving since it matches disk state
-        # But keep dirty for canvas_render so UI knows to draw
-        self._mark_all_clean_for_file_saving(self.font)
-
-        return self.font
 
     def _mark_all_clean_for_file_saving(self, obj):
         """Recursively mark object and children as clean for file_saving."""
@@ -132,6 +134,19 @@ class Context(BaseConvertor):
                 guide._set_parent(master)
             self.font.masters.append(master)
 
+    def _inflate_glyph(self, glyph, json_layers):
+        glyph._set_parent(self.font)
+        self.font.glyphs.append(glyph)
+        glyph.layers.extend(self._inflate_layers(glyph, json_layers))
+        return glyph
+
+    def _inflate_layers(self, glyph, json_layers):
+        layers = [self._inflate_layer(json_layer) for json_layer in json_layers]
+        for layer in layers:
+            layer._glyph = glyph
+            layer._set_parent(glyph)
+        return layers
+
     def _inflate_layer(self, json_layer):
         # Extract components if present, they'll be added to shapes
         components = json_layer.pop("components", [])
@@ -160,6 +175,8 @@ class Context(BaseConvertor):
         shape._set_parent(layer)
         if shape.nodes:
             shape.nodes = [self._inflate_node(n) for n in shape.nodes]
+            if stats.enabled:
+                stats.count("nodes.inflated", len(shape.nodes))
             # Nodes don't inherit from BaseObject, so no parent ref needed
         return shape
 
@@ -187,20 +204,23 @@ class Context(BaseConvertor):
         path = Path(self.filename)
         path.mkdir(parents=True, exist_ok=True)
 
-        with open(path / "info.json", "wb") as f:
-            self.font.write(stream=f)
-
-        with open(path / "names.json", "wb") as f:
-            self.font._write_value(f, "glyphs", self.font.names)
-
-        with open(path / "features.fea", "w") as f:
-            if self.font.features:
-                f.write(self.font.features.to_fea())
-
-        with open(path / "glyphs.json", "wb") as f:
-            for g in self.font.glyphs:
-                glyphpath = path / "glyphs"
-                glyphpath.mkdir(parents=True, exist_ok=True)
-                with open(path / g.babelfont_filename, "wb") as f2:
-                    g._write_value(f2, "layers", g.layers)
-            self.font._write_value(f, "glyphs", self.font.glyphs)
+        with trace.span("Write info", file=self.filename):
+            with open(path / "info.json", "wb") as f:
+                self.font.write(stream=f)
+
+            with open(path / "names.json", "wb") as f:
+                self.font._write_value(f, "glyphs", self.font.names)
+
+        with trace.span("Write features"):
+            with open(path / "features.fea", "w") as f:
+                if self.font.features:
+                    f.write(self.font.features.to_fea())
+
+        with trace.span("Write glyphs", glyphs=len(self.font.glyphs)):
+            with open(path / "glyphs.json", "wb") as f:
+                for g in self.font.glyphs:
+                    glyphpath = path / "glyphs"
+                    glyphpath.mkdir(parents=True, exist_ok=True)
+                    with open(path / g.babelfont_filename, "wb") as f2:
+                        g._write_value(f2, "layers", g.layers)
+                self.font._write_value(f, "glyphs", self.font.glyphs)
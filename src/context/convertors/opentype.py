@@ -0,0 +1,47 @@
+from context import trace
+from context.convertors import BaseConvertor
+
+
+class OpenType(BaseConvertor):
+    """Compiles a font to a TrueType (``.ttf``) or CFF (``.otf``) binary.
+
+    Fonts with axes and several masters are saved as variable TrueType
+    fonts, unless ``variable=False`` is passed to `Font.save`; CFF output
+    is always static. ``jobs`` sets the number of processes used to
+    compile outlines."""
+
+    suffix = ".ttf"
+    SUFFIXES = {".ttf": "ttf", ".otf": "otf"}
+
+    @classmethod
+    def can_load(cls, other, **kwargs):
+        return False
+
+    @classmethod
+    def can_save(cls, other, **kwargs):
+        return any(other.filename.lower().endswith(s) for s in cls.SUFFIXES)
+
+    def _save(self):
+        from context.compiler import compile_static, compile_variable
+
+        format = self.SUFFIXES[self.filename[-4:].lower()]
+        jobs = self.kwargs.get("jobs")
+        variable = (
+            format == "ttf"
+            and self.kwargs.get("variable", True)
+            and self.font.axes
+            and len(self.font.masters) > 1
+        )
+        with trace.span(
+            "Compile",
+            format=format,
+            variable=bool(variable),
+            glyphs=len(self.font.glyphs),
+        ):
+            if variable:
+                ttFont = compile_variable(self.font, jobs=jobs)
+            else:
+                ttFont = compile_static(self.font, format=format, jobs=jobs)
+        with trace.span("Write binary", file=self.filename):
+            ttFont.save(self.filename)
+        return ttFont
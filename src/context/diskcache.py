@@ -0,0 +1,151 @@
+"""A small persistent cache of compiled data.
+
+Entries are byte strings stored in one file each, named by a hash of
+whatever they were computed from. Reading an entry touches its file, so
+the modification times order the entries from least to most recently
+used, and the oldest entries are evicted whenever the cache grows beyond
+its size limit.
+
+The cache lives in ``$CONTEXT_CACHE_DIR``, or in ``context`` inside the
+user's cache directory. Setting ``CONTEXT_CACHE_DIR`` to an empty string
+disables caching."""
+
+import hashlib
+import logging
+import os
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+CACHE_DIR_VARIABLE = "CONTEXT_CACHE_DIR"
+
+
+def default_cache_dir() -> Optional[str]:
+    directory = os.environ.get(CACHE_DIR_VARIABLE)
+    if directory is not None:
+        return directory or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "context")
+
+
+def cache_key(*parts) -> str:
+    """Hash the given strings or byte strings into a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """A size-bounded, least-recently-used cache of byte strings on disk.
+
+    Caches with different ``name`` values are kept in separate
+    subdirectories and have their own size limits. If the cache directory
+    cannot be used, the cache is disabled and every lookup misses."""
+
+    def __init__(
+        self,
+        name: str,
+        directory: Optional[str] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Size of the entries on disk, as far as this process knows
+        self._size = None
+        if directory is None:
+            directory = default_cache_dir()
+        self.directory = os.path.join(directory, name) if directory else None
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except OSError as e:
+                log.debug("Not caching %s: %s", name, e)
+                self.directory = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the data stored under ``key``, or ``None``."""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes):
+        """Store ``data`` under ``key``, evicting old entries if needed."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        temporary = "%s.%i.tmp" % (path, os.getpid())
+        try:
+            with open(temporary, "wb") as fh:
+                fh.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            log.debug("Could not write %s cache entry: %s", self.name, e)
+            return
+        # Only scan the directory when the cache may have grown too large
+        if self._size is None or self._size + len(data) > self.max_size:
+            self.evict()
+        else:
+            self._size += len(data)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no
+        larger than ``max_size``."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total > self.max_size:
+            entries.sort()
+            for _mtime, size, path in entries:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_size:
+                    break
+        self._size = total
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
@@ -10,6 +10,7 @@ from .fillOpentype import fill_opentype_values
 from .glyphDataXML import bake_in_glyphdata
 from .intermediateLayer import promote_intermediate_layers
 from .marks import zero_mark_widths
+from .pipeline import Filter, plan, run_filters
 from .rename import rename_glyphs
 
 FILTERS = {
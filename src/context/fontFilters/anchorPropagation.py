@@ -1,128 +1,206 @@
 import logging
-from typing import TYPE_CHECKING, Dict, List
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
-from fontTools.misc.transform import Transform
+from fontTools.misc.transform import Identity
 
 from context.Anchor import Anchor
 
+from .pipeline import GLYPH, Filter
+
 if TYPE_CHECKING:
-    from context import Glyph, Shape, Transform
+    from context import Glyph, Shape
     from context.Font import Font
     from context.Layer import Layer
 
 logger = logging.getLogger(__name__)
 
+Anchors = Dict[str, Tuple[float, float]]
+
+
+class _Propagation:
+    """The anchors of each glyph's master layers after propagation, and the
+    bounds of the glyphs used as components, by (glyph name, master id).
+
+    Each is computed once, the first time a composite needs it, so every
+    layer is only looked at once however many composites use it. The walk
+    visits components before the composites using them, so the anchors of
+    a component are already propagated when they are looked up; glyphs
+    which are not propagated (see ``glyphs``) are propagated here without
+    being changed."""
+
+    def __init__(self, glyphs: Optional[Iterable[str]] = None):
+        # Only add anchors to these glyphs, if given
+        self.glyphs = set(glyphs) if glyphs is not None else None
+        self.anchors: Dict[Tuple[str, str], Optional[Anchors]] = {}
+        self.bounds: Dict[Tuple[str, str], Optional[tuple]] = {}
+
+    def propagate(self, layer: "Layer", glyphname: str):
+        """Add the anchors of the layer's components to the layer."""
+        if layer.isBackground:
+            return
+        to_add = self._new_anchors(layer, glyphname)
+        # we sort propagated anchors to append in a deterministic order
+        for name, (x, y) in sorted(to_add.items()):
+            layer.anchors.append(Anchor(name=name, x=x, y=y))
+        key = (glyphname, layer._master)
+        if key not in self.anchors and _master_layer(layer._font, *key) is layer:
+            self.anchors[key] = {a.name: (a.x, a.y) for a in layer.anchors}
+
+    def component_anchors(self, font: "Font", ref: str, master: str):
+        """The anchors of glyph ``ref`` in a master after propagation, or
+        ``None`` if it has no layer there."""
+        key = (ref, master)
+        if key not in self.anchors:
+            layer = _master_layer(font, ref, master)
+            if layer is None:
+                self.anchors[key] = None
+                return None
+            anchors = self.anchors[key] = {a.name: (a.x, a.y) for a in layer.anchors}
+            if not layer.isBackground:
+                # Already added if the walk visited the glyph, and then
+                # this finds nothing new
+                anchors.update(self._new_anchors(layer, ref))
+        return self.anchors[key]
+
+    def component_bounds(self, font: "Font", ref: str, master: str):
+        key = (ref, master)
+        if key not in self.bounds:
+            self.bounds[key] = _master_layer(font, ref, master).bounds
+        return self.bounds[key]
+
+    def _new_anchors(self, layer: "Layer", glyphname: str) -> Anchors:
+        font, master = layer._font, layer._master
+        base_components = []
+        mark_components = []
+        anchor_names = set()
+        for component in layer.components:
+            anchors = self.component_anchors(font, component.ref, master)
+            if anchors is None:
+                continue
+            if any(name.startswith("_") for name in anchors):
+                mark_components.append((component, anchors))
+            else:
+                base_components.append((component, anchors))
+                anchor_names.update(anchors)
+
+        if mark_components and not base_components and _is_ligature_mark(glyphname):
+            try:
+                lowest = min(
+                    mark_components,
+                    key=lambda item: self._distance_to_origin(font, master, item[0]),
+                )
+            except Exception as e:
+                raise ValueError(
+                    "Error while determining which component of composite "
+                    "'{}' is the lowest: {}".format(glyphname, str(e))
+                ) from e
+            mark_components.remove(lowest)
+            base_components.append(lowest)
+            anchor_names.update(lowest[1])
+
+        # Every start of the names of the layer's own anchors
+        prefixes = {
+            a.name[:end] for a in layer.anchors for end in range(1, len(a.name) + 1)
+        }
+        to_add = {}
+        for anchor_name in anchor_names:
+            # don't add if parent already contains this anchor OR any associated
+            # ligature anchors (e.g. "top_1, top_2" for "top")
+            if anchor_name not in prefixes:
+                _get_anchor_data(to_add, base_components, anchor_name)
+
+        for component, anchors in mark_components:
+            _adjust_anchors(to_add, component, anchors)
+        return to_add
+
+    def _distance_to_origin(self, font: "Font", master: str, component: "Shape"):
+        """How far the bottom left of a component's bounds, where it is
+        placed in the composite, is from the origin."""
+        t = component.transform or Identity
+        bounds = self.component_bounds(font, component.ref, master)
+        if not bounds:  # No outlines
+            return _distance((0, 0), t.transformPoint((0, 0)))
+        xmin, ymin, xmax, ymax = bounds
+        corners = t.transformPoints(
+            [(xmin, ymin), (xmin, ymax), (xmax, ymin), (xmax, ymax)]
+        )
+        return _distance(
+            (0, 0), (min(x for x, _ in corners), min(y for _, y in corners))
+        )
+
+
+def _setup(font: "Font", args: dict) -> _Propagation:
+    glyphs = (args or {}).get("glyphs")
+    if isinstance(glyphs, str):
+        # Given on the command line, as glyphs=A Aacute
+        glyphs = glyphs.split()
+    return _Propagation(glyphs)
+
+
+def _propagate_glyph_anchors(glyph: "Glyph", propagation: _Propagation):
+    if propagation.glyphs is not None and glyph.name not in propagation.glyphs:
+        return
+    for layer in glyph.layers:
+        propagation.propagate(layer, glyph.name)
 
-def propagate_anchors(font: "Font", args=None):
-    logger.info("Propagating anchors")
-    processed = set()
 
-    for glyph in font.glyphs:
-        for layer in glyph.layers:
-            _propagate_anchors(layer, glyph.name, processed)
+propagate_anchors = Filter(
+    _propagate_glyph_anchors,
+    GLYPH,
+    "Propagating anchors",
+    components_first=True,
+    setup=_setup,
+)
 
 
-def _propagate_anchors(layer: "Layer", glyphname: str, processed: set):
-    if layer.isBackground or (glyphname, layer.id) in processed:
-        return
-    processed.add((glyphname, layer.id))
-
-    base_components = []
-    mark_components = []
-    anchor_names = set()
-    to_add = {}
-    for component in layer.components:
-        component_layer = component.component_layer
-        if not component_layer:
-            continue
-        _propagate_anchors(component_layer, component.ref, processed)
-        if any(a.name.startswith("_") for a in component_layer.anchors):
-            mark_components.append(component)
-        else:
-            base_components.append(component)
-            anchor_names |= {a.name for a in component_layer.anchors}
-
-    if mark_components and not base_components and _is_ligature_mark(layer):
-        try:
-            component = _component_closest_to_origin(mark_components)
-        except Exception as e:
-            raise ValueError(
-                "Error while determining which component of composite "
-                "'{}' is the lowest: {}".format(glyphname, str(e))
-            ) from e
-        mark_components.remove(component)
-        base_components.append(component)
-        component_layer = component.component_layer
-        anchor_names |= {a.name for a in component_layer.anchors}
-
-    for anchor_name in anchor_names:
-        # don't add if parent already contains this anchor OR any associated
-        # ligature anchors (e.g. "top_1, top_2" for "top")
-        if not any(a.name.startswith(anchor_name) for a in layer.anchors):
-            _get_anchor_data(to_add, base_components, anchor_name)
-
-    for component in mark_components:
-        _adjust_anchors(to_add, component)
-
-    # we sort propagated anchors to append in a deterministic order
-    for name, (x, y) in sorted(to_add.items()):
-        layer.anchors.append(Anchor(name=name, x=x, y=y))
-
-
-def _is_ligature_mark(glyph: "Glyph"):
-    return not glyph.name.startswith("_") and "_" in glyph.name
+def _master_layer(font: "Font", glyphname: str, master: str) -> Optional["Layer"]:
+    # The layer a component in that master refers to, as Master.get_glyph_layer
+    if glyphname not in font.glyphs:
+        return None
+    for layer in font.glyphs[glyphname].layers:
+        if layer._master == master:
+            return layer
+    return None
+
+
+def _is_ligature_mark(glyphname: str):
+    return not glyphname.startswith("_") and "_" in glyphname
 
 
 def _get_anchor_data(
-    anchor_data: Dict[str, tuple], components: List["Shape"], anchor_name: str
+    anchor_data: Anchors, components: List[Tuple["Shape", Anchors]], anchor_name: str
 ):
     """Get data for an anchor from a list of components."""
 
-    anchors = []
-    for component in components:
-        for anchor in component.component_layer.anchors:
-            if anchor.name == anchor_name:
-                anchors.append((anchor, component))
-                break
+    anchors = [
+        (anchors[anchor_name], component)
+        for component, anchors in components
+        if anchor_name in anchors
+    ]
     if len(anchors) > 1:
-        for i, (anchor, component) in enumerate(anchors):
-            t = component.transform
-            name = "%s_%d" % (anchor.name, i + 1)
-            anchor_data[name] = t.transformPoint((anchor.x, anchor.y))
+        for i, (position, component) in enumerate(anchors):
+            t = component.transform or Identity
+            name = "%s_%d" % (anchor_name, i + 1)
+            anchor_data[name] = t.transformPoint(position)
     elif anchors:
-        anchor, component = anchors[0]
-        t = component.transform
-        anchor_data[anchor.name] = t.transformPoint((anchor.x, anchor.y))
+        position, component = anchors[0]
+        t = component.transform or Identity
+        anchor_data[anchor_name] = t.transformPoint(position)
 
 
-def _adjust_anchors(anchor_data: Dict[str, tuple], component: "Shape"):
+def _adjust_anchors(anchor_data: Anchors, component: "Shape", anchors: Anchors):
     """
     Adjust base anchors to which a mark component may have been attached, by
     moving the base anchor attached to a mark anchor to the position of
     the mark component's base anchor.
     """
 
-    glyph = component.component_layer
-    t = component.transform
-    for anchor in glyph.anchors:
+    t = component.transform or Identity
+    for name, position in anchors.items():
         # only adjust if this anchor has data and the component also contains
         # the associated mark anchor (e.g. "_top" for "top")
-        if anchor.name in anchor_data and any(
-            a.name == "_" + anchor.name for a in glyph.anchors
-        ):
-            anchor_data[anchor.name] = t.transformPoint((anchor.x, anchor.y))
-
-
-def _component_closest_to_origin(components):
-    """Return the component whose (xmin, ymin) bounds are closest to origin.
-
-    This ensures that a component that is moved below another is
-    actually recognized as such. Looking only at the transformation
-    offset can be misleading.
-    """
-    return min(
-        components, key=lambda comp: _distance((0, 0), comp.component_layer.bounds()[0])
-    )
+        if name in anchor_data and "_" + name in anchors:
+            anchor_data[name] = t.transformPoint(position)
 
 
 def _distance(pos1, pos2):
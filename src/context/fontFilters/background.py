@@ -1,21 +1,17 @@
-import logging
+from .pipeline import LAYER, Filter
 
-from context.Font import Font
 
-logger = logging.getLogger(__name__)
+def _zero_background_width(glyph, layer, _args):
+    if layer.isBackground:
+        layer.width = 0
 
 
-def zero_background_width(font: Font, args=None):
-    logger.info("Zeroing background width")
-    for glyph in font.glyphs:
-        for layer in glyph.layers:
-            if layer.isBackground:
-                layer.width = 0
+def _decompose_background(glyph, layer, _args):
+    if layer.isBackground:
+        layer.decompose()
 
 
-def decompose_backgrounds(font: Font, args=None):
-    logger.info("Decomposing backgroundss")
-    for glyph in font.glyphs:
-        for layer in glyph.layers:
-            if layer.isBackground:
-                layer.decompose()
+zero_background_width = Filter(
+    _zero_background_width, LAYER, "Zeroing background width"
+)
+decompose_backgrounds = Filter(_decompose_background, LAYER, "Decomposing backgrounds")
@@ -1,25 +1,142 @@
 import logging
 
+import fontTools
+import orjson
 from fontTools.cu2qu.ufo import glyphs_to_quadratic
 
 from context.Font import Font
+from context.Node import Node
+from context.Shape import Shape
+from context.compatibility import check_compatibility
+from context.diskcache import DiskCache, cache_key
 
+from .pipeline import GLYPH, Filter
 
 logger = logging.getLogger(__name__)
 
 
-def cubic_to_quadratic(font: Font, args: dict = {}):
-    logger.info("Converting cubic curves to quadratic")
-    reverse_direction = args.get("reverseDirection", True)
-    for glyph in font.glyphs:
-        master_layers = [l for l in glyph.layers if l._master]
-        if not master_layers:
-            continue
-        try:
-            glyphs_to_quadratic(master_layers, reverse_direction=reverse_direction)
-        except Exception:
+class _Conversion:
+    """The settings of a conversion, the cache of converted contours, and
+    how many glyphs were converted or taken from the cache."""
+
+    def __init__(self, reverse_direction, max_err):
+        self.reverse_direction = reverse_direction
+        self.max_err = max_err
+        self.cache = DiskCache("cu2qu")
+        self.converted = 0
+        self.reused = 0
+
+    def key(self, layers) -> str:
+        return cache_key(
+            fontTools.version,
+            repr((self.reverse_direction, self.max_err)),
+            _dump_contours(layers),
+        )
+
+
+def _setup(font: Font, args: dict):
+    args = args or {}
+    return _Conversion(
+        args.get("reverseDirection", True),
+        float(args.get("maxError", font.upm / 1000)),
+    )
+
+
+def _report(font: Font, conversions):
+    reused = sum(c.reused for c in conversions)
+    total = reused + sum(c.converted for c in conversions)
+    if total and conversions[0].cache.enabled:
+        logger.info(
+            "Took %i of %i glyphs (%i%%) from the cache",
+            reused,
+            total,
+            100 * reused / total,
+        )
+
+
+def _dump_contours(layers) -> bytes:
+    return orjson.dumps(
+        [
+            [[(n.x, n.y, n.type) for n in path.nodes] for path in layer.paths]
+            for layer in layers
+        ]
+    )
+
+
+def _load_contours(layers, data: bytes):
+    for layer, contours in zip(layers, orjson.loads(data)):
+        components = layer.components
+        paths = [Shape(nodes=[Node(*n) for n in contour]) for contour in contours]
+        for path in paths:
+            path._set_parent(layer)
+        layer.shapes = paths + components
+
+
+class _LayerContours:
+    """A layer as `glyphs_to_quadratic` expects a glyph to be: only the
+    contours are redrawn, and the components are kept."""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.components = layer.components
+
+    def __len__(self):
+        return len(self.layer.paths)
+
+    def drawPoints(self, pen):
+        self.layer.drawPoints(pen)
+
+    def clearContours(self):
+        self.layer.shapes = []
+
+    def getPen(self):
+        return self.layer.getPen()
+
+    def restore_components(self):
+        if self.layer.components != self.components:
+            self.layer.shapes = self.layer.paths + self.components
+
+
+def _glyph_to_quadratic(glyph, conversion: _Conversion):
+    master_layers = [l for l in glyph.layers if l._master]
+    if not any(layer.paths for layer in master_layers):
+        return
+    key = conversion.key(master_layers)
+    data = conversion.cache.get(key)
+    if data is not None:
+        _load_contours(master_layers, data)
+        conversion.reused += 1
+        return
+    contours = [_LayerContours(layer) for layer in master_layers]
+    try:
+        glyphs_to_quadratic(
+            contours,
+            max_err=conversion.max_err,
+            reverse_direction=conversion.reverse_direction,
+        )
+        for layer in contours:
+            layer.restore_components()
+    except Exception as e:
+        report = check_compatibility(glyph._get_parent(), [glyph.name])
+        if report.compatible:
+            logger.warning(
+                "Problem converting glyph %s to quadratic: %s", glyph.name, e
+            )
+        else:
             logger.warning(
-                "Problem converting glyph %s to quadratic (probably incompatible) ",
+                "Glyph %s is incompatible, not converting to quadratic:\n%s",
                 glyph.name,
-                # e,
+                "\n".join("  %s" % i for i in report),
             )
+        return
+    conversion.converted += 1
+    conversion.cache.set(key, _dump_contours(master_layers))
+
+
+cubic_to_quadratic = Filter(
+    _glyph_to_quadratic,
+    GLYPH,
+    "Converting cubic curves to quadratic",
+    setup=_setup,
+    finish=_report,
+)
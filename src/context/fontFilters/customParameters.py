@@ -1,9 +1,9 @@
 import logging
-from typing import List
+from typing import Dict, List
 
 from context.Font import Font
-from context.Glyph import GlyphList
-from .anchorPropagation import _propagate_anchors
+from .anchorPropagation import _Propagation
+from .rename import _rename_kerning
 
 logger = logging.getLogger(__name__)
 
@@ -31,45 +31,54 @@ def _removeGlyphs(font: Font, value: List[str]):
 
 def _decomposeGlyphs(font: Font, value: List[str]):
     logger.info("Decomposing glyphs")
-    processed = set()
+    propagation = _Propagation()
     for glyph in font.glyphs:
         if glyph.name in value:
             # logger.info(f"Decomposing " + glyph.name)
             for layer in glyph.layers:
-                _propagate_anchors(layer, glyph.name, processed)
+                propagation.propagate(layer, glyph.name)
                 layer.decompose()
 
 
 def _renameGlyphs(font: Font, value: List[str]):
     logger.info("Renaming glyphs")
+    # Each "old=new" entry swaps two names in the kerning and kern groups,
+    # and swaps the names (but not the codepoints) of the two glyphs if
+    # both exist. The swaps are composed first, so that everything is
+    # renamed once however many entries there are.
+    kerning_names = _Swaps()
+    glyph_names = _Swaps()
     for mapping in value:
         oldname, newname = mapping.split("=", 1)
+        kerning_names.swap(oldname, newname)
         if newname in font.glyphs and oldname in font.glyphs:
-            # Swap any unicode mappings
-            (font.glyphs[oldname].codepoints, font.glyphs[newname].codepoints) = (
-                font.glyphs[newname].codepoints,
-                font.glyphs[oldname].codepoints,
-            )
-            font.glyphs[newname].name = oldname
-            font.glyphs[oldname].name = newname
-            font.glyphs = GlyphList({glyph.name: glyph for glyph in font.glyphs})
-        swap = {
-            newname: oldname,
-            oldname: newname,
-        }
-        for master in font.masters:
-            master.kerning = {
-                (swap.get(left, left), swap.get(right, right)): kern
-                for (left, right), kern in master.kerning.items()
-            }
-        for group, members in font.first_kern_groups.items():
-            font.first_kern_groups[group] = [
-                swap.get(member, member) for member in members
-            ]
-        for group, members in font.second_kern_groups.items():
-            font.second_kern_groups[group] = [
-                swap.get(member, member) for member in members
-            ]
+            glyph_names.swap(oldname, newname)
+    renamed = glyph_names.mapping()
+    codepoints = {name: font.glyphs[name].codepoints for name in renamed}
+    font.glyphs.rename(renamed)
+    for name, glyph_codepoints in codepoints.items():
+        font.glyphs[name].codepoints = glyph_codepoints
+    _rename_kerning(font, kerning_names.mapping())
+    font._clear_caches()
+
+
+class _Swaps:
+    """A sequence of swaps of two names, as a mapping from each name to
+    where it ends up."""
+
+    def __init__(self):
+        # Original name -> current name, and back
+        self.current = {}
+        self.original = {}
+
+    def swap(self, a: str, b: str):
+        original_a = self.original.get(a, a)
+        original_b = self.original.get(b, b)
+        self.current[original_a], self.current[original_b] = b, a
+        self.original[b], self.original[a] = original_a, original_b
+
+    def mapping(self) -> Dict[str, str]:
+        return {old: new for old, new in self.current.items() if old != new}
 
 
 CUSTOM_PARAMETER_APPLIER = {
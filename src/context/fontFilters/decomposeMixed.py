@@ -1,28 +1,26 @@
-import logging
-
 from context import Glyph
 from context.Font import Font
 
-logger = logging.getLogger(__name__)
-
+from .pipeline import GLYPH, Filter
 
-def decompose_mixed_glyphs(font: Font, _args=None):
-    logger.info("Decomposing mixed glyphs")
 
-    exportable = set(glyph.name for glyph in font.glyphs if glyph.exported)
-    done = set()
-    for glyph in font.glyphs:
-        decompose_a_glyph(font, glyph, exportable, done)
+def _exportable(font: Font, _args) -> set:
+    return set(font.exported_glyphs())
 
 
-def decompose_a_glyph(font: Font, glyph: Glyph, exportable, done):
-    if glyph.name in done:
-        return
+def _decompose_mixed_glyph(glyph: Glyph, exportable: set):
+    # Components have already been visited, so are decomposed themselves
     for layer in glyph.layers:
-        for c in layer.components:
-            decompose_a_glyph(font, font.glyphs[c.ref], exportable, done)
         if (layer.paths and layer.components) or any(
             c.ref not in exportable for c in layer.components
         ):
             layer.decompose()
-    done.add(glyph.name)
+
+
+decompose_mixed_glyphs = Filter(
+    _decompose_mixed_glyph,
+    GLYPH,
+    "Decomposing mixed glyphs",
+    components_first=True,
+    setup=_exportable,
+)
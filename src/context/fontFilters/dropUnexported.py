@@ -1,12 +1,13 @@
 from collections import defaultdict
+from copy import deepcopy
 import logging
 from typing import Set
 
 from ufomerge.layout import LayoutSubsetter
 
 from fontTools.feaLib import ast
-from fontTools.misc.visitor import Visitor
 
+from context.Features import FeaAppearsVisitor, Features, GlyphReference  # noqa: F401
 from context.Font import Font
 from .rename import _drop_wrapper
 
@@ -15,15 +16,14 @@ logger = logging.getLogger(__name__)
 
 def drop_unexported_glyphs(font: Font, args=None):
     logger.info("Dropping unexported glyphs")
-    unexported = set(glyph.name for glyph in font.glyphs if not glyph.exported)
+    unexported = set(glyph.name for glyph in font.glyphs.where(exported=False))
     if "force" in args:
         fixup_used_glyphs(font, unexported)
     else:
         warn_about_used_glyphs(font, unexported)
 
     # Now we are good to go
-    for glyph in unexported:
-        font.glyphs.pop(glyph)
+    font.glyphs.remove(unexported)
 
 
 def warn_about_used_glyphs(font: Font, unexported: Set[str]):
@@ -45,33 +45,20 @@ def warn_about_used_glyphs(font: Font, unexported: Set[str]):
         logger.warning("Will not drop these glyphs.")
         unexported -= set(appearances.keys())
     # Safety check two: look in features
-    parsed_features = font.features.as_ast(font)
-
-    for featurename, parsed in parsed_features["features"]:
-        visitor = FeaAppearsVisitor()
-        visitor.visit(parsed)
-        for glyph in visitor.appearances:
-            if glyph in unexported:
-                logger.warning(
-                    f"Unexported glyph {glyph} is used in feature {featurename}, will not drop it."
-                )
-                unexported.remove(glyph)
-    for classname, glyphs in font.features.classes.items():
-        for glyph in glyphs:
-            if glyph in unexported:
-                logger.warning(
-                    f"Unexported glyph {glyph} is used in class @{classname}, will not drop it."
-                )
-                unexported.remove(glyph)
-    for prefix, parsed in parsed_features["prefixes"].items():
-        visitor = FeaAppearsVisitor()
-        visitor.visit(parsed)
-        for glyph in visitor.appearances:
-            if glyph in unexported:
-                logger.warning(
-                    f"Unexported glyph {glyph} is used in prefix {prefix}, will not drop it."
-                )
-                unexported.remove(glyph)
+    references = font.features.glyph_references(font)
+    for glyph in sorted(unexported):
+        used = references[glyph]
+        if used:
+            logger.warning(
+                f"Unexported glyph {glyph} is used in {_describe(used[0])}, will not drop it."
+            )
+            unexported.remove(glyph)
+
+
+def _describe(reference: GlyphReference) -> str:
+    if reference.kind == "class":
+        return f"class @{reference.name}"
+    return f"{reference.kind} {reference.name}"
 
 
 def fixup_used_glyphs(font: Font, unexported: Set[str]):
@@ -81,43 +68,69 @@ def fixup_used_glyphs(font: Font, unexported: Set[str]):
             for c in layer.components:
                 if c.ref in unexported:
                     layer.decompose()
-    for classname, glyphs in font.features.classes.items():
-        font.features.classes[classname] = [g for g in glyphs if g not in unexported]
-    parsed_features = font.features.as_ast(font)
-    newfeatures = []
-    for feature, parsed in parsed_features["features"]:
-        subsetter = LayoutSubsetter(
-            [g.name for g in font.glyphs if g.name not in unexported]
-        )
-        subsetter.subset(parsed)
-        if parsed.statements:
-            newfeatures.append((feature, _drop_wrapper(parsed).asFea()))
-    font.features.features = newfeatures
-    for prefix, parsed in parsed_features["prefixes"].items():
-        subsetter = LayoutSubsetter(
-            [g.name for g in font.glyphs if g.name not in unexported]
-        )
-        subsetter.subset(parsed)
-        parsed.statements[:0] = [
-            ast.LanguageSystemStatement(*pair)
-            for pair in subsetter.incoming_language_systems
-        ]
 
-        font.features.prefixes[prefix] = parsed.asFea()
-
-
-class FeaAppearsVisitor(Visitor):
-    def __init__(self):
-        self.appearances = set()
-
-
-@FeaAppearsVisitor.register(ast.GlyphName)
-def visit(visitor, gn, *args, **kwargs):
-    visitor.appearances.add(gn.glyph)
-    return False
-
-
-@FeaAppearsVisitor.register(ast.MarkClassDefinition)
-def visit(visitor, mcd, *args, **kwargs):
-    visitor.visitAttr(mcd, "glyphs", mcd.glyphs, *args, **kwargs)
-    return False
+    _subset_features(font, unexported, font.features)
+
+
+def _subset_features(font: Font, dropped: Set[str], features: Features):
+    """Remove the glyphs ``dropped`` from the feature code of ``font``,
+    writing the result to ``features``: the font's own, or a copy of them.
+    Only the parts of the feature code which refer to the dropped glyphs,
+    or which use classes and lookups defined by those parts, are touched."""
+    affected = font.features.glyph_references(font).referencing(dropped)
+    if not affected:
+        return
+    parsed_features = font.features.as_ast(font, readonly=True)
+    glyphset = {g for g in font.glyphs.keys() if g not in dropped}
+    dropped_lookups = set()
+    newfeatures = list(features.features)
+    for reference in affected:
+        if reference.kind == "class":
+            features.classes[reference.name] = [
+                g for g in features.classes[reference.name] if g not in dropped
+            ]
+        elif reference.kind == "prefix":
+            parsed = deepcopy(parsed_features["prefixes"][reference.name])
+            subsetter = _subset(parsed, glyphset, dropped_lookups)
+            parsed.statements[:0] = [
+                ast.LanguageSystemStatement(*pair)
+                for pair in subsetter.incoming_language_systems
+            ]
+            features.prefixes[reference.name] = parsed.asFea()
+        else:
+            parsed = deepcopy(parsed_features["features"][reference.index][1])
+            _subset(parsed, glyphset, dropped_lookups)
+            if parsed.statements:
+                newfeatures[reference.index] = (
+                    reference.name,
+                    _drop_wrapper(parsed).asFea(),
+                )
+            else:
+                newfeatures[reference.index] = None
+    features.features = [f for f in newfeatures if f is not None]
+
+
+def _subset(
+    parsed: ast.FeatureFile, glyphset: Set[str], dropped_lookups: Set[str]
+) -> LayoutSubsetter:
+    # Lookups emptied by subsetting earlier blocks are passed on, so that
+    # references to them are dropped too
+    defined = _lookup_names(parsed)
+    subsetter = LayoutSubsetter(glyphset, dropped_lookups=sorted(dropped_lookups))
+    subsetter.subset(parsed)
+    dropped_lookups.update(defined - _lookup_names(parsed))
+    return subsetter
+
+
+def _lookup_names(parsed: ast.FeatureFile) -> Set[str]:
+    names = set()
+    for statement in parsed.statements:
+        if isinstance(statement, ast.LookupBlock):
+            names.add(statement.name)
+        elif isinstance(statement, ast.Block):
+            names.update(
+                st.name
+                for st in statement.statements
+                if isinstance(st, ast.LookupBlock)
+            )
+    return names
@@ -1,24 +1,110 @@
-# from fontFeatures import Attachment, Routine, Positioning, ValueRecord
+# from fontFeatures import Routine, Positioning, ValueRecord
 import logging
+import re
+import struct
+from collections import defaultdict
+
+import fontTools
+from fontTools.feaLib import ast
 from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.misc.fixedTools import otRound
 from fontTools.ttLib import newTable
 from fontTools.ttLib.tables import otTables
 
+from context import trace
+from context.diskcache import DiskCache, cache_key
+
 logger = logging.getLogger(__name__)
 
 
-def build_all_features(font, ttFont):
-    logger.info("Generating opentype features")
+def build_all_features(font, ttFont, use_cache=True, master=None):
+    """Compile the font's feature code and generated anchor features into
+    ``ttFont``. If ``master`` is given, or ``ttFont`` is not a variable
+    font, anchors are taken from that master (by default, the default
+    master) instead of varying."""
+    with trace.span("Build features") as args:
+        logger.info("Generating opentype features")
+
+        # build_kern(font)
+
+        if master is None and "fvar" not in ttFont and len(font.masters) > 1:
+            master = font.default_master
+        features = font.features.to_fea()
+        generated = build_anchor_features(font, master)
+        if generated.statements:
+            features += "\n" + generated.asFea()
+
+        cache = key = None
+        if use_cache and not UNCACHEABLE_RE.search(features):
+            cache = DiskCache("features")
+            key = _feature_cache_key(font, ttFont, features)
+            data = cache.get(key)
+            if data is not None:
+                logger.info("Using cached opentype features")
+                args["cached"] = True
+                _restore_tables(ttFont, data)
+                return
+
+        logger.info("Compiling opentype features")
+        addOpenTypeFeaturesFromString(ttFont, features)
+        add_gdef_classdef(font, ttFont)
+        if cache is not None:
+            cache.set(key, _store_tables(ttFont))
+
+
+# Feature code which changes tables other than GSUB, GPOS and GDEF, or
+# which includes other files (whose contents are not part of the cache
+# key), is always compiled.
+UNCACHEABLE_RE = re.compile(
+    r"\btable\s+\w|\bfeatureNames\b|\bcvParameters\b|\bparameters\b|\binclude\s*\("
+)
+CACHED_TABLES = ("GDEF", "GSUB", "GPOS")
+
+
+def _feature_cache_key(font, ttFont, features):
+    categories = " ".join(
+        "%s=%s" % (glyph.name, category)
+        for category in CATMAP
+        for glyph in font.glyphs.where(category=category)
+    )
+    axes = ""
+    if "fvar" in ttFont:
+        axes = repr(
+            [
+                (a.axisTag, a.minValue, a.defaultValue, a.maxValue)
+                for a in ttFont["fvar"].axes
+            ]
+        )
+    if "avar" in ttFont:
+        axes += repr(sorted(ttFont["avar"].segments.items()))
+    return cache_key(
+        fontTools.version,
+        features,
+        "\n".join(ttFont.getGlyphOrder()),
+        categories,
+        axes,
+    )
+
+
+def _store_tables(ttFont) -> bytes:
+    chunks = []
+    for tag in CACHED_TABLES:
+        if tag in ttFont:
+            data = ttFont[tag].compile(ttFont)
+            chunks.append(struct.pack(">4sI", tag.encode("ascii"), len(data)))
+            chunks.append(data)
+    return b"".join(chunks)
 
-    # build_cursive(font)
-    # build_mark_mkmk(font)
-    # build_mark_mkmk(font, "mkmk")
-    # build_kern(font)
 
-    features = font.features.to_fea()
-    logger.info("Compiling opentype features")
-    addOpenTypeFeaturesFromString(ttFont, features)
-    add_gdef_classdef(font, ttFont)
+def _restore_tables(ttFont, data: bytes):
+    offset = 0
+    while offset < len(data):
+        tag, length = struct.unpack_from(">4sI", data, offset)
+        offset += 8
+        table = newTable(tag.decode("ascii"))
+        table.decompile(data[offset : offset + length], ttFont)
+        ttFont[table.tableTag] = table
+        offset += length
 
 
 CATMAP = {"base": 1, "ligature": 2, "mark": 3, "component": 4}
@@ -37,9 +123,9 @@ def add_gdef_classdef(font, ttFont):
         gdef.GlyphClassDef.classDefs = {}
     classdeftable = gdef.GlyphClassDef.classDefs
     if not classdeftable:
-        for glyph in font.glyphs:
-            if glyph.category in CATMAP:
-                classdeftable[glyph.name] = CATMAP[glyph.category]
+        for category, glyph_class in CATMAP.items():
+            for glyph in font.glyphs.where(category=category):
+                classdeftable[glyph.name] = glyph_class
 
 
 def build_kern(font):
@@ -65,46 +151,185 @@ def build_kern(font):
     font.features.addFeature("kern", [kernroutine])
 
 
-def build_cursive(font):
-    anchors = font._all_anchors
-    if "entry" in anchors and "exit" in anchors:
-        attach = Attachment(
-            "entry", "exit", anchors["entry"], anchors["exit"], flags=(0x8 | 0x1)
-        )
-        r = Routine(
-            rules=[attach],
-        )
-        font.features.addFeature("curs", [r])
+LIGATURE_ANCHOR_RE = re.compile(r"^(.+)_(\d+)$")
+CURSIVE_FLAGS = 0x8 | 0x1  # IgnoreMarks | RightToLeft
 
 
-def build_mark_mkmk(font, which="mark", strict=False):
-    # Find matching pairs of foo/_foo anchors
-    anchors = font._all_anchors
-    r = Routine(rules=[])
-    if which == "mark":
-        basecategory = "base"
+def build_anchor_features(font, master=None) -> ast.FeatureFile:
+    """Generate mark, mkmk and curs features from the font's anchors.
+
+    Features which are already defined in the font's feature code are
+    not generated. The mark class definitions are shared between the
+    mark and mkmk features. If ``master`` is given, the anchor positions
+    in that master are used; otherwise anchors vary across the masters."""
+    existing = {name for name, _ in font.features.features}
+    fea = ast.FeatureFile()
+    wanted = [tag for tag in ("curs", "mark", "mkmk") if tag not in existing]
+    if not wanted:
+        return fea
+    if master is None:
+        anchors = font._all_anchors
     else:
-        basecategory = "mark"
-    for baseanchor in anchors:
-        markanchor = "_" + baseanchor
-        if markanchor not in anchors:
+        anchors = font.anchor_table().static_anchors(master)
+    exported = set(font.exported_glyphs())
+
+    if "curs" in wanted:
+        curs = build_cursive(font, anchors, exported)
+        if curs:
+            fea.statements.append(curs)
+
+    if "mark" in wanted or "mkmk" in wanted:
+        definitions, mark_classes = _build_mark_classes(font, anchors, exported)
+        features = [
+            build_mark_mkmk(font, which, anchors, exported, mark_classes)
+            for which in ("mark", "mkmk")
+            if which in wanted
+        ]
+        features = [f for f in features if f]
+        if features:
+            fea.statements.extend(definitions)
+            fea.statements.extend(features)
+    return fea
+
+
+def _anchor(scalars) -> ast.Anchor:
+    x, y = scalars
+    return ast.Anchor(_scalar(x), _scalar(y))
+
+
+def _scalar(vs):
+    # Non-varying values are written as plain numbers so that static
+    # fonts do not need an fvar table to compile.
+    if isinstance(vs, (int, float)):
+        return otRound(vs)
+    if vs.does_vary:
+        return vs
+    return otRound(next(iter(vs.values.values())))
+
+
+def _anchor_key(scalars):
+    x, y = scalars
+    return (str(_scalar(x)), str(_scalar(y)))
+
+
+def _build_mark_classes(font, anchors, exported, strict=False):
+    """Build one mark class per anchor name which has mark glyphs
+    (``_top`` -> ``@MC_top``). Marks sharing the same anchor position
+    are grouped into a single ``markClass`` statement."""
+    definitions = []
+    mark_classes = {}
+    for markanchor, glyphs in anchors.items():
+        if markanchor[0] != "_":
+            continue
+        by_position = defaultdict(list)
+        for glyph, scalars in glyphs.items():
+            if glyph not in exported:
+                continue
+            if strict and font.glyphs[glyph].category != "mark":
+                continue
+            by_position[_anchor_key(scalars)].append((glyph, scalars))
+        if not by_position:
+            continue
+        mark_class = ast.MarkClass("MC" + markanchor)
+        for members in by_position.values():
+            definition = ast.MarkClassDefinition(
+                mark_class,
+                _anchor(members[0][1]),
+                ast.GlyphClass([ast.GlyphName(g) for g, _ in members]),
+            )
+            mark_class.addDefinition(definition)
+            definitions.append(definition)
+        mark_classes[markanchor[1:]] = mark_class
+    return definitions, mark_classes
+
+
+def build_mark_mkmk(
+    font, which="mark", anchors=None, exported=None, mark_classes=None, strict=False
+):
+    """Build a mark-to-base (and mark-to-ligature) or mark-to-mark
+    feature block from matching pairs of ``foo``/``_foo`` anchors.
+
+    Returns ``None`` if there is nothing to attach."""
+    if anchors is None:
+        anchors = font._all_anchors
+    if exported is None:
+        exported = set(font.exported_glyphs())
+    if mark_classes is None:
+        _, mark_classes = _build_mark_classes(font, anchors, exported, strict)
+    basecategory = "base" if which == "mark" else "mark"
+
+    bases = defaultdict(list)
+    ligatures = defaultdict(lambda: defaultdict(list))
+    for baseanchor, glyphs in anchors.items():
+        if baseanchor[0] == "_":
             continue
-        # Filter glyphs to those which are baseanchors
-        bases = {
-            k: v
-            for k, v in anchors[baseanchor].items()
-            if font.glyphs[k].exported and (font.glyphs[k].category == basecategory)
-        }
-        marks = {
-            k: v
-            for k, v in anchors[markanchor].items()
-            if font.glyphs[k].exported
-            and (not strict or font.glyphs[k].category == "mark")
-        }
-        if not (bases and marks):
+        if baseanchor in mark_classes:
+            mark_class = mark_classes[baseanchor]
+            component = None
+        elif which == "mark" and (match := LIGATURE_ANCHOR_RE.match(baseanchor)):
+            if match.group(1) not in mark_classes:
+                continue
+            mark_class = mark_classes[match.group(1)]
+            component = int(match.group(2))
+        else:
             continue
-        attach = Attachment(baseanchor, markanchor, bases, marks)
-        attach.fontfeatures = font.features  # THIS IS A TERRIBLE HACK
-        r.rules.append(attach)
-    if r.rules:
-        font.features.addFeature(which, [r])
+        for glyph, scalars in glyphs.items():
+            if glyph not in exported:
+                continue
+            category = font.glyphs[glyph].category
+            if component is None and category == basecategory:
+                bases[glyph].append((_anchor(scalars), mark_class))
+            elif component is not None and category == "ligature":
+                ligatures[glyph][component].append((_anchor(scalars), mark_class))
+
+    lookups = []
+    if bases:
+        lookup = ast.LookupBlock(f"{which}_base")
+        statement = (
+            ast.MarkBasePosStatement if which == "mark" else ast.MarkMarkPosStatement
+        )
+        for glyph, marks in bases.items():
+            lookup.statements.append(statement(ast.GlyphName(glyph), marks))
+        lookups.append(lookup)
+    if ligatures:
+        lookup = ast.LookupBlock(f"{which}_ligature")
+        for glyph, components in ligatures.items():
+            marks = [components.get(i, []) for i in range(1, max(components) + 1)]
+            lookup.statements.append(
+                ast.MarkLigPosStatement(ast.GlyphName(glyph), marks)
+            )
+        lookups.append(lookup)
+    if not lookups:
+        return None
+    feature = ast.FeatureBlock(which)
+    feature.statements.extend(lookups)
+    return feature
+
+
+def build_cursive(font, anchors=None, exported=None):
+    """Build a cursive attachment feature block from ``entry`` and ``exit``
+    anchors. Returns ``None`` if no glyph has either anchor."""
+    if anchors is None:
+        anchors = font._all_anchors
+    if exported is None:
+        exported = set(font.exported_glyphs())
+    entries = anchors.get("entry", {})
+    exits = anchors.get("exit", {})
+    glyphs = [
+        g for g in font.glyphs.keys() if g in exported and (g in entries or g in exits)
+    ]
+    if not glyphs:
+        return None
+    lookup = ast.LookupBlock("curs")
+    lookup.statements.append(ast.LookupFlagStatement(CURSIVE_FLAGS))
+    for glyph in glyphs:
+        lookup.statements.append(
+            ast.CursivePosStatement(
+                ast.GlyphName(glyph),
+                _anchor(entries[glyph]) if glyph in entries else None,
+                _anchor(exits[glyph]) if glyph in exits else None,
+            )
+        )
+    feature = ast.FeatureBlock("curs")
+    feature.statements.append(lookup)
+    return feature
@@ -1,22 +1,53 @@
 import logging
+from typing import Any, Dict, Optional, Tuple
 
 from context.Font import Font
+from context.Master import Master
 from fontTools.misc.timeTools import timestampSinceEpoch
 from fontTools.misc.fixedTools import otRound
 
 logger = logging.getLogger(__name__)
 
 
-def _default(font, table, key, value, round=otRound):
-    if (table, key) not in font.custom_opentype_values:
-        font.custom_opentype_values[(table, key)] = round(value)
-    return font.custom_opentype_values[(table, key)]
+def _default(values, table, key, value, round=otRound):
+    if (table, key) not in values:
+        values[(table, key)] = round(value)
+    return values[(table, key)]
 
 
 def fill_opentype_values(font: Font, args=None):
     """Prepare a font for final compilation by moving values from
     font attributes to the customOpenTypeValues field."""
     logger.info("Filling in OpenType values")
+    font.custom_opentype_values.update(opentype_values(font))
+
+
+# Master metrics which are copied to the tables only if they are set
+OPTIONAL_METRICS = {
+    "subscriptXSize": ("OS/2", "ySubscriptXSize"),
+    "subscriptYSize": ("OS/2", "ySubscriptYSize"),
+    "subscriptXOffset": ("OS/2", "ySubscriptXOffset"),
+    "subscriptYOffset": ("OS/2", "ySubscriptYOffset"),
+    "superscriptXSize": ("OS/2", "ySuperscriptXSize"),
+    "superscriptYSize": ("OS/2", "ySuperscriptYSize"),
+    "superscriptXOffset": ("OS/2", "ySuperscriptXOffset"),
+    "superscriptYOffset": ("OS/2", "ySuperscriptYOffset"),
+    "hheaCaretSlopeRise": ("hhea", "caretSlopeRise"),
+    "hheaCaretSlopeRun": ("hhea", "caretSlopeRun"),
+    "hheaCaretOffset": ("hhea", "caretOffset"),
+}
+
+
+def opentype_values(
+    font: Font, master: Optional[Master] = None
+) -> Dict[Tuple[str, str], Any]:
+    """Return the font's custom OpenType values, with defaults filled in
+    from the font's attributes and the metrics of ``master`` (by default,
+    the default master) for any which are not set. The font is not
+    modified."""
+    values = dict(font.custom_opentype_values)
+    if master is None:
+        master = font.default_master
 
     def _fallback_metric(*metrics):
         for metric in metrics:
@@ -24,74 +55,80 @@ def fill_opentype_values(font: Font, args=None):
                 return metric(font)
             if isinstance(metric, (int, float)):
                 return metric
-            if (
-                metric in font.default_master.metrics
-                and font.default_master.metrics[metric] is not None
-            ):
-                return int(font.default_master.metrics[metric])
+            if metric in master.metrics and master.metrics[metric] is not None:
+                return int(master.metrics[metric])
         return 0
 
     version_decimal = font.version[0] + font.version[1] / 10 ** len(
         str(font.version[1])
     )
-    _default(font, "head", "fontRevision", version_decimal)
-    _default(font, "head", "created", timestampSinceEpoch(font.date.timestamp()))
-    _default(font, "head", "lowestRecPPEM", 10)
+    _default(values, "head", "fontRevision", version_decimal)
+    _default(values, "head", "created", timestampSinceEpoch(font.date.timestamp()))
+    _default(values, "head", "lowestRecPPEM", 10)
     ascender = _default(
-        font,
+        values,
         "hhea",
         "ascent",
         _fallback_metric("hheaAscender", "ascender", font.upm * 0.8),
     )
     descender = _default(
-        font,
+        values,
         "hhea",
         "descent",
         _fallback_metric("hheaDescender", "descender", font.upm * -0.2),
     )
-    _default(font, "hhea", "lineGap", _fallback_metric("hheaLineGap"))
-    _default(font, "OS/2", "usWinAscent", _fallback_metric("winAscent", ascender))
-    _default(font, "OS/2", "usWinDescent", _fallback_metric("winDescent", descender))
+    _default(values, "hhea", "lineGap", _fallback_metric("hheaLineGap"))
+    _default(values, "OS/2", "usWinAscent", _fallback_metric("winAscent", ascender))
+    _default(values, "OS/2", "usWinDescent", _fallback_metric("winDescent", descender))
     # WinDescent should be positive
-    if ("OS/2", "usWinDescent") in font.custom_opentype_values:
-        font.custom_opentype_values[("OS/2", "usWinDescent")] = abs(
-            font.custom_opentype_values[("OS/2", "usWinDescent")]
-        )
-    _default(font, "OS/2", "sTypoAscender", _fallback_metric("typoAscender", ascender))
+    values[("OS/2", "usWinDescent")] = abs(values[("OS/2", "usWinDescent")])
     _default(
-        font, "OS/2", "sTypoDescender", _fallback_metric("typoDescender", descender)
+        values, "OS/2", "sTypoAscender", _fallback_metric("typoAscender", ascender)
     )
     _default(
-        font,
+        values, "OS/2", "sTypoDescender", _fallback_metric("typoDescender", descender)
+    )
+    _default(
+        values,
         "OS/2",
         "sTypoLineGap",
         _fallback_metric("typoLineGap", "lineGap", font.upm * 0.2),
     )
     x_height = _default(
-        font, "OS/2", "sxHeight", _fallback_metric("xHeight", font.upm * 0.5)
+        values, "OS/2", "sxHeight", _fallback_metric("xHeight", font.upm * 0.5)
     )
-    _default(font, "OS/2", "sCapHeight", _fallback_metric("capHeight", font.upm * 0.7))
     _default(
-        font,
+        values, "OS/2", "sCapHeight", _fallback_metric("capHeight", font.upm * 0.7)
+    )
+    _default(
+        values,
         "OS/2",
         "yStrikeoutPosition",
         _fallback_metric("strikeoutPosition", x_height * 0.6),
     )
     _default(
-        font,
+        values,
         "post",
         "underlinePosition",
         _fallback_metric("underlinePosition", font.upm * -0.075),
     )
     _default(
-        font,
+        values,
         "post",
         "underlineThickness",
         _fallback_metric("underlineThickness", font.upm * 0.05),
     )
     _default(
-        font,
+        values,
         "OS/2",
         "yStrikeoutSize",
         _fallback_metric("underlineThickness", font.upm * 0.05),
     )
+    if master.metrics.get("italicAngle") is not None:
+        _default(
+            values, "post", "italicAngle", master.metrics["italicAngle"], round=float
+        )
+    for metric, (table, key) in OPTIONAL_METRICS.items():
+        if master.metrics.get(metric) is not None:
+            _default(values, table, key, master.metrics[metric])
+    return values
@@ -1,29 +1,77 @@
 import logging
+import os
+import pickle
 from importlib.resources import files
+from typing import Dict, Optional, Tuple
 from xml.etree import ElementTree
 
 from context import Font
+from context.diskcache import DiskCache, cache_key
 
 logger = logging.getLogger(__name__)
 
+# The attributes of GlyphData.xml entries kept in the index, in the order
+# of the index's records. Change _INDEX_VERSION when changing them.
+_FIELDS = ("production", "category")
+_INDEX_VERSION = "1"
+
+# Indexes already read by this process, by cache key
+_indexes: Dict[str, Dict[str, Tuple[Optional[str], ...]]] = {}
+
+
+def _parse(file) -> Dict[str, Tuple[Optional[str], ...]]:
+    index = {}
+    for _event, element in ElementTree.iterparse(file):
+        if element.tag == "glyph" and "name" in element.attrib:
+            attrib = element.attrib
+            index[attrib["name"]] = tuple(attrib.get(field) for field in _FIELDS)
+        # Nothing is kept in the tree, so it stays small
+        element.clear()
+    return index
+
+
+def glyph_data_index(file) -> Dict[str, Tuple[Optional[str], ...]]:
+    """Map the glyph names of a GlyphData.xml file to their production
+    name and category. The index is built once per version of the file
+    and kept in the on-disk cache."""
+    file = os.path.abspath(file)
+    stat = os.stat(file)
+    key = cache_key(_INDEX_VERSION, file, str(stat.st_mtime_ns), str(stat.st_size))
+    if key in _indexes:
+        return _indexes[key]
+    cache = DiskCache("glyphdata")
+    data = cache.get(key)
+    index = None
+    if data is not None:
+        try:
+            index = pickle.loads(data)
+        except Exception as e:
+            logger.debug("Ignoring unreadable glyph data index: %s", e)
+    if index is None:
+        logger.debug("Indexing %s", file)
+        index = _parse(file)
+        cache.set(key, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+    _indexes[key] = index
+    return index
+
 
 def bake_in_glyphdata(font: Font, args=None):
     logger.info("Baking in glyph data")
 
     if not args or "file" not in args:
         data_dir = files("context.data")
-        file = data_dir / "GlyphData.xml"
+        file = str(data_dir / "GlyphData.xml")
     else:
         file = args["file"]
 
-    parsed = ElementTree.parse(open(file, "rb")).getroot()
-    for glyph in parsed:
-        data = glyph.attrib
-        if data["name"] not in font.glyphs:
+    index = glyph_data_index(file)
+    for myglyph in font.glyphs:
+        record = index.get(myglyph.name)
+        if record is None:
             continue
-        myglyph = font.glyphs[data["name"]]
-        if "production" in data and not myglyph.production_name:
-            myglyph.production_name = data["production"]
-        if "category" in data and not myglyph.category:
-            if data["category"] == "Mark":
+        production, category = record
+        if production is not None and not myglyph.production_name:
+            myglyph.production_name = production
+        if category is not None and not myglyph.category:
+            if category == "Mark":
                 myglyph.category = "mark"
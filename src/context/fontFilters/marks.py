@@ -1,13 +1,13 @@
-import logging
-from context.Font import Font
+from .pipeline import GLYPH, Filter
 
-logger = logging.getLogger(__name__)
 
+def _zero_mark_width(glyph, _args):
+    if glyph.category != "mark":
+        return
+    for layer in glyph.layers:
+        layer.width = 0
 
-def zero_mark_widths(font: Font, args=None):
-    logger.info("Zeroing mark widths")
-    for glyph in font.glyphs:
-        if glyph.category != "mark":
-            continue
-        for layer in glyph.layers:
-            layer.width = 0
+
+zero_mark_widths = Filter(
+    _zero_mark_width, GLYPH, "Zeroing mark widths", where={"category": "mark"}
+)
@@ -0,0 +1,166 @@
+"""Run walks of glyph filters in worker processes.
+
+Glyphs are sent to the workers in batches, as the same JSON as in
+``.babelfont`` files, together with every glyph they use as a component;
+the workers apply the steps of the walk and send back the glyphs' layers,
+which replace the layers in the font. If a filter of the walk needs
+components first, the glyphs are sent one level of the component graph
+at a time, so that the components sent with a batch have already been
+filtered."""
+
+import copy
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from context.Axis import Axis
+from context.Font import Font
+from context.Glyph import Glyph
+from context.compiler import outlines
+
+from .pipeline import apply_steps, component_levels
+
+log = logging.getLogger(__name__)
+
+Steps = List[Tuple[Callable, bool, Any]]
+
+# The font and steps of the walk in a worker process
+_worker: dict = {}
+
+
+def worth_parallel(
+    font: Font, jobs: Optional[int], glyphs: Optional[int] = None
+) -> bool:
+    """Whether a walk over ``glyphs`` glyphs (by default, all of them)
+    should run in worker processes."""
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if glyphs is None:
+        glyphs = len(font.glyphs)
+    return jobs > 1 and glyphs >= outlines.POOL_MIN_GLYPHS
+
+
+def walk_in_processes(
+    font: Font,
+    steps: Steps,
+    components_first: bool,
+    jobs: Optional[int],
+    collect: List[bool],
+    selected: Optional[Dict[str, Glyph]] = None,
+) -> List[List[Any]]:
+    """Run a walk in worker processes, and return the state of each step
+    at the end of each batch, for the steps whose ``collect`` is true.
+    If ``selected`` is given, only the glyphs in it are visited."""
+    jobs = jobs or os.cpu_count() or 1
+    if components_first:
+        levels = component_levels(font)
+        if selected is not None:
+            levels = [[g for g in level if g.name in selected] for level in levels]
+    else:
+        levels = [list(font.glyphs if selected is None else selected.values())]
+    log.debug("Filtering %i glyphs in %i processes", len(font.glyphs), jobs)
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_start_worker,
+        initargs=(_dump_font(font), steps, collect),
+    ) as pool:
+        states = [[] for _ in steps]
+        for level in levels:
+            size = max(1, len(level) // (jobs * 4))
+            batches = [
+                _dump_batch(font, level[i : i + size])
+                for i in range(0, len(level), size)
+            ]
+            for results, batch_states in pool.map(_run_batch, batches):
+                for name, layers in results:
+                    _replace_layers(font, font.glyphs[name], orjson.loads(layers))
+                for step_states, state, keep in zip(states, batch_states, collect):
+                    if keep:
+                        step_states.append(state)
+    font._clear_caches()
+    return states
+
+
+def _dump(obj, key, value) -> bytes:
+    stream = io.BytesIO()
+    obj._write_value(stream, key, value)
+    return stream.getvalue()
+
+
+def _dump_font(font: Font) -> Tuple:
+    # Only what layers need to find their masters and components
+    return (
+        font.upm,
+        _dump(font, "axes", font.axes),
+        _dump(font, "masters", font.masters),
+    )
+
+
+def _dump_batch(font: Font, glyphs: List[Glyph]) -> Tuple[List[str], List[Tuple]]:
+    names = [glyph.name for glyph in glyphs]
+    needed = {}
+    todo = list(glyphs)
+    while todo:
+        glyph = todo.pop()
+        if glyph.name in needed:
+            continue
+        needed[glyph.name] = glyph
+        for layer in glyph.layers:
+            for component in layer.components:
+                if component.ref in font.glyphs and component.ref not in needed:
+                    todo.append(font.glyphs[component.ref])
+    return names, [
+        (_dump(glyph, "glyph", glyph), _dump(glyph, "layers", glyph.layers))
+        for glyph in needed.values()
+    ]
+
+
+def _start_worker(font_data: Tuple, steps: Steps, collect: List[bool]):
+    from context.convertors.nfsf import Context
+
+    upm, axes, masters = font_data
+    font = Font()
+    font.upm = upm
+    font.axes = [Axis(**j) for j in orjson.loads(axes)]
+    for axis in font.axes:
+        axis._set_parent(font)
+    convertor = Context()
+    convertor.font = font
+    convertor._load_masters(orjson.loads(masters))
+    _worker.update(font=font, convertor=convertor, steps=steps, collect=collect)
+
+
+def _run_batch(batch: Tuple[List[str], List[Tuple]]) -> Tuple[List, List]:
+    names, glyphs = batch
+    # Collected states start afresh for each batch
+    steps = [
+        (step, per_layer, copy.deepcopy(state) if keep else state)
+        for (step, per_layer, state), keep in zip(_worker["steps"], _worker["collect"])
+    ]
+    font, convertor = _worker["font"], _worker["convertor"]
+    font.glyphs.clear()
+    font._clear_caches()
+    for glyph, layers in glyphs:
+        convertor._inflate_glyph(Glyph(**orjson.loads(glyph)), orjson.loads(layers))
+    results = []
+    for name in names:
+        glyph = font.glyphs[name]
+        apply_steps(glyph, steps)
+        results.append((name, _dump(glyph, "layers", glyph.layers)))
+    states = [
+        state if keep else None
+        for (_, _, state), keep in zip(steps, _worker["collect"])
+    ]
+    return results, states
+
+
+def _replace_layers(font: Font, glyph: Glyph, json_layers: List[dict]):
+    from context.convertors.nfsf import Context
+
+    convertor = Context()
+    convertor.font = font
+    glyph.layers = convertor._inflate_layers(glyph, json_layers)
@@ -0,0 +1,222 @@
+"""Run several filters over a font in as few passes as possible.
+
+Most filters only look at one glyph (or one layer) at a time. Such
+filters are `Filter` objects which declare their scope, and the steps of
+consecutive per-glyph and per-layer filters are run together in a single
+walk over the glyphs. Filters which need to see the whole font at once
+are plain functions taking ``(font, args)``; they are run on their own,
+between the walks.
+
+A per-glyph filter which reads the glyph's components declares
+``components_first``: the walk then visits each glyph after all the
+glyphs it uses as components, so that every filter of the walk has
+already been applied to a glyph's components when the glyph is reached.
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from context import trace
+from context.Font import Font
+
+logger = logging.getLogger(__name__)
+
+FONT = "font"
+GLYPH = "glyph"
+LAYER = "layer"
+
+
+class Filter:
+    """A filter which is applied to each glyph, or to each layer.
+
+    ``step`` is called as ``step(glyph, state)`` for per-glyph filters and
+    as ``step(glyph, layer, state)`` for per-layer filters. ``state`` is
+    the return value of ``setup(font, args)`` (by default, the filter's
+    arguments), computed once before the walk. ``message`` is logged when
+    the filter runs, and ``finish(font, states)``, if given, is called
+    after the walk with the states the walk ended with. ``where``, if
+    given, selects the only glyphs the step changes, as arguments to
+    `GlyphList.where`; a walk whose filters all have one only visits the
+    glyphs they select. Calling a filter with ``(font, args)`` runs it on
+    its own, like any other filter function.
+
+    Steps may only change the glyph they are given, and must be picklable
+    (for example, module-level functions), as are the states: a walk may
+    run in several processes, each batch of glyphs with its own copy of
+    the state, and then ``finish`` is given the state of every batch."""
+
+    def __init__(
+        self,
+        step: Callable,
+        scope: str = GLYPH,
+        message: Optional[str] = None,
+        components_first: bool = False,
+        setup: Optional[Callable[[Font, dict], Any]] = None,
+        finish: Optional[Callable[[Font, List[Any]], None]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ):
+        if scope not in (GLYPH, LAYER):
+            raise ValueError("Filter steps apply to a glyph or a layer, not %s" % scope)
+        self.step = step
+        self.scope = scope
+        self.message = message
+        self.components_first = components_first
+        self.setup = setup or (lambda font, args: args)
+        self.finish = finish
+        self.where = where
+
+    def __repr__(self):
+        return "<Filter %s (%s)>" % (self.step.__name__, self.scope)
+
+    def __call__(self, font: Font, args=None):
+        run_filters(font, [(self, args)])
+
+
+def scope(fltr: Callable) -> str:
+    """Whether a filter applies to each ``"glyph"``, each ``"layer"`` or
+    to the whole ``"font"``."""
+    return getattr(fltr, "scope", FONT)
+
+
+def plan(filters: Iterable[Tuple[Callable, dict]]) -> List[List[Tuple[Callable, dict]]]:
+    """Group filters into the stages in which they run: each stage is
+    either one whole-font filter, or consecutive per-glyph and per-layer
+    filters which share a single walk over the glyphs."""
+    stages = []
+    for fltr, args in filters:
+        if scope(fltr) != FONT and stages and scope(stages[-1][0][0]) != FONT:
+            stages[-1].append((fltr, args))
+        else:
+            stages.append([(fltr, args)])
+    return stages
+
+
+def run_filters(
+    font: Font, filters: Iterable[Tuple[Callable, dict]], jobs: Optional[int] = 1
+):
+    """Apply filters, given as ``(filter, args)`` pairs, to the font in
+    order, sharing walks over the glyphs between adjacent filters. Walks
+    are run in ``jobs`` processes (``None`` for one per CPU) if the font
+    has enough glyphs to make it worthwhile."""
+    for stage in plan(filters):
+        with trace.span(
+            "Filter " + ", ".join(filter_name(fltr) for fltr, _ in stage),
+            glyphs=len(font.glyphs),
+        ):
+            if scope(stage[0][0]) == FONT:
+                fltr, args = stage[0]
+                fltr(font, args)
+            else:
+                _walk(font, stage, jobs)
+
+
+def filter_name(fltr: Callable) -> str:
+    """The name by which a filter is known on the command line."""
+    from . import FILTERS
+
+    for name, known in FILTERS.items():
+        if known is fltr:
+            return name
+    return getattr(fltr, "__name__", None) or repr(fltr)
+
+
+def _walk(font: Font, stage: List[Tuple[Filter, dict]], jobs: Optional[int]):
+    from .parallel import walk_in_processes, worth_parallel
+
+    steps = []
+    for fltr, args in stage:
+        if fltr.message:
+            logger.info(fltr.message)
+        steps.append((fltr.step, fltr.scope == LAYER, fltr.setup(font, args)))
+    dependent = any(fltr.components_first for fltr, _ in stage)
+    selected = _selected(font, stage)
+    if worth_parallel(font, jobs, len(font.glyphs if selected is None else selected)):
+        collect = [fltr.finish is not None for fltr, _ in stage]
+        states = walk_in_processes(font, steps, dependent, jobs, collect, selected)
+    else:
+        if dependent:
+            glyphs = components_first(font)
+            if selected is not None:
+                glyphs = [glyph for glyph in glyphs if glyph.name in selected]
+        elif selected is not None:
+            glyphs = sorted(selected.values(), key=lambda g: font.glyphs.index(g.name))
+        else:
+            glyphs = list(font.glyphs)
+        for glyph in glyphs:
+            apply_steps(glyph, steps)
+        states = [[state] for _, _, state in steps]
+    for (fltr, _), fltr_states in zip(stage, states):
+        if fltr.finish is not None:
+            fltr.finish(font, fltr_states)
+
+
+def _selected(font: Font, stage: List[Tuple[Filter, dict]]) -> Optional[Dict]:
+    """The glyphs, by name, which a walk needs to visit, or ``None`` if
+    it visits them all."""
+    if any(fltr.where is None for fltr, _ in stage):
+        return None
+    selected = {}
+    for fltr, _ in stage:
+        selected.update(
+            (glyph.name, glyph) for glyph in font.glyphs.where(**fltr.where)
+        )
+    return selected
+
+
+def apply_steps(glyph, steps: List[Tuple[Callable, bool, Any]]):
+    """Apply the ``(step, per_layer, state)`` steps of a walk to a glyph."""
+    for step, per_layer, state in steps:
+        if per_layer:
+            for layer in glyph.layers:
+                step(glyph, layer, state)
+        else:
+            step(glyph, state)
+
+
+def components_first(font: Font) -> List:
+    """The font's glyphs, each one after every glyph it uses as a
+    component in any layer; otherwise in the font's order."""
+    glyphs = font.glyphs
+    placed: Dict[str, bool] = {}
+    result = []
+    for root in glyphs:
+        if root.name in placed:
+            continue
+        # Iterative depth-first walk, emitting each glyph after its
+        # components; a glyph already on the stack is a cycle and is
+        # not waited for.
+        stack = [(root, None)]
+        placed[root.name] = False
+        while stack:
+            glyph, refs = stack[-1]
+            if refs is None:
+                refs = iter(
+                    {c.ref: None for layer in glyph.layers for c in layer.components}
+                )
+                stack[-1] = (glyph, refs)
+            for ref in refs:
+                if ref not in placed and ref in glyphs:
+                    placed[ref] = False
+                    stack.append((glyphs[ref], None))
+                    break
+            else:
+                stack.pop()
+                placed[glyph.name] = True
+                result.append(glyph)
+    return result
+
+
+def component_levels(font: Font) -> List[List]:
+    """The font's glyphs grouped so that the glyphs of each group only use
+    glyphs of earlier groups as components."""
+    depths: Dict[str, int] = {}
+    levels: List[List] = []
+    for glyph in components_first(font):
+        refs = {c.ref for layer in glyph.layers for c in layer.components}
+        # Components not yet placed are part of a cycle
+        depth = max((depths[ref] + 1 for ref in refs if ref in depths), default=0)
+        depths[glyph.name] = depth
+        if depth == len(levels):
+            levels.append([])
+        levels[depth].append(glyph)
+    return levels
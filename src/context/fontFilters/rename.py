@@ -1,10 +1,11 @@
+from copy import deepcopy
 import logging
+from typing import Dict
 
 from fontTools.feaLib import ast
 from fontTools.misc.visitor import Visitor
 
 from context.Font import Font
-from context.Glyph import GlyphList
 
 logger = logging.getLogger(__name__)
 
@@ -25,36 +26,77 @@ def rename_glyphs(font: Font, args: dict = {}):
             "rename_glyphs requires either a 'mapping' or 'production' argument"
         )
     logger.info(msg)
-
-    # Step 1: features
-    # 1a) classes
-    for cls in font.features.classes.keys():
-        font.features.classes[cls] = [
-            mapping.get(glyph, glyph) for glyph in font.features.classes[cls]
-        ]
-    # 1b) prefixes
-    parsed_features = font.features.as_ast(font)
-    for prefix in font.features.prefixes.keys():
-        font.features.prefixes[prefix] = _rename_fea(
-            parsed_features["prefixes"][prefix],
-            mapping,
-        ).asFea()
-    # 1c) features
-    font.features.features = [
-        (
-            featurename,
-            _drop_wrapper(_rename_fea(parsed_ast, mapping)).asFea(),
-        )
-        for featurename, parsed_ast in parsed_features["features"]
-    ]
+    rename(font, mapping)
+
+
+def rename(font: Font, mapping: Dict[str, str]):
+    """Rename glyphs, and every reference to them: components, kerning,
+    kern groups and feature code, in a single pass over each. Structures
+    which do not refer to a renamed glyph are left untouched."""
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return
+    # Before anything is changed
+    font.glyphs.check_rename(mapping)
+
+    # Step 1: features. Only the parts of the feature code which refer to
+    # renamed glyphs are rewritten.
+    features = font.features
+    affected = features.glyph_references(font).referencing(mapping, dependents=False)
+    parsed_features = features.as_ast(font, readonly=True) if affected else None
+    newfeatures = list(features.features)
+    for reference in affected:
+        # 1a) classes
+        if reference.kind == "class":
+            features.classes[reference.name] = [
+                mapping.get(glyph, glyph) for glyph in features.classes[reference.name]
+            ]
+        # 1b) prefixes
+        elif reference.kind == "prefix":
+            parsed = deepcopy(parsed_features["prefixes"][reference.name])
+            features.prefixes[reference.name] = _rename_fea(parsed, mapping).asFea()
+        # 1c) features
+        else:
+            parsed = deepcopy(parsed_features["features"][reference.index][1])
+            newfeatures[reference.index] = (
+                reference.name,
+                _drop_wrapper(_rename_fea(parsed, mapping)).asFea(),
+            )
+    if affected:
+        features.features = newfeatures
+
+    # Step 2: components
     for glyph in font.glyphs:
-        # Step 2: components
         for layer in glyph.layers:
             for component in layer.components:
-                component.ref = mapping.get(component.ref, component.ref)
-        # Step 3: glyphs
-        glyph.name = mapping.get(glyph.name, glyph.name)
-    font.glyphs = GlyphList({glyph.name: glyph for glyph in font.glyphs})
+                if component.ref in mapping:
+                    component.ref = mapping[component.ref]
+
+    # Step 3: kerning and kern groups
+    _rename_kerning(font, mapping)
+
+    # Step 4: glyphs
+    font.glyphs.rename(mapping)
+    font._clear_caches()
+
+
+def _rename_kerning(font: Font, mapping: Dict[str, str]):
+    """Rename glyphs in the kerning of each master and in the kern groups."""
+    for master in font.masters:
+        if any(left in mapping or right in mapping for left, right in master.kerning):
+            master.kerning = {
+                (mapping.get(left, left), mapping.get(right, right)): kern
+                for (left, right), kern in master.kerning.items()
+            }
+    for attribute in ("first_kern_groups", "second_kern_groups"):
+        groups = getattr(font, attribute)
+        changed = {
+            group: [mapping.get(member, member) for member in members]
+            for group, members in groups.items()
+            if any(member in mapping for member in members)
+        }
+        if changed:
+            setattr(font, attribute, {**groups, **changed})
 
 
 class FeaRenameVisitor(Visitor):
@@ -0,0 +1,359 @@
+"""Serve fonts kept in memory to other processes over a Unix socket.
+
+Clients send JSON-RPC 2.0 requests, one JSON object per line, and get one
+response per line. Fonts are named by their path, loaded on first use
+and kept loaded. Before each request on a font, the files it was loaded
+from are checked: if only glyph files of a ``.babelfont`` changed, just
+those glyphs are read again; if anything else changed, the whole font is.
+
+Methods (``path`` is the font's path):
+
+- ``open(path)``: load the font if needed and describe it.
+- ``close(path)``: forget the font.
+- ``fonts()``: the paths of the loaded fonts.
+- ``glyphs(path)``: every glyph, without layers.
+- ``glyph(path, name)``: a glyph and its layers.
+- ``filter(path, filters)``: apply filters, given as on the command line.
+- ``save(path, output=None)``: save the font, by default where it came from.
+- ``changes(path, context="canvas_render", clear=True)``: the objects
+  which are dirty in a dirty-tracking context, which is then cleared.
+- ``reload(path)``: check the files on disk now, and tell what was read.
+- ``shutdown()``: stop the server.
+
+Glyphs, layers and masters are returned in the same JSON as in
+``.babelfont`` files."""
+
+import io
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from context import load
+from context.BaseObject import DIRTY_CANVAS_RENDER, DIRTY_FILE_SAVING
+from context.Font import Font
+
+log = logging.getLogger(__name__)
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+# Files of a .babelfont other than the glyphs; if any changes, the whole
+# font is loaded again
+_FONT_FILES = ("info.json", "names.json", "glyphs.json", "features.fea")
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _to_json(obj) -> Any:
+    stream = io.BytesIO()
+    obj.write(stream)
+    return orjson.loads(stream.getvalue())
+
+
+def _signature(path: str) -> Dict[str, Optional[int]]:
+    """The modification times of the files a font is loaded from."""
+    if not os.path.isdir(path):
+        return {"": os.stat(path).st_mtime_ns}
+    signature = {}
+    for name in _FONT_FILES:
+        try:
+            signature[name] = os.stat(os.path.join(path, name)).st_mtime_ns
+        except FileNotFoundError:
+            signature[name] = None
+    glyph_dir = os.path.join(path, "glyphs")
+    if os.path.isdir(glyph_dir):
+        with os.scandir(glyph_dir) as it:
+            for entry in it:
+                signature["glyphs/" + entry.name] = entry.stat().st_mtime_ns
+    return signature
+
+
+class _OpenFont:
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = _signature(path)
+        self.font: Font = load(path)
+
+    def refresh(self) -> Optional[List[str]]:
+        """Read again what changed on disk. Return the names of the glyphs
+        read again, all of them if the whole font was, or ``None`` if
+        nothing changed."""
+        signature = _signature(self.path)
+        if signature == self.signature:
+            return None
+        changed = {
+            key
+            for key in signature.keys() | self.signature.keys()
+            if signature.get(key) != self.signature.get(key)
+        }
+        self.signature = signature
+        if any(not key.startswith("glyphs/") for key in changed):
+            return self._reload()
+        by_file = {
+            glyph.babelfont_filename.replace(os.sep, "/"): glyph
+            for glyph in self.font.glyphs
+        }
+        if not changed <= by_file.keys() or any(
+            signature.get(key) is None for key in changed
+        ):
+            return self._reload()
+        return self._reload_glyphs([by_file[key] for key in sorted(changed)])
+
+    def _reload(self) -> List[str]:
+        if self.font.is_dirty(DIRTY_FILE_SAVING):
+            log.warning("%s changed on disk; discarding unsaved edits", self.path)
+        log.info("Reloading %s", self.path)
+        self.font = load(self.path)
+        return [glyph.name for glyph in self.font.glyphs]
+
+    def _reload_glyphs(self, glyphs) -> List[str]:
+        from context.convertors.nfsf import Context
+
+        convertor = Context()
+        convertor.font = self.font
+        convertor.filename = self.path
+        for glyph in glyphs:
+            if glyph.is_dirty(DIRTY_FILE_SAVING):
+                log.warning(
+                    "Glyph %s changed on disk; discarding unsaved edits", glyph.name
+                )
+            log.info("Reloading glyph %s of %s", glyph.name, self.path)
+            json_layers = convertor._load_file(glyph.babelfont_filename)
+            glyph.layers = convertor._inflate_layers(glyph, json_layers)
+            # The glyph matches the disk again
+            glyph.mark_clean(DIRTY_FILE_SAVING, recursive=True)
+        self.font._clear_caches()
+        return [glyph.name for glyph in glyphs]
+
+
+class FontServer:
+    """Answers JSON-RPC requests about the fonts it keeps loaded. Requests
+    are handled one at a time."""
+
+    def __init__(self):
+        self.fonts: Dict[str, _OpenFont] = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.methods: Dict[str, Callable] = {
+            "open": self.open,
+            "close": self.close,
+            "fonts": self.list_fonts,
+            "glyphs": self.glyphs,
+            "glyph": self.glyph,
+            "filter": self.filter,
+            "save": self.save,
+            "changes": self.changes,
+            "reload": self.reload,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, line: bytes) -> Optional[bytes]:
+        """Answer one request line; notifications get no answer."""
+        request_id = None
+        try:
+            try:
+                request = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise RPCError(PARSE_ERROR, "Parse error: %s" % e)
+            if not isinstance(request, dict) or "method" not in request:
+                raise RPCError(INVALID_REQUEST, "Invalid request")
+            request_id = request.get("id")
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise RPCError(METHOD_NOT_FOUND, "No method %s" % request["method"])
+            params = request.get("params", {})
+            with self.lock:
+                try:
+                    if isinstance(params, list):
+                        result = method(*params)
+                    else:
+                        result = method(**params)
+                except TypeError as e:
+                    raise RPCError(INVALID_PARAMS, str(e))
+            if "id" not in request:
+                return None
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RPCError as e:
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": e.code, "message": str(e)},
+            }
+        except Exception as e:
+            log.exception("Error handling request")
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": SERVER_ERROR, "message": str(e)},
+            }
+        return orjson.dumps(response) + b"\n"
+
+    def _font(self, path: str) -> Font:
+        path = os.path.abspath(path)
+        open_font = self.fonts.get(path)
+        if open_font is None:
+            if not os.path.exists(path):
+                raise RPCError(SERVER_ERROR, "No such font: %s" % path)
+            log.info("Loading %s", path)
+            open_font = self.fonts[path] = _OpenFont(path)
+        else:
+            open_font.refresh()
+        return open_font.font
+
+    def open(self, path: str) -> Dict:
+        font = self._font(path)
+        return {
+            "path": os.path.abspath(path),
+            "glyphs": len(font.glyphs),
+            "masters": [master.id for master in font.masters],
+            "axes": [axis.tag for axis in font.axes],
+        }
+
+    def close(self, path: str) -> bool:
+        return self.fonts.pop(os.path.abspath(path), None) is not None
+
+    def list_fonts(self) -> List[str]:
+        return list(self.fonts)
+
+    def glyphs(self, path: str) -> List:
+        return [_to_json(glyph) for glyph in self._font(path).glyphs]
+
+    def glyph(self, path: str, name: str) -> Dict:
+        font = self._font(path)
+        if name not in font.glyphs:
+            raise RPCError(SERVER_ERROR, "No glyph %s" % name)
+        glyph = font.glyphs[name]
+        return {
+            "glyph": _to_json(glyph),
+            "layers": [_to_json(layer) for layer in glyph.layers],
+        }
+
+    def filter(self, path: str, filters: List[str]) -> List[str]:
+        from context.fontFilters import parse_filter, run_filters
+
+        font = self._font(path)
+        try:
+            parsed = [parse_filter(f) for f in filters]
+        except ValueError as e:
+            raise RPCError(INVALID_PARAMS, str(e))
+        run_filters(font, parsed)
+        return filters
+
+    def save(self, path: str, output: Optional[str] = None) -> str:
+        path = os.path.abspath(path)
+        font = self._font(path)
+        output = os.path.abspath(output) if output else path
+        font.save(output)
+        if output == path:
+            # What is on disk is what we have
+            self.fonts[path].signature = _signature(path)
+        return output
+
+    def changes(
+        self, path: str, context: str = DIRTY_CANVAS_RENDER, clear: bool = True
+    ) -> Dict:
+        if clear and context == DIRTY_FILE_SAVING:
+            raise RPCError(
+                INVALID_PARAMS, "Saving clears the %s context" % DIRTY_FILE_SAVING
+            )
+        font = self._font(path)
+        result: Dict[str, Any] = {"font": sorted(font.get_dirty_fields(context))}
+        if "glyphs" in result["font"]:
+            result["glyph_names"] = list(font.glyphs.keys())
+        glyphs = {}
+        for glyph in font.glyphs:
+            if not glyph.is_dirty(context):
+                continue
+            fields = glyph.get_dirty_fields(context)
+            glyphs[glyph.name] = {
+                "fields": sorted(fields),
+                "layers": [
+                    _to_json(layer)
+                    for layer in glyph.layers
+                    if "layers" in fields or layer.is_dirty(context)
+                ],
+            }
+        result["glyphs"] = glyphs
+        result["masters"] = [
+            _to_json(master) for master in font.masters if master.is_dirty(context)
+        ]
+        if font.features.is_dirty(context):
+            result["features"] = font.features.to_fea()
+        if clear:
+            font.mark_clean(context, recursive=True)
+        return result
+
+    def reload(self, path: str) -> List[str]:
+        path = os.path.abspath(path)
+        if path not in self.fonts:
+            self._font(path)
+            return [glyph.name for glyph in self.fonts[path].font.glyphs]
+        return self.fonts[path].refresh() or []
+
+    def shutdown(self) -> bool:
+        self.stopping.set()
+        return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.font_server.handle(line)
+            if response is not None:
+                self.wfile.write(response)
+                self.wfile.flush()
+            if self.server.font_server.stopping.is_set():
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class _SocketServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_stale_socket(socket_path: str):
+    """Remove a socket left behind by a server which is no longer running.
+    Anything else at the path is left alone, and is an error."""
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("%s exists and is not a socket" % socket_path)
+    with socket.socket(socket.AF_UNIX) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            log.info("Removing stale socket %s", socket_path)
+            os.remove(socket_path)
+            return
+    raise FileExistsError("A server is already running on %s" % socket_path)
+
+
+def serve(socket_path: str, font_server: Optional[FontServer] = None):
+    """Answer requests on a Unix socket at ``socket_path`` until a client
+    asks the server to shut down. Raises `FileExistsError` if something
+    other than a stale socket is at the path."""
+    _remove_stale_socket(socket_path)
+    with _SocketServer(socket_path, _Handler) as server:
+        server.font_server = font_server or FontServer()
+        log.info("Serving on %s", socket_path)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
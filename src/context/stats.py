@@ -0,0 +1,154 @@
+"""Count and time what the object model does, for profiling.
+
+Statistics are off by default, and then cost next to nothing: counters
+in hot code are guarded by a check of `enabled`, and the timed methods
+are only wrapped while statistics are on. So they can stay in place and
+be switched on in a running session::
+
+    from context import stats
+
+    stats.enable()
+    ...  # edit, draw, compile
+    print(stats.snapshot())
+    stats.disable()
+
+Counters:
+
+- ``mark_dirty``: calls to `BaseObject.mark_dirty`, including those
+  propagating to parents; ``mark_dirty.parent_hops`` counts the steps up
+  to a parent.
+- ``nodes.inflated``: nodes created while loading ``.babelfont`` files.
+- ``features.blocks_parsed`` and ``features.blocks_reused``: feature code
+  blocks parsed, or taken from the AST cache, by `Features.as_ast` and
+  friends.
+- ``Font.<property>.hit`` and ``.miss``: lookups of the font's cached
+  properties which found a cached value, or computed it.
+
+Timers, with the number of calls and the total time, are kept for
+`Layer.draw`, `Layer.drawPoints`, `Master.get_glyph_layer`,
+`Features.as_ast` and `Node.write` (one call per node serialized)."""
+
+import functools
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+enabled = False
+
+_counters: Counter = Counter()
+# Name -> [calls, seconds]
+_timers: Dict[str, List] = {}
+# (class, attribute, name, wrapper factory) of the instrumented attributes
+_instrumented: List[Tuple] = []
+_originals: Dict[Tuple[type, str], object] = {}
+
+
+def count(name: str, n: int = 1):
+    """Add ``n`` to a counter. Hot code should check `enabled` first."""
+    _counters[name] += n
+
+
+def add_time(name: str, seconds: float):
+    timer = _timers.setdefault(name, [0, 0.0])
+    timer[0] += 1
+    timer[1] += seconds
+
+
+def _timed(function, name: str):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            add_time(name, time.perf_counter() - start)
+
+    return timed
+
+
+class _CountedCachedProperty:
+    """A `functools.cached_property` which counts hits and misses. Unlike
+    the original, it is a data descriptor, so it also sees the hits."""
+
+    def __init__(self, prop: functools.cached_property, name: str):
+        self.prop = prop
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cache = instance.__dict__
+        attrname = self.prop.attrname
+        if attrname in cache:
+            _counters[self.name + ".hit"] += 1
+            return cache[attrname]
+        _counters[self.name + ".miss"] += 1
+        value = cache[attrname] = self.prop.func(instance)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.prop.attrname] = value
+
+
+def instrument(cls: type, attribute: str, name: Optional[str] = None):
+    """Time calls to a method of ``cls`` while statistics are enabled."""
+    _register(cls, attribute, name or "%s.%s" % (cls.__name__, attribute), _timed)
+
+
+def instrument_cached(cls: type, attributes):
+    """Count the hits and misses of cached properties of ``cls`` while
+    statistics are enabled."""
+    for attribute in attributes:
+        name = "%s.%s" % (cls.__name__, attribute.lstrip("_"))
+        _register(cls, attribute, name, _CountedCachedProperty)
+
+
+def _register(cls, attribute, name, wrap):
+    _instrumented.append((cls, attribute, name, wrap))
+    if enabled:
+        _wrap(cls, attribute, name, wrap)
+
+
+def _wrap(cls, attribute, name, wrap):
+    original = cls.__dict__[attribute]
+    _originals[(cls, attribute)] = original
+    setattr(cls, attribute, wrap(original, name))
+
+
+def enable():
+    """Start counting and timing."""
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    for entry in _instrumented:
+        _wrap(*entry)
+
+
+def disable():
+    """Stop counting and timing; the statistics so far are kept."""
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    for (cls, attribute), original in _originals.items():
+        setattr(cls, attribute, original)
+    _originals.clear()
+
+
+def reset():
+    """Forget the statistics so far."""
+    _counters.clear()
+    _timers.clear()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """The statistics so far, as ``{"counters": {name: count}, "timers":
+    {name: {"calls": calls, "seconds": seconds}}}``."""
+    return {
+        "counters": dict(_counters),
+        "timers": {
+            name: {"calls": calls, "seconds": seconds}
+            for name, (calls, seconds) in _timers.items()
+        },
+    }
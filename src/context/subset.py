@@ -0,0 +1,168 @@
+"""Extract the part of a font which some glyphs or characters need.
+
+The glyphs asked for are closed over the glyphs they use as components
+and the glyphs which the feature code can substitute for them, until no
+more are found. The subset font then has only those glyphs, the kerning
+and kern groups which still refer to them, and the feature code subset
+to them.
+
+Nothing is deep-copied. The subset's font, masters, glyphs and layers are
+new objects, since they point to the font holding them, as are the
+shapes, anchors and guides of the layers, which point to their layer.
+Everything else is shared with the original font: axes, instances, the
+names, and the nodes of the paths. Change a shared object in one font
+only after copying it."""
+
+import itertools
+import logging
+from dataclasses import replace
+from typing import Iterable, Optional, Set
+
+from ufomerge.layout import LayoutClosureVisitor
+
+from context.Features import Features
+from context.Font import Font
+from context.Glyph import Glyph
+from context.fontFilters.dropUnexported import _subset_features
+
+log = logging.getLogger(__name__)
+
+_KERN_GROUPS = ("first_kern_groups", "second_kern_groups")
+
+
+def glyph_closure(font: Font, glyphs: Iterable[str]) -> Set[str]:
+    """The names of ``glyphs`` and of every glyph they need: the glyphs
+    used as components in their layers, and the glyphs which the feature
+    code can substitute for them, and so on."""
+    closure: Set[str] = set()
+    pending = list(glyphs)
+    blocks = None
+    while pending:
+        while pending:
+            name = pending.pop()
+            if name in closure:
+                continue
+            closure.add(name)
+            for layer in font.glyphs[name].layers:
+                pending.extend(
+                    component.ref
+                    for component in layer.components
+                    if component.ref not in closure and component.ref in font.glyphs
+                )
+        if blocks is None:
+            parsed = font.features.as_ast(font, readonly=True)
+            blocks = list(parsed["prefixes"].values())
+            blocks.extend(block for _tag, block in parsed["features"])
+        # A substitution may only become reachable through glyphs found by
+        # a later one, so this goes round until nothing new turns up
+        reachable = set(closure)
+        visitor = LayoutClosureVisitor(incoming_glyphset={}, glyphset=reachable)
+        for block in blocks:
+            visitor.visit(block)
+        pending = [name for name in reachable - closure if name in font.glyphs]
+    return closure
+
+
+def subset_font(
+    font: Font,
+    glyphs: Optional[Iterable[str]] = None,
+    unicodes: Optional[Iterable[int]] = None,
+) -> Font:
+    """A new font with the glyphs named in ``glyphs``, the glyphs encoding
+    the codepoints in ``unicodes``, ``.notdef``, and everything they need.
+    See `Font.subset`."""
+    wanted = []
+    for name in glyphs or ():
+        if name not in font.glyphs:
+            raise ValueError("No glyph called %s in the font" % name)
+        wanted.append(name)
+    for codepoint in unicodes or ():
+        wanted.extend(glyph.name for glyph in font.glyphs.where(codepoint=codepoint))
+    if ".notdef" in font.glyphs:
+        wanted.append(".notdef")
+    keep = glyph_closure(font, wanted)
+    dropped = {name for name in font.glyphs.keys() if name not in keep}
+    log.info("Subsetting %i of %i glyphs", len(keep), len(font.glyphs))
+
+    features = Features(
+        classes=dict(font.features.classes),
+        prefixes=dict(font.features.prefixes),
+        features=list(font.features.features),
+    )
+    if dropped:
+        _subset_features(font, dropped, features)
+
+    # Kern groups left with no glyphs, and classes emptied by subsetting the
+    # feature code, can no longer be kerned
+    emptied = {name for name, members in features.classes.items() if not members}
+    kern_groups = {}
+    for attribute in _KERN_GROUPS:
+        groups = kern_groups[attribute] = {}
+        for group, members in getattr(font, attribute).items():
+            members = [member for member in members if member in keep]
+            if members:
+                groups[group] = members
+            else:
+                emptied.add(group)
+
+    subset = Font(
+        upm=font.upm,
+        version=font.version,
+        axes=list(font.axes),
+        instances=list(font.instances),
+        note=font.note,
+        date=font.date,
+        names=replace(font.names),
+        custom_opentype_values=dict(font.custom_opentype_values),
+        features=features,
+        _formatspecific=font._formatspecific,
+        **kern_groups,
+    )
+
+    def kept(side: str) -> bool:
+        if side.startswith("@"):
+            return side[1:] not in emptied
+        return side in keep
+
+    for master in font.masters:
+        new_master = replace(
+            master,
+            font=subset,
+            location=dict(master.location) if master.location is not None else None,
+            guides=list(master.guides),
+            metrics=dict(master.metrics),
+            kerning={
+                pair: kern
+                for pair, kern in master.kerning.items()
+                if kept(pair[0]) and kept(pair[1])
+            },
+        )
+        new_master._set_parent(subset)
+        subset.masters.append(new_master)
+
+    subset.glyphs.extend(
+        _copy_glyph(glyph, subset) for glyph in font.glyphs if glyph.name in keep
+    )
+    return subset
+
+
+def _copy_glyph(glyph: Glyph, font: Font) -> Glyph:
+    new_glyph = replace(glyph, codepoints=list(glyph.codepoints), layers=[])
+    new_glyph._set_parent(font)
+    for layer in glyph.layers:
+        new_layer = replace(
+            layer,
+            _font=font,
+            _glyph=new_glyph,
+            # The lists of nodes are shared
+            shapes=[replace(shape) for shape in layer.shapes],
+            anchors=[replace(anchor) for anchor in layer.anchors],
+            guides=[replace(guide) for guide in layer.guides],
+        )
+        new_layer._set_parent(new_glyph)
+        for child in itertools.chain(
+            new_layer.shapes, new_layer.anchors, new_layer.guides
+        ):
+            child._set_parent(new_layer)
+        new_glyph.layers.append(new_layer)
+    return new_glyph
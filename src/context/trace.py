@@ -0,0 +1,114 @@
+"""Record how long the stages of a run take, as a Chrome trace.
+
+Code marks its stages with `span`, which does nothing until tracing is
+started with `start`. Each span records its duration, any arguments given
+to it (glyph counts, file names, ...), and the peak resident memory of
+the process when it ends. `save` writes the spans as Chrome trace-event
+JSON, which Perfetto (https://ui.perfetto.dev) and ``chrome://tracing``
+open without a network connection."""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import orjson
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_events: Optional[List[dict]] = None
+_start = 0
+
+
+def start():
+    """Start recording spans, discarding any recorded before."""
+    global _events, _start
+    _events = []
+    _start = time.perf_counter_ns()
+
+
+def stop() -> List[dict]:
+    """Stop recording spans and return the recorded trace events."""
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def _now() -> float:
+    # Trace timestamps are in microseconds
+    return (time.perf_counter_ns() - _start) / 1000
+
+
+def peak_rss() -> Optional[float]:
+    """The peak resident memory of the process so far, in megabytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "context", **args):
+    """Record the time spent in the ``with`` block as a span called
+    ``name``. Arguments are shown with the span; more can be added to the
+    yielded dictionary inside the block."""
+    if _events is None:
+        yield {}
+        return
+    args = dict(args)
+    begin = _now()
+    try:
+        yield args
+    finally:
+        end = _now()
+        rss = peak_rss()
+        if rss is not None:
+            args["peak_rss_mb"] = round(rss, 1)
+        if _events is not None:
+            _events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": begin,
+                    "dur": end - begin,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+            if rss is not None:
+                _events.append(
+                    {
+                        "name": "peak RSS (MB)",
+                        "ph": "C",
+                        "ts": end,
+                        "pid": os.getpid(),
+                        "args": {"peak_rss_mb": round(rss, 1)},
+                    }
+                )
+
+
+def save(filename: str):
+    """Stop recording and write the spans to ``filename``."""
+    events = stop()
+    events.append(
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "args": {"name": "context"},
+        }
+    )
+    with open(filename, "wb") as fh:
+        fh.write(orjson.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
@@ -0,0 +1,156 @@
+"""Shared fixtures for building small fonts in memory."""
+
+import pytest
+
+from context.Anchor import Anchor
+from context.Axis import Axis
+from context.Font import Font
+from context.Glyph import Glyph
+from context.Layer import Layer
+from context.Master import Master
+from context.Node import Node
+from context.Shape import Shape
+
+
+def square(x, y, size):
+    return Shape(
+        nodes=[
+            Node(x, y, "l"),
+            Node(x + size, y, "l"),
+            Node(x + size, y + size, "l"),
+            Node(x, y + size, "l"),
+        ]
+    )
+
+
+def add_glyph(font, name, category="base", codepoints=None, exported=True, **layers):
+    """Add a glyph to ``font``. Each keyword argument maps a master ID to a
+    dict of ``Layer`` fields; anchors may be given as ``(name, x, y)`` tuples."""
+    glyph = Glyph(
+        name=name,
+        category=category,
+        codepoints=codepoints or [],
+        exported=exported,
+    )
+    glyph._set_parent(font)
+    for master_id, data in layers.items():
+        data = dict(data)
+        anchors = [Anchor(name=n, x=x, y=y) for n, x, y in data.pop("anchors", [])]
+        layer = Layer(_master=master_id, id=master_id, **data)
+        layer.anchors = anchors
+        layer._font = font
+        layer._glyph = glyph
+        layer._set_parent(glyph)
+        for shape in layer.shapes:
+            shape._set_parent(layer)
+        for anchor in layer.anchors:
+            anchor._set_parent(layer)
+        glyph.layers.append(layer)
+    font.glyphs.append(glyph)
+    return glyph
+
+
+def make_font(weights=(400,)):
+    """Build a font with one master per entry of ``weights`` on a weight
+    axis; the first entry is the default."""
+    font = Font()
+    font.date = font.date.replace(microsecond=0)
+    font.names.familyName.set_default("Test")
+    if len(weights) > 1:
+        axis = Axis(
+            name="Weight",
+            tag="wght",
+            min=min(weights),
+            max=max(weights),
+            default=weights[0],
+        )
+        axis._set_parent(font)
+        font.axes.append(axis)
+    for wght in weights:
+        master = Master(
+            name="W%i" % wght,
+            id="m%i" % wght,
+            location={"wght": wght} if len(weights) > 1 else {},
+            font=font,
+        )
+        master._set_parent(font)
+        font.masters.append(master)
+    return font
+
+
+def build_mark_font():
+    """A two-master font with bases, marks, a ligature and cursive glyphs."""
+    font = make_font((400, 900))
+    add_glyph(
+        font,
+        "A",
+        codepoints=[0x41],
+        m400={
+            "width": 600,
+            "shapes": [square(100, 0, 400)],
+            "anchors": [("top", 300, 700)],
+        },
+        m900={
+            "width": 700,
+            "shapes": [square(100, 0, 500)],
+            "anchors": [("top", 350, 750)],
+        },
+    )
+    add_glyph(
+        font,
+        "B",
+        codepoints=[0x42],
+        m400={
+            "width": 600,
+            "shapes": [square(100, 0, 400)],
+            "anchors": [("top", 300, 700)],
+        },
+        m900={
+            "width": 700,
+            "shapes": [square(100, 0, 500)],
+            "anchors": [("top", 300, 700)],
+        },
+    )
+    add_glyph(
+        font,
+        "acutecomb",
+        category="mark",
+        codepoints=[0x301],
+        m400={"anchors": [("_top", 0, 500), ("top", 0, 700)]},
+        m900={"anchors": [("_top", 0, 550), ("top", 0, 750)]},
+    )
+    add_glyph(
+        font,
+        "gravecomb",
+        category="mark",
+        codepoints=[0x300],
+        m400={"anchors": [("_top", 0, 500)]},
+        m900={"anchors": [("_top", 0, 550)]},
+    )
+    add_glyph(
+        font,
+        "f_i",
+        category="ligature",
+        m400={"width": 900, "anchors": [("top_1", 200, 700), ("top_2", 600, 700)]},
+        m900={"width": 1000, "anchors": [("top_1", 250, 700), ("top_2", 650, 700)]},
+    )
+    add_glyph(
+        font,
+        "kashida",
+        m400={"width": 300, "anchors": [("entry", 300, 0), ("exit", 0, 0)]},
+        m900={"width": 300, "anchors": [("entry", 300, 0), ("exit", 0, 0)]},
+    )
+    return font
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep on-disk caches out of the user's cache directory."""
+    directory = tmp_path / "cache"
+    monkeypatch.setenv("CONTEXT_CACHE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def mark_font():
+    return build_mark_font()
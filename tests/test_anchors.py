@@ -0,0 +1,38 @@
+import pytest
+
+from context.BaseObject import IncompatibleMastersError
+
+from conftest import add_glyph
+
+
+def test_table_matches_get_variable_anchor(mark_font):
+    anchors = mark_font._all_anchors
+    for anchorname, glyphs in anchors.items():
+        for glyph, (x, y) in glyphs.items():
+            x2, y2 = mark_font.get_variable_anchor(glyph, anchorname)
+            assert x.values == x2.values
+            assert y.values == y2.values
+    assert set(anchors["_top"]) == {"acutecomb", "gravecomb"}
+
+
+def test_all_missing_anchors_reported(mark_font):
+    mark_font.glyphs["A"].layers[1].anchors = []
+    mark_font.glyphs["f_i"].layers[1].anchors.pop()
+    table = mark_font.anchor_table()
+    assert not table.compatible
+    assert [(m.glyph, m.anchor, m.master) for m in table.missing] == [
+        ("A", "top", "W900"),
+        ("f_i", "top_2", "W900"),
+    ]
+    with pytest.raises(IncompatibleMastersError) as e:
+        mark_font._all_anchors
+    assert "glyph A" in str(e.value) and "glyph f_i" in str(e.value)
+
+
+def test_sparse_master_may_omit_layers(mark_font):
+    mark_font.masters[1].sparse = True
+    add_glyph(mark_font, "C", m400={"anchors": [("top", 300, 700)]})
+    table = mark_font.anchor_table()
+    assert table.compatible
+    x, y = table.variable_anchors()["top"]["C"]
+    assert list(x.values.values()) == [300]
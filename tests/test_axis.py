@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from fontTools.varLib.models import piecewiseLinearMap
+
+from context import Axis
+
+from conftest import make_font
+
+MAP = [(100, 20), (400, 80), (900, 200), (700, 150)]
+
+
+def weight_axis():
+    return Axis(name="Weight", tag="wght", min=100, default=400, max=900, map=MAP)
+
+
+def test_map_matches_piecewise_linear_map():
+    axis = weight_axis()
+    values = [50, 100, 250, 400, 550.5, 700, 800, 900, 1000]
+    for v in values:
+        assert axis.map_forward(v) == pytest.approx(piecewiseLinearMap(v, dict(MAP)))
+        inverted = {v: k for k, v in MAP}
+        assert axis.map_backward(v) == pytest.approx(piecewiseLinearMap(v, inverted))
+    assert axis.map_forward_array(values) == pytest.approx(
+        [axis.map_forward(v) for v in values]
+    )
+    assert axis.map_backward_array(values) == pytest.approx(
+        [axis.map_backward(v) for v in values]
+    )
+
+
+def test_normalize():
+    axis = weight_axis()
+    assert axis.normalize_value(400) == 0
+    assert axis.normalize_value(900) == 1
+    assert axis.normalize_value(100) == -1
+    assert axis.normalize_value(700) == pytest.approx((150 - 80) / (200 - 80))
+    values = np.array([50, 100, 250, 400, 700, 900, 1000])
+    assert axis.normalize_array(values) == pytest.approx(
+        [axis.normalize_value(v) for v in values]
+    )
+    assert axis.normalize_designspace_value(150) == axis.normalize_value(700)
+
+
+def test_compiled_map_invalidated():
+    axis = weight_axis()
+    assert axis.map_forward(900) == 200
+    axis.map = [(100, 100), (900, 900)]
+    assert axis.map_forward(900) == 900
+    assert axis.normalize_value(500) == pytest.approx(0.2)
+    axis.max = 1000
+    assert axis.normalize_value(1000) == 1
+    axis.map = None
+    assert axis.map_forward(123) == 123
+    # Changed in place, then marked dirty
+    axis.map = [(100, 100), (900, 900)]
+    assert axis.map_forward(650) == 650
+    axis.map.append((650, 500))
+    axis.mark_dirty()
+    assert axis.map_forward(650) == 500
+    axis.map[-1] = (650, 600)
+    axis.map = axis.map
+    assert axis.map_backward(600) == 650
+
+
+def test_master_locations_are_designspace():
+    font = make_font((400, 900))
+    font.axes[0].map = [(400, 80), (900, 200)]
+    font.masters[0].location = {"wght": 80}
+    font.masters[1].location = {"wght": 200}
+    assert font.default_master is font.masters[0]
+    assert font.masters[1].normalized_location == {"wght": 1.0}
@@ -0,0 +1,102 @@
+import json
+import logging
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+from context import __main__ as cli
+from context import load
+from context.batch import BatchJob, glob_jobs, read_manifest, run_batch
+from context.fontFilters import FILTERS
+
+
+@pytest.fixture
+def sources(mark_font, tmp_path):
+    paths = []
+    for name in ("One", "Two", "Three"):
+        path = tmp_path / "src" / (name + ".babelfont")
+        mark_font.save(str(path))
+        paths.append(path)
+    return paths
+
+
+def test_manifest(sources, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {"input": "src/One.babelfont", "output": "out/One.ttf"},
+                {
+                    "input": "src/Two.babelfont",
+                    "output": "out/Two.babelfont",
+                    "filters": ["zeroMarkWidths"],
+                },
+            ]
+        )
+    )
+    jobs = read_manifest(str(manifest), ["dropUnexportedGlyphs"])
+    assert jobs[0] == BatchJob(
+        str(sources[0]), str(tmp_path / "out" / "One.ttf"), ["dropUnexportedGlyphs"]
+    )
+    assert jobs[1].filters == ["zeroMarkWidths"]
+
+
+def test_failures_do_not_stop_the_batch(sources, tmp_path):
+    out = tmp_path / "out"
+    jobs = glob_jobs(str(tmp_path / "src" / "*.babelfont"), str(out), ".babelfont")
+    jobs = [
+        jobs[0],
+        BatchJob(str(tmp_path / "Missing.babelfont"), str(out / "M")),
+        jobs[1],
+    ]
+    jobs.append(BatchJob(str(sources[2]), str(out / "Other.babelfont"), ["nope"]))
+    results = {r.job.output: r for r in run_batch(jobs, processes=2, in_flight=1)}
+    assert len(results) == 4
+    assert [results[job.output].ok for job in jobs] == [True, False, True, False]
+    assert results[jobs[1].output].error.startswith("load failed")
+    assert results[jobs[3].output].error.startswith("filters failed")
+    assert set(results[jobs[0].output].timings) == {"load", "filters", "save"}
+    assert load(str(out / "One.babelfont")).glyphs["A"]
+
+
+def _crash(font, args):
+    os._exit(1)
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="Workers only see the extra filter if they are forked",
+)
+def test_crashed_worker_fails_one_job(sources, tmp_path, monkeypatch):
+    monkeypatch.setitem(FILTERS, "crash", _crash)
+    out = tmp_path / "out"
+    jobs = glob_jobs(str(tmp_path / "src" / "*.babelfont"), str(out), ".babelfont")
+    jobs.insert(1, BatchJob(str(sources[0]), str(out / "Crash.babelfont"), ["crash"]))
+    jobs.append(BatchJob(str(sources[1]), str(out / "Last.babelfont")))
+    results = {r.job.output: r for r in run_batch(jobs, processes=2)}
+    assert len(results) == 5
+    assert [results[job.output].ok for job in jobs] == [True, False, True, True, True]
+    assert "died" in results[jobs[1].output].error
+
+
+def test_cli(sources, tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    pattern = str(tmp_path / "src" / "*.babelfont")
+    argv = ["context", "batch", "--glob", pattern, "-o", str(out), "-s", ".ttf"]
+    monkeypatch.setattr(sys, "argv", argv + ["-j", "1", "-f", "zeroMarkWidths"])
+    with pytest.raises(SystemExit) as e:
+        cli.main()
+    assert e.value.code == 0
+    assert sorted(p.name for p in out.iterdir()) == ["One.ttf", "Three.ttf", "Two.ttf"]
+
+
+def test_worker_log_level_in_process(sources, tmp_path, caplog):
+    output = str(tmp_path / "out" / "One.babelfont")
+    job = BatchJob(str(sources[0]), output, ["zeroMarkWidths"])
+    with caplog.at_level(logging.INFO):
+        results = list(run_batch([job], processes=1, log_level="WARNING"))
+        assert logging.getLogger().level == logging.INFO
+    assert results[0].ok
+    assert not [r for r in caplog.records if r.levelno < logging.WARNING]
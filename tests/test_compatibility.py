@@ -0,0 +1,70 @@
+import sys
+
+import pytest
+
+from context.compatibility import check_compatibility
+from context import __main__ as cli
+
+from conftest import add_glyph, square
+
+
+def test_compatible(mark_font):
+    report = check_compatibility(mark_font)
+    assert report.compatible
+    assert report.checked == len(mark_font.glyphs)
+
+
+def test_reports_every_problem(mark_font):
+    mark_font.glyphs["A"].layers[1].shapes.append(square(0, 0, 10))
+    mark_font.glyphs["B"].layers[1].shapes[0].nodes[1].type = "c"
+    mark_font.glyphs["f_i"].layers[1].anchors[0].name = "bottom_1"
+    add_glyph(mark_font, "C", m400={})
+    report = check_compatibility(mark_font)
+    assert [(i.glyph, i.master, i.kind) for i in report] == [
+        ("A", "W900", "contours"),
+        ("B", "W900", "nodes"),
+        ("f_i", "W900", "anchors"),
+        ("C", "W900", "layer"),
+    ]
+    assert report.for_glyph("A")[0].detail == "has 2 contours, expected 1"
+    assert "contour 0 has nodes 'lcll'" in report.for_glyph("B")[0].detail
+    assert report.for_glyph("f_i")[0].detail == (
+        "missing anchors top_1; extra anchors bottom_1"
+    )
+
+
+def test_components_and_sparse_masters(mark_font):
+    add_glyph(
+        mark_font,
+        "Aacute",
+        m400={"shapes": [_component("A"), _component("acutecomb")]},
+        m900={"shapes": [_component("A")]},
+    )
+    add_glyph(mark_font, "D", m400={})
+    mark_font.masters[1].sparse = True
+    report = check_compatibility(mark_font, ["Aacute", "D"])
+    assert [(i.glyph, i.kind) for i in report] == [("Aacute", "components")]
+    assert report.incompatibilities[0].detail == (
+        "has components A, expected A, acutecomb"
+    )
+
+
+def test_cli(mark_font, tmp_path, monkeypatch):
+    path = str(tmp_path / "Test.babelfont")
+    mark_font.save(path)
+    monkeypatch.setattr(sys, "argv", ["context", "check", path])
+    with pytest.raises(SystemExit) as e:
+        cli.main()
+    assert e.value.code == 0
+
+    mark_font.glyphs["A"].layers[1].anchors = []
+    mark_font.save(path)
+    with pytest.raises(SystemExit) as e:
+        cli.main()
+    assert e.value.code == 1
+
+
+def _component(ref):
+    from context import Shape
+
+    return Shape(ref=ref, transform=[1, 0, 0, 1, 0, 0])
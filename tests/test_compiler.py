@@ -0,0 +1,283 @@
+import pytest
+from fontTools.ttLib import TTFont
+from fontTools.varLib.instancer import instantiateVariableFont
+
+from context.Instance import Instance
+from context.Node import Node
+from context.Shape import Shape
+from context.BaseObject import DIRTY_COMPILE
+from context.compiler import (
+    CompileSession,
+    compile_static,
+    compile_variable,
+    outlines,
+)
+
+from conftest import add_glyph, build_mark_font, make_font, square
+
+
+def _add_composites(font):
+    add_glyph(
+        font,
+        "Aacute",
+        codepoints=[0xC1],
+        m400={
+            "width": 600,
+            "shapes": [
+                Shape(ref="A"),
+                Shape(ref="acutecomb", transform=(1, 0, 0, 1, 300, 0)),
+            ],
+        },
+        m900={"width": 700},
+    )
+    add_glyph(font, "hidden", exported=False, m400={"shapes": [square(0, 0, 100)]})
+    add_glyph(
+        font,
+        "usehidden",
+        m400={
+            "width": 500,
+            "shapes": [Shape(ref="hidden", transform=(1, 0, 0, 1, 50, 50))],
+        },
+    )
+
+
+@pytest.mark.parametrize("suffix", ["ttf", "otf"])
+def test_save_binary(mark_font, tmp_path, suffix):
+    _add_composites(mark_font)
+    path = str(tmp_path / ("test." + suffix))
+    mark_font.save(path)
+    # Binaries cannot be loaded back, so the stored filename is unchanged
+    assert mark_font.filename is None
+
+    ttFont = TTFont(path)
+    order = ttFont.getGlyphOrder()
+    assert order[0] == ".notdef"
+    assert "hidden" not in order and "usehidden" in order
+    assert ttFont.getBestCmap()[0xC1] == "Aacute"
+    assert ttFont["hmtx"]["A"] == (600, 100)
+    assert ttFont["name"].getDebugName(1) == "Test"
+    assert ttFont["name"].getDebugName(2) == "Regular"
+    assert ttFont["hhea"].ascent == 800
+    assert "GPOS" in ttFont
+    if suffix == "ttf":
+        assert ttFont["glyf"]["Aacute"].isComposite()
+        assert ttFont["glyf"]["usehidden"].numberOfContours == 1
+    else:
+        assert ttFont.sfntVersion == "OTTO"
+
+
+def test_compile_master(mark_font):
+    bold = compile_static(mark_font, master=mark_font.masters[1])
+    assert bold["hmtx"]["A"] == (700, 100)
+
+
+def test_outlines_in_pool(mark_font, monkeypatch):
+    monkeypatch.setattr(outlines, "POOL_MIN_GLYPHS", 0)
+    pooled = compile_static(mark_font, jobs=2)
+    serial = compile_static(mark_font, jobs=1)
+    for name in pooled.getGlyphOrder():
+        assert pooled["glyf"][name].compile(pooled["glyf"]) == serial["glyf"][
+            name
+        ].compile(serial["glyf"])
+
+
+def _variable_font():
+    font = build_mark_font()
+    font.masters[0].metrics["xHeight"] = 500
+    font.masters[1].metrics["xHeight"] = 600
+    font.instances.append(Instance(name="Bold", location={"wght": 900}))
+    return font
+
+
+def test_save_variable(tmp_path):
+    font = _variable_font()
+    path = str(tmp_path / "test.ttf")
+    font.save(path)
+
+    ttFont = TTFont(path)
+    for table in ("fvar", "gvar", "HVAR", "MVAR", "GPOS"):
+        assert table in ttFont
+    assert "avar" not in ttFont
+    (axis,) = ttFont["fvar"].axes
+    assert (axis.axisTag, axis.minValue, axis.defaultValue, axis.maxValue) == (
+        "wght",
+        400,
+        400,
+        900,
+    )
+    (instance,) = ttFont["fvar"].instances
+    assert instance.coordinates == {"wght": 900}
+
+    bold = instantiateVariableFont(ttFont, {"wght": 900})
+    assert bold["hmtx"]["A"] == (700, 100)
+    assert bold["OS/2"].sxHeight == 600
+    assert sorted(bold["glyf"]["A"].getCoordinates(bold["glyf"])[0]) == [
+        (100, 0),
+        (100, 500),
+        (600, 0),
+        (600, 500),
+    ]
+
+
+def test_save_static_from_variable(tmp_path):
+    path = str(tmp_path / "test.ttf")
+    _variable_font().save(path, variable=False)
+    assert "fvar" not in TTFont(path)
+
+
+def test_variable_curves_and_axis_map():
+    font = _variable_font()
+    font.axes[0].map = [(400, 0), (700, 50), (900, 100)]
+    for master, location in zip(font.masters, (0, 100)):
+        master.location = {"wght": location}
+    nodes = {
+        "m400": [(100, 0, "l"), (300, 0, "o"), (500, 100, "o"), (500, 300, "c")],
+        "m900": [(100, 0, "l"), (350, 0, "o"), (600, 150, "o"), (600, 350, "c")],
+    }
+    add_glyph(
+        font,
+        "D",
+        **{
+            mid: {
+                "width": 600,
+                "shapes": [Shape(nodes=[Node(x, y, t) for x, y, t in points])],
+            }
+            for mid, points in nodes.items()
+        },
+    )
+    ttFont = compile_variable(font)
+    assert ttFont["avar"].segments["wght"][0.6] == 0.5
+    # The curve is converted compatibly in both masters
+    (variation,) = ttFont["gvar"].variations["D"]
+    glyph = ttFont["glyf"]["D"]
+    assert len(variation.coordinates) == len(glyph.coordinates) + 4
+    assert sum(flag & 1 == 0 for flag in glyph.flags) >= 1
+
+
+def test_sparse_master():
+    font = make_font((400, 700, 900))
+    font.masters[1].sparse = True
+    add_glyph(
+        font,
+        "A",
+        m400={"width": 500, "shapes": [square(0, 0, 100)]},
+        m700={"width": 800, "shapes": [square(0, 0, 100)]},
+        m900={"width": 600, "shapes": [square(0, 0, 200)]},
+    )
+    add_glyph(
+        font,
+        "B",
+        m400={"width": 500, "shapes": [square(0, 0, 100)]},
+        m900={"width": 600, "shapes": [square(0, 0, 200)]},
+    )
+    ttFont = compile_variable(font)
+    assert len(ttFont["gvar"].variations["A"]) == 2
+    assert len(ttFont["gvar"].variations["B"]) == 1
+    middle = instantiateVariableFont(ttFont, {"wght": 700})
+    assert middle["hmtx"]["A"][0] == 800
+    assert middle["hmtx"]["B"][0] == 560
+
+
+def test_variable_in_pool(monkeypatch):
+    monkeypatch.setattr(outlines, "POOL_MIN_GLYPHS", 0)
+    pooled = compile_variable(_variable_font(), jobs=2)
+    serial = compile_variable(_variable_font(), jobs=1)
+    assert pooled["gvar"].compile(pooled) == serial["gvar"].compile(serial)
+
+
+def _anchor_x(ttFont, base):
+    lookups = ttFont["GPOS"].table.LookupList.Lookup
+    for lookup in lookups:
+        for subtable in lookup.SubTable:
+            if subtable.Format != 1 or not hasattr(subtable, "BaseCoverage"):
+                continue
+            base_index = subtable.BaseCoverage.glyphs.index(base)
+            record = subtable.BaseArray.BaseRecord[base_index]
+            return record.BaseAnchor[0].XCoordinate
+
+
+def test_session_recompiles_edited_glyphs():
+    font = make_font()
+    add_glyph(
+        font, "A", codepoints=[0x41], m400={"width": 500, "shapes": [square(0, 0, 100)]}
+    )
+    add_glyph(
+        font, "B", codepoints=[0x42], m400={"width": 500, "shapes": [square(0, 0, 100)]}
+    )
+    add_glyph(
+        font,
+        "C",
+        m400={"width": 500, "shapes": [Shape(ref="A", transform=(1, 0, 0, 1, 50, 0))]},
+    )
+    session = CompileSession(font)
+    ttFont = session.update()
+    assert session.full
+
+    assert session.update() is ttFont
+    assert not session.full and session.recompiled == set()
+
+    layer = font.glyphs["A"].layers[0]
+    layer.width = 600
+    layer.shapes = [square(20, 0, 200)]
+    session.update()
+    assert not session.full
+    assert session.recompiled == {"A", "C"}
+    assert ttFont["hmtx"]["A"] == (600, 20)
+    assert ttFont["hmtx"]["C"] == (500, 70)
+    assert not font.is_dirty(DIRTY_COMPILE)
+    assert not layer.is_dirty(DIRTY_COMPILE)
+
+    # C no longer uses A once its component is replaced
+    font.glyphs["C"].layers[0].shapes = [square(10, 0, 50)]
+    session.update()
+    assert session.recompiled == {"C"}
+    assert ttFont["hmtx"]["C"] == (500, 10)
+    layer.width = 650
+    session.update()
+    assert session.recompiled == {"A"}
+
+    font.glyphs["B"].codepoints = [0x43]
+    session.update()
+    assert session.recompiled == set()
+    assert ttFont.getBestCmap()[0x43] == "B"
+    assert 0x42 not in ttFont.getBestCmap()
+
+    font.upm = 2000
+    session.update()
+    assert session.full
+    assert session.ttFont["head"].unitsPerEm == 2000
+
+
+def test_session_rebuilds_layout(mark_font):
+    session = CompileSession(mark_font, variable=False)
+    ttFont = session.update()
+    assert _anchor_x(ttFont, "A") == 300
+    mark_font.glyphs["A"].layers[0].anchors[0].x = 250
+    session.update()
+    assert session.recompiled == {"A"}
+    assert _anchor_x(ttFont, "A") == 250
+
+
+def test_session_variable(mark_font):
+    session = CompileSession(mark_font)
+    session.update()
+    mark_font.glyphs["A"].layers[1].width = 800
+    ttFont = session.update()
+    assert session.recompiled == {"A"}
+    bold = instantiateVariableFont(ttFont, {"wght": 900})
+    assert bold["hmtx"]["A"][0] == 800
+    # B had the same deltas as A before, and keeps them
+    assert bold["hmtx"]["B"][0] == 700
+
+    # Editing the glyph again reuses the row the first edit added
+    store = ttFont["HVAR"].table.VarStore
+    rows = sum(len(data.Item) for data in store.VarData)
+    mark_font.glyphs["A"].layers[1].width = 850
+    session.update()
+    assert sum(len(data.Item) for data in store.VarData) == rows
+    expected = compile_variable(mark_font)
+    for location in ({"wght": 600}, {"wght": 900}):
+        instance = instantiateVariableFont(ttFont, location)
+        assert instance["hmtx"].metrics == (
+            instantiateVariableFont(expected, location)["hmtx"].metrics
+        )
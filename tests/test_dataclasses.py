@@ -1,5 +1,7 @@
-from context import Axis, Glyph
+from context import Axis, Glyph, Layer, Node, Shape
 from io import BytesIO
+from fontTools.misc.transform import Identity, Transform
+from fontTools.pens.recordingPen import RecordingPointPen
 
 def test_propagate_format_specific():
     a = Axis(name="Weight", tag="wght", _="Hello")
@@ -12,3 +14,19 @@ def test_write_a_negative():
     g.write(s)
     assert "exported" in s.getvalue().decode()
 
+
+def test_write_fractional_coordinates():
+    s = BytesIO()
+    Node(10.5, 20.0, "l").write(s, 0)
+    assert s.getvalue() == b'[10.5,20,"l"]'
+
+def test_transform_loaded_from_list():
+    shape = Shape(ref="A", transform=[1, 0, 0, 1, 10, 0])
+    assert shape.transform == Transform().translate(10, 0)
+    assert isinstance(shape.transform, Transform)
+
+def test_draw_component_without_transform():
+    layer = Layer(shapes=[Shape(ref="A")])
+    pen = RecordingPointPen()
+    layer.drawPoints(pen)
+    assert pen.value == [("addComponent", ("A", Identity), {})]
@@ -0,0 +1,33 @@
+import os
+
+from context.diskcache import DiskCache, cache_key
+
+
+def test_roundtrip(cache_dir):
+    cache = DiskCache("test")
+    key = cache_key("a", b"b")
+    assert cache.get(key) is None
+    cache.set(key, b"data")
+    assert cache.get(key) == b"data"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert os.path.isdir(cache_dir / "test")
+    assert cache_key("ab", "") != cache_key("a", "b")
+
+
+def test_lru_eviction():
+    cache = DiskCache("test", max_size=35)
+    for ix, key in enumerate("abc"):
+        cache.set(key, b"x" * 10)
+        os.utime(cache._path(key), (ix, ix))
+    # Reading "a" makes it the most recently used entry
+    assert cache.get("a") is not None
+    cache.set("d", b"x" * 10)
+    assert [k for k in "abcd" if cache.get(k)] == ["a", "c", "d"]
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setenv("CONTEXT_CACHE_DIR", "")
+    cache = DiskCache("test")
+    assert not cache.enabled
+    cache.set("a", b"data")
+    assert cache.get("a") is None
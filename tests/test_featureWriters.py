@@ -0,0 +1,91 @@
+import os
+from io import StringIO
+
+from fontTools.feaLib.parser import Parser
+from fontTools.fontBuilder import FontBuilder
+
+from context import Features
+from context.diskcache import DiskCache
+from context.fontFilters.featureWriters import build_all_features, build_anchor_features
+
+from conftest import add_glyph, make_font
+
+
+def test_anchor_features(mark_font):
+    fea = build_anchor_features(mark_font).asFea()
+    assert "<anchor 0 (wght=400:500 wght=900:550)> @MC_top;" in fea
+    assert "pos base A" in fea
+    assert "pos ligature f_i" in fea
+    assert "ligComponent" in fea
+    assert "pos mark acutecomb" in fea
+    assert "pos cursive kashida <anchor 300 0> <anchor 0 0>;" in fea
+    # B's anchor does not vary, so it is written as a plain anchor
+    assert "<anchor 300 700> mark @MC_top" in fea
+    # The generated code must round-trip through feaLib
+    Parser(StringIO(fea), glyphNames=mark_font.glyphs.keys()).parse()
+
+
+def test_marks_grouped_by_position(mark_font):
+    fea = build_anchor_features(mark_font).asFea()
+    assert fea.count("markClass") == 1
+    assert "[acutecomb gravecomb]" in fea
+
+
+def test_handwritten_feature_wins(mark_font):
+    mark_font.features.features.append(("mark", "pos A 10;"))
+    fea = build_anchor_features(mark_font).asFea()
+    assert "feature mark" not in fea
+    assert "feature mkmk" in fea
+
+
+def _static_font():
+    font = make_font()
+    add_glyph(font, "A", m400={"width": 600, "anchors": [("top", 300, 700)]})
+    add_glyph(
+        font,
+        "acutecomb",
+        category="mark",
+        m400={"anchors": [("_top", 0, 500)]},
+    )
+    return font
+
+
+def _compile(font):
+    fb = FontBuilder(1000)
+    fb.setupGlyphOrder([".notdef", "A", "acutecomb"])
+    build_all_features(font, fb.font)
+    return fb.font
+
+
+def test_compile_static():
+    ttFont = _compile(_static_font())
+    gpos = ttFont["GPOS"].table
+    assert [f.FeatureTag for f in gpos.FeatureList.FeatureRecord] == ["mark"]
+    gdef = ttFont["GDEF"].table
+    assert gdef.GlyphClassDef.classDefs == {"A": 1, "acutecomb": 3}
+
+
+def test_compiled_features_cached():
+    font = _static_font()
+    first = _compile(font)
+    cache = DiskCache("features")
+    assert len(os.listdir(cache.directory)) == 1
+    second = _compile(font)
+    assert second["GPOS"].compile(second) == first["GPOS"].compile(first)
+    assert second["GDEF"].table.GlyphClassDef.classDefs == {"A": 1, "acutecomb": 3}
+
+    font.glyphs["A"].category = "ligature"
+    _compile(font)
+    assert len(os.listdir(cache.directory)) == 2
+
+
+def test_included_features_not_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "inc.fea").write_text("feature kern { pos A A -10; } kern;\n")
+    font = _static_font()
+    font.features = Features.from_fea("include(inc.fea);\n")
+    _compile(font)
+    (tmp_path / "inc.fea").write_text("feature kern { pos A A -20; } kern;\n")
+    ttFont = _compile(font)
+    lookup = ttFont["GPOS"].table.LookupList.Lookup[0]
+    assert lookup.SubTable[0].PairSet[0].PairValueRecord[0].Value1.XAdvance == -20
@@ -1,4 +1,9 @@
-from context import Features
+import importlib
+
+from context import Features, stats
+
+# The module, which the package hides behind the class of the same name
+features_module = importlib.import_module("context.Features")
 
 
 def test_parse():
@@ -28,3 +33,127 @@ feature test {
     assert features.prefixes["namedPrefix"] == "lookup foobar3 {\n    sub e by f;\n} foobar3;\n"
     assert features.features[0] == ("test", "    sub X by Y;\n")
     assert features.features[1] == ("test", "    pos X Y -150;\n")
+
+
+def _ast_font():
+    from conftest import add_glyph, make_font
+
+    font = make_font()
+    for name in "abcdef":
+        add_glyph(font, name, m400={})
+    font.features = Features.from_fea("""
+@vowels = [a e];
+lookup foobar {
+    sub a by b;
+} foobar;
+feature liga {
+    lookup foobar;
+} liga;
+feature ccmp {
+    sub @vowels by c;
+} ccmp;
+""")
+    return font
+
+
+def test_as_ast_cached():
+    font = _ast_font()
+    first = font.features.as_ast(font, readonly=True)
+    second = font.features.as_ast(font, readonly=True)
+    assert second["prefixes"]["anonymous"] is first["prefixes"]["anonymous"]
+    assert second["features"][1][1] is first["features"][1][1]
+
+
+def test_as_ast_reparses_changed_blocks():
+    font = _ast_font()
+    first = font.features.as_ast(font, readonly=True)
+    font.features.features[0] = ("liga", "    lookup foobar;\n    sub d by e;")
+    second = font.features.as_ast(font, readonly=True)
+    assert second["prefixes"]["anonymous"] is first["prefixes"]["anonymous"]
+    assert second["features"][0][1] is not first["features"][0][1]
+    assert "sub d by e;" in second["features"][0][1].asFea()
+    # Blocks after a changed block are parsed again
+    assert second["features"][1][1] is not first["features"][1][1]
+
+    font.glyphs.pop("f")
+    third = font.features.as_ast(font, readonly=True)
+    assert third["prefixes"]["anonymous"] is not second["prefixes"]["anonymous"]
+
+
+def test_as_ast_hands_off_mutable_asts():
+    font = _ast_font()
+    first = font.features.as_ast(font, readonly=True)
+    owned = font.features.as_ast(font)
+    assert owned["prefixes"]["anonymous"] is not first["prefixes"]["anonymous"]
+    # The copy's lookup reference points to the copied lookup
+    lookup = owned["prefixes"]["anonymous"].statements[0]
+    assert owned["features"][0][1].statements[0].statements[0].lookup is lookup
+    owned["prefixes"]["anonymous"].statements = []
+    again = font.features.as_ast(font, readonly=True)
+    assert again["prefixes"]["anonymous"] is first["prefixes"]["anonymous"]
+    assert again["prefixes"]["anonymous"].statements
+
+
+def test_as_ast_copies_keep_cache():
+    font = _ast_font()
+    stats.reset()
+    stats.enable()
+    try:
+        first = font.features.as_ast(font)
+        second = font.features.as_ast(font)
+        counters = stats.snapshot()["counters"]
+    finally:
+        stats.disable()
+        stats.reset()
+    assert counters["features.blocks_parsed"] == 3
+    assert counters["features.blocks_reused"] == 3
+    assert second["features"][1][1] is not first["features"][1][1]
+
+
+def test_parse_ignores_braces_in_comments_and_strings():
+    features = Features.from_fea("""include(common.fea)
+feature liga {
+    sub f i by f_i; # { not a block
+    featureNames { name "x } y"; };
+} liga;
+@multi = [a b # ] not the end
+    c d];
+# Prefix: later
+lookup x { sub a by b; } x;
+""")
+    assert features.classes == {"multi": ["a", "b", "c", "d"]}
+    assert features.prefixes == {
+        "anonymous": "include(common.fea)",
+        "later": "lookup x { sub a by b; } x;",
+    }
+    assert features.features == [
+        (
+            "liga",
+            '    sub f i by f_i; # { not a block\n    featureNames { name "x } y"; };',
+        )
+    ]
+
+
+class _CountingPattern:
+    """Wraps a compiled pattern, counting the characters its matches span."""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.scanned = 0
+
+    def match(self, string, pos=0):
+        match = self.pattern.match(string, pos)
+        self.scanned += match.end() - pos
+        return match
+
+
+def test_split_is_linear_in_comments_and_includes(monkeypatch):
+    skip = _CountingPattern(features_module._SKIP_RE)
+    monkeypatch.setattr(features_module, "_SKIP_RE", skip)
+    fea = "".join("# comment %i\ninclude(f%i.fea);\n" % (i, i) for i in range(4000))
+    fea += "feature liga {\n    sub f i by f_i;\n} liga;\n"
+    features = Features.from_fea(fea)
+    assert features.features == [("liga", "    sub f i by f_i;")]
+    assert len(features.prefixes["anonymous"].splitlines()) == 8000
+    # Each run of comments and includes is only skipped over once
+    assert skip.scanned <= len(fea)
@@ -0,0 +1,260 @@
+import logging
+
+from fontTools.misc.transform import Transform
+
+from context.Node import Node
+from context.Shape import Shape
+from context.compiler import outlines
+from context.fontFilters import (
+    bake_in_glyphdata,
+    cubic_to_quadratic,
+    decompose_mixed_glyphs,
+    fill_opentype_values,
+    plan,
+    propagate_anchors,
+    run_filters,
+    zero_mark_widths,
+)
+from context.fontFilters import glyphDataXML
+from context.fontFilters.pipeline import components_first
+
+from conftest import add_glyph, make_font, square
+
+
+def _composite_font():
+    """A font whose composites come before the glyphs they use."""
+    font = make_font()
+    add_glyph(
+        font,
+        "Aacute",
+        m400={
+            "width": 600,
+            "shapes": [
+                Shape(ref="A", transform=Transform()),
+                Shape(ref="acutecomb", transform=Transform(1, 0, 0, 1, 300, 200)),
+            ],
+        },
+    )
+    add_glyph(
+        font,
+        "acutecomb",
+        category="mark",
+        m400={"width": 200, "anchors": [("_top", 0, 500), ("top", 0, 700)]},
+    )
+    add_glyph(
+        font,
+        "A",
+        m400={
+            "width": 600,
+            "shapes": [
+                square(100, 0, 400),
+                Shape(ref="acutecomb", transform=Transform()),
+            ],
+            "anchors": [("top", 300, 500)],
+        },
+    )
+    return font
+
+
+def _circle():
+    nodes = [
+        (0, 250, "c"),
+        (0, 112, "o"),
+        (112, 0, "o"),
+        (250, 0, "c"),
+        (388, 0, "o"),
+        (500, 112, "o"),
+        (500, 250, "c"),
+        (500, 388, "o"),
+        (388, 500, "o"),
+        (250, 500, "c"),
+        (112, 500, "o"),
+        (0, 388, "o"),
+    ]
+    return Shape(nodes=[Node(x, y, t) for x, y, t in nodes])
+
+
+def _summary(font):
+    return {
+        glyph.name: [
+            (
+                layer.width,
+                [[(n.x, n.y, n.type) for n in path.nodes] for path in layer.paths],
+                len(layer.components),
+                sorted((a.name, a.x, a.y) for a in layer.anchors),
+            )
+            for layer in glyph.layers
+        ]
+        for glyph in font.glyphs
+    }
+
+
+def test_plan_fuses_adjacent_glyph_filters():
+    filters = [
+        (zero_mark_widths, {}),
+        (propagate_anchors, {}),
+        (fill_opentype_values, {}),
+        (decompose_mixed_glyphs, {}),
+    ]
+    assert [[f for f, _ in stage] for stage in plan(filters)] == [
+        [zero_mark_widths, propagate_anchors],
+        [fill_opentype_values],
+        [decompose_mixed_glyphs],
+    ]
+
+
+def test_components_first():
+    font = _composite_font()
+    assert [g.name for g in components_first(font)] == ["acutecomb", "A", "Aacute"]
+
+
+def test_fused_filters_match_separate_runs():
+    filters = [
+        (zero_mark_widths, {}),
+        (propagate_anchors, {}),
+        (decompose_mixed_glyphs, {}),
+    ]
+    separate = _composite_font()
+    for fltr, args in filters:
+        fltr(separate, args)
+    fused = _composite_font()
+    run_filters(fused, filters)
+    assert _summary(fused) == _summary(separate)
+    # A was decomposed, and its propagated anchors reached Aacute
+    assert _summary(fused)["A"] == [
+        (
+            600,
+            [[(100, 0, "l"), (500, 0, "l"), (500, 400, "l"), (100, 400, "l")]],
+            0,
+            [("top", 300, 500)],
+        )
+    ]
+    assert _summary(fused)["Aacute"][0][3] == [("top", 300, 700 + 200)]
+
+
+def test_filters_in_pool(monkeypatch):
+    monkeypatch.setattr(outlines, "POOL_MIN_GLYPHS", 0)
+    filters = [
+        (zero_mark_widths, {}),
+        (propagate_anchors, {}),
+        (decompose_mixed_glyphs, {}),
+        (cubic_to_quadratic, {}),
+    ]
+    serial = _composite_font()
+    pooled = _composite_font()
+    for font in (serial, pooled):
+        add_glyph(font, "O", m400={"width": 500, "shapes": [_circle()]})
+    run_filters(serial, filters)
+    run_filters(pooled, filters, jobs=2)
+    assert _summary(pooled) == _summary(serial)
+    assert pooled.glyphs["A"].layers[0]._glyph is pooled.glyphs["A"]
+
+
+def test_quadratic_cache(cache_dir, caplog):
+    def converted():
+        font = _composite_font()
+        add_glyph(font, "O", m400={"width": 500, "shapes": [_circle()]})
+        cubic_to_quadratic(font)
+        return _summary(font)
+
+    first = converted()
+    assert any((cache_dir / "cu2qu").iterdir())
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        assert converted() == first
+    assert "Took 2 of 2 glyphs (100%) from the cache" in caplog.text
+    assert first["O"][0][1][0][1] == (0, 319, "o")
+
+
+GLYPH_DATA = """<?xml version="1.0" encoding="UTF-8"?>
+<glyphData>
+	<glyph name="A" production="%s" category="Letter" />
+	<glyph name="acutecomb" production="uni0301" category="Mark" />
+	<glyph name="Z" production="Z" category="Letter" />
+</glyphData>
+"""
+
+
+def test_glyph_data(tmp_path, cache_dir, monkeypatch):
+    xml = tmp_path / "GlyphData.xml"
+    xml.write_text(GLYPH_DATA % "A")
+    monkeypatch.setattr(glyphDataXML, "_indexes", {})
+
+    font = make_font()
+    add_glyph(font, "A", category=None)
+    add_glyph(font, "acutecomb", category=None)
+    bake_in_glyphdata(font, {"file": str(xml)})
+    assert font.glyphs["A"].production_name == "A"
+    assert font.glyphs["acutecomb"].production_name == "uni0301"
+    assert font.glyphs["acutecomb"].category == "mark"
+    assert "Z" not in font.glyphs
+
+    # Another process reads the index from the cache, not the XML
+    assert any((cache_dir / "glyphdata").iterdir())
+    monkeypatch.setattr(glyphDataXML, "_indexes", {})
+    with monkeypatch.context() as m:
+        m.setattr(glyphDataXML, "_parse", None)
+        assert glyphDataXML.glyph_data_index(str(xml))["A"] == ("A", "Letter")
+
+    # Editing the XML makes a new index
+    xml.write_text(GLYPH_DATA % "A.prod")
+    assert glyphDataXML.glyph_data_index(str(xml))["A"] == ("A.prod", "Letter")
+
+
+def test_propagate_anchors_to_some_glyphs():
+    font = _composite_font()
+    add_glyph(font, "Abar", m400={"shapes": [Shape(ref="A", transform=Transform())]})
+    add_glyph(
+        font,
+        "Abaracute",
+        m400={
+            "shapes": [
+                Shape(ref="Abar", transform=Transform()),
+                Shape(ref="acutecomb", transform=Transform(1, 0, 0, 1, 300, 200)),
+            ]
+        },
+    )
+    propagate_anchors(font, {"glyphs": "Abaracute"})
+    summary = _summary(font)
+    # Abar's anchors were worked out, but only Abaracute was changed
+    assert summary["Abaracute"][0][3] == [("top", 300, 900)]
+    assert summary["Abar"][0][3] == []
+    assert summary["Aacute"][0][3] == []
+
+
+def test_propagate_anchors_from_lowest_mark():
+    font = make_font()
+    add_glyph(
+        font,
+        "acutecomb",
+        category="mark",
+        m400={
+            "shapes": [square(0, 500, 100)],
+            "anchors": [("_top", 0, 500), ("top", 0, 700)],
+        },
+    )
+    add_glyph(
+        font,
+        "dotbelowcomb",
+        category="mark",
+        m400={
+            "shapes": [square(0, -200, 100)],
+            "anchors": [("_bottom", 0, 0), ("bottom", 0, -250)],
+        },
+    )
+    add_glyph(
+        font,
+        "acutecomb_dotbelowcomb",
+        category="mark",
+        m400={
+            "shapes": [
+                Shape(ref="acutecomb", transform=Transform()),
+                Shape(ref="dotbelowcomb", transform=Transform(1, 0, 0, 1, 50, 0)),
+            ]
+        },
+    )
+    propagate_anchors(font)
+    assert _summary(font)["acutecomb_dotbelowcomb"][0][3] == [
+        ("_bottom", 50, 0),
+        ("bottom", 50, -250),
+    ]
@@ -0,0 +1,143 @@
+import copy
+import pickle
+
+import pytest
+
+from context.Glyph import Glyph, GlyphList
+from context.fontFilters.pipeline import Filter, run_filters
+
+
+def _glyphs(*names):
+    return GlyphList({name: Glyph(name=name) for name in names})
+
+
+def _names(glyphs):
+    return [glyph.name for glyph in glyphs]
+
+
+def test_nested_iteration():
+    glyphs = _glyphs("a", "b", "c")
+    pairs = [(x.name, y.name) for x in glyphs for y in glyphs]
+    assert len(pairs) == 9
+    assert pairs[:3] == [("a", "a"), ("a", "b"), ("a", "c")]
+
+
+def test_changes_during_iteration():
+    glyphs = _glyphs("a", "b", "c", "d")
+    seen = []
+    for glyph in glyphs:
+        seen.append(glyph.name)
+        if glyph.name == "a":
+            del glyphs["c"]
+            glyphs.append(Glyph(name="e"))
+    # Removed glyphs are skipped, and added ones not visited
+    assert seen == ["a", "b", "d"]
+    assert _names(glyphs) == ["a", "b", "d", "e"]
+    assert list(glyphs.keys()) == ["a", "b", "d", "e"]
+
+
+def test_positions():
+    glyphs = _glyphs("a", "b", "c", "d")
+    glyphs.remove(["b", "x"])
+    assert glyphs.index("c") == 1
+    assert glyphs.at(2).name == "d"
+    glyphs.insert(0, Glyph(name=".notdef"))
+    assert glyphs.index("a") == 1
+    assert _names(glyphs) == [".notdef", "a", "c", "d"]
+    glyphs.extend([Glyph(name="e"), Glyph(name="f")])
+    assert glyphs.at(-1).name == "f"
+    assert glyphs.popitem()[0] == "f"
+    with pytest.raises(ValueError):
+        glyphs.insert(0, Glyph(name="a"))
+
+
+def test_rename_in_place():
+    glyphs = _glyphs("a", "b", "c")
+    version = glyphs.version
+    glyphs.rename({"a": "b", "b": "a", "x": "y"})
+    assert list(glyphs.keys()) == ["b", "a", "c"]
+    assert [name for name, glyph in glyphs.items() if glyph.name == name] == [
+        "b",
+        "a",
+        "c",
+    ]
+    assert glyphs.index("a") == 1
+    assert glyphs.version != version
+    with pytest.raises(ValueError, match="name c"):
+        glyphs.rename({"a": "c"})
+    assert list(glyphs.keys()) == ["b", "a", "c"]
+
+
+def test_dict_behaviour():
+    glyphs = _glyphs("a", "b")
+    glyphs["c"] = Glyph(name="c")
+    replacement = Glyph(name="a")
+    glyphs["a"] = replacement
+    assert glyphs.at(0) is replacement
+    assert glyphs.pop("b").name == "b"
+    assert glyphs.pop("b", None) is None
+    assert "b" not in glyphs and len(glyphs) == 2
+    assert set(glyphs.keys()) == {"a", "c"}
+    assert list(reversed(glyphs.keys())) == ["c", "a"]
+    assert dict(glyphs) == {"a": replacement, "c": glyphs["c"]}
+    glyphs.clear()
+    assert list(glyphs) == [] and not glyphs
+
+
+def test_copies():
+    glyphs = _glyphs("a", "b", "c")
+    glyphs.rename({"a": "z"})
+    for copied in (pickle.loads(pickle.dumps(glyphs)), copy.deepcopy(glyphs)):
+        assert isinstance(copied, GlyphList)
+        assert list(copied.keys()) == ["z", "b", "c"]
+        assert copied.index("c") == 2
+
+
+def test_where():
+    glyphs = GlyphList()
+    glyphs.extend(
+        [
+            Glyph(name="A", codepoints=[0x41]),
+            Glyph(name="acutecomb", category="mark", codepoints=[0x301]),
+            Glyph(name="gravecomb", category="mark", exported=False),
+            Glyph(name="B", codepoints=[0x42]),
+        ]
+    )
+    assert _names(glyphs.where(category="mark")) == ["acutecomb", "gravecomb"]
+    assert _names(glyphs.where(category="mark", exported=True)) == ["acutecomb"]
+    assert _names(glyphs.where(codepoint=0x42)) == ["B"]
+    assert glyphs.where(category="ligature") == []
+    with pytest.raises(ValueError):
+        glyphs.where(name="A")
+
+    # The indexes follow changes to the glyphs
+    unicodes = glyphs.codepoint_map()
+    glyphs["gravecomb"].exported = True
+    glyphs["B"].codepoints = [0x62]
+    glyphs.append(Glyph(name="tildecomb", category="mark"))
+    del glyphs["acutecomb"]
+    glyphs.rename({"A": "A.ss01"})
+    assert _names(glyphs.where(category="mark", exported=True)) == [
+        "gravecomb",
+        "tildecomb",
+    ]
+    assert dict(unicodes) == {0x41: "A.ss01", 0x62: "B"}
+    glyphs["B"] = Glyph(name="B", category="mark")
+    assert _names(glyphs.where(category="mark")) == ["gravecomb", "B", "tildecomb"]
+    assert 0x62 not in unicodes
+
+    # Inserted glyphs are indexed, and followed, as appended ones are
+    glyphs.insert(0, Glyph(name="C", codepoints=[0x43], category="mark"))
+    assert unicodes[0x43] == "C"
+    assert _names(glyphs.where(category="mark"))[0] == "C"
+    glyphs["C"].exported = False
+    assert _names(glyphs.where(exported=False)) == ["C"]
+
+
+def test_where_in_walk(mark_font):
+    visited = []
+    step = Filter(
+        lambda glyph, state: visited.append(glyph.name), where={"category": "mark"}
+    )
+    run_filters(mark_font, [(step, {})])
+    assert visited == ["acutecomb", "gravecomb"]
@@ -0,0 +1,138 @@
+import logging
+
+import pytest
+
+from fontTools.misc.transform import Transform
+
+from context import Features, Shape
+from context.fontFilters.customParameters import _renameGlyphs
+from context.fontFilters.dropUnexported import drop_unexported_glyphs
+from context.fontFilters.rename import rename_glyphs
+
+from conftest import add_glyph, make_font
+
+FEA = """
+@vowels = [a e];
+lookup drop_x {
+    sub x by y;
+} drop_x;
+feature liga {
+    sub f i by f_i;
+} liga;
+feature calt {
+    lookup drop_x;
+    sub @vowels by c;
+} calt;
+feature ss01 {
+    pos [a c] 10;
+} ss01;
+"""
+
+
+def _font():
+    font = make_font()
+    for name in ["a", "c", "e", "f", "i", "f_i", "x", "y"]:
+        add_glyph(font, name, m400={})
+    font.features = Features.from_fea(FEA)
+    return font
+
+
+def test_index():
+    font = _font()
+    index = font.features.glyph_references(font)
+    assert [(r.kind, r.name) for r in index["a"]] == [
+        ("class", "vowels"),
+        ("feature", "ss01"),
+    ]
+    assert [(r.kind, r.name) for r in index["f_i"]] == [("feature", "liga")]
+    assert "y" in index
+    # calt uses the lookup defined in the prefix
+    assert [r.name for r in index.referencing(["x"])] == ["anonymous", "calt"]
+    assert [r.name for r in index.referencing(["x"], dependents=False)] == ["anonymous"]
+    assert font.features.glyph_references(font) is index
+    font.features.features[0] = ("liga", "    sub f f by a;")
+    assert font.features.glyph_references(font) is not index
+
+
+def test_drop_unexported_warns(caplog):
+    font = _font()
+    font.glyphs["f_i"].exported = False
+    with caplog.at_level(logging.WARNING):
+        drop_unexported_glyphs(font, {})
+    assert "f_i" in font.glyphs
+    assert "used in feature liga" in caplog.text
+
+
+def test_drop_unexported_fixup_touches_affected_blocks():
+    font = _font()
+    font.features.prefixes["anonymous"] = "lookup drop_x {\n    sub x by  y;\n} drop_x;"
+    liga = font.features.features[0]
+    font.glyphs["x"].exported = False
+    font.glyphs["e"].exported = False
+    drop_unexported_glyphs(font, {"force": True})
+    assert "x" not in font.glyphs
+    assert font.features.classes["vowels"] == ["a"]
+    assert font.features.features[0] is liga
+    # The emptied lookup and the reference to it are both gone
+    assert "drop_x" not in font.features.to_fea()
+    assert "sub a by c;" in font.features.features[1][1]
+
+
+def test_rename_touches_affected_blocks():
+    font = _font()
+    ss01 = font.features.features[2]
+    rename_glyphs(font, {"mapping": {"f_i": "fi", "e": "e.alt"}})
+    assert font.features.classes["vowels"] == ["a", "e.alt"]
+    assert "sub f i by fi;" in font.features.features[0][1]
+    assert font.features.features[2] is ss01
+    assert "fi" in font.glyphs
+
+
+def test_rename_everywhere():
+    font = _font()
+    font.glyphs["c"].layers[0].shapes.append(Shape(ref="e", transform=Transform()))
+    master = font.masters[0]
+    master.kerning = {("a", "e"): -10, ("@vowels", "x"): 5}
+    font.first_kern_groups = {"round": ["e", "c"], "straight": ["x"]}
+    straight = font.first_kern_groups["straight"]
+    rename_glyphs(font, {"mapping": {"e": "e.alt", "c": "c", "missing": "other"}})
+    assert list(font.glyphs.keys()) == ["a", "c", "e.alt", "f", "i", "f_i", "x", "y"]
+    assert font.glyphs["e.alt"].name == "e.alt"
+    assert font.glyphs["c"].layers[0].components[0].ref == "e.alt"
+    assert master.kerning == {("a", "e.alt"): -10, ("@vowels", "x"): 5}
+    assert font.first_kern_groups["round"] == ["e.alt", "c"]
+    assert font.first_kern_groups["straight"] is straight
+
+
+def test_rename_collision():
+    font = _font()
+    with pytest.raises(ValueError, match="two glyphs the name c"):
+        rename_glyphs(font, {"mapping": {"a": "c"}})
+    assert "a" in font.glyphs and font.glyphs["a"].name == "a"
+
+    # Nothing referring to the glyph was changed either
+    add_glyph(font, "ae", m400={"shapes": [Shape(ref="a"), Shape(ref="e")]})
+    font.masters[0].kerning = {("a", "c"): -10}
+    font.first_kern_groups = {"round": ["a", "c"]}
+    fea = font.features.to_fea()
+    with pytest.raises(ValueError):
+        rename_glyphs(font, {"mapping": {"a": "c"}})
+    assert font.glyphs["ae"].layers[0].components[0].ref == "a"
+    assert font.masters[0].kerning == {("a", "c"): -10}
+    assert font.first_kern_groups == {"round": ["a", "c"]}
+    assert font.features.to_fea() == fea
+
+
+def test_rename_glyphs_parameter_swaps():
+    font = _font()
+    font.glyphs["a"].codepoints = [0x61]
+    font.glyphs["c"].codepoints = [0x63]
+    glyph_a, glyph_c = font.glyphs["a"], font.glyphs["c"]
+    font.masters[0].kerning = {("a", "x"): -10, ("c", "y"): 5}
+    _renameGlyphs(font, ["a=c", "c=e"])
+    # The glyphs swapped names, but the codepoints stay with the names
+    assert font.glyphs["e"] is glyph_a
+    assert font.glyphs["a"] is glyph_c
+    assert font.glyphs["a"].codepoints == [0x61]
+    assert font.glyphs["c"].codepoints == [0x63]
+    assert font.masters[0].kerning == {("e", "x"): -10, ("a", "y"): 5}
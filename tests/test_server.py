@@ -0,0 +1,200 @@
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from context.BaseObject import DIRTY_CANVAS_RENDER, DIRTY_FILE_SAVING
+from context.server import (
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    FontServer,
+    serve,
+)
+
+
+@pytest.fixture
+def source(mark_font, tmp_path):
+    path = tmp_path / "Test.babelfont"
+    mark_font.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def server():
+    return FontServer()
+
+
+def call(server, method, **params):
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    response = json.loads(server.handle(json.dumps(request).encode()))
+    assert response["id"] == 1
+    return response
+
+
+def result(server, method, **params):
+    response = call(server, method, **params)
+    assert "error" not in response, response["error"]
+    return response["result"]
+
+
+def touch(path):
+    # Make sure the modification time changes, however coarse the clock
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_queries(server, source):
+    summary = result(server, "open", path=source)
+    assert summary["glyphs"] == 6
+    assert len(summary["masters"]) == 2
+
+    glyphs = result(server, "glyphs", path=source)
+    assert [g["name"] for g in glyphs][:2] == ["A", "B"]
+
+    glyph = result(server, "glyph", path=source, name="A")
+    assert glyph["glyph"]["codepoints"] == [0x41]
+    assert [layer["width"] for layer in glyph["layers"]] == [600, 700]
+    assert result(server, "fonts") == [source]
+
+
+def test_errors(server, source):
+    assert call(server, "nope")["error"]["code"] == METHOD_NOT_FOUND
+    assert call(server, "glyph", path=source)["error"]["code"] == INVALID_PARAMS
+    assert (
+        "No glyph" in call(server, "glyph", path=source, name="Z")["error"]["message"]
+    )
+
+    response = json.loads(server.handle(b"{not json"))
+    assert response["error"]["code"] == PARSE_ERROR
+
+    # Notifications are not answered
+    assert server.handle(b'{"jsonrpc": "2.0", "method": "fonts"}') is None
+
+
+def test_changes(server, source):
+    result(server, "open", path=source)
+    result(server, "changes", path=source)
+    assert result(server, "changes", path=source)["glyphs"] == {}
+
+    server.fonts[source].font.glyphs["B"].layers[0].width = 650
+    changes = result(server, "changes", path=source)
+    assert list(changes["glyphs"]) == ["B"]
+    assert [layer["width"] for layer in changes["glyphs"]["B"]["layers"]] == [650]
+    # Reporting the changes cleared them, for this context only
+    assert result(server, "changes", path=source)["glyphs"] == {}
+    assert server.fonts[source].font.is_dirty(DIRTY_FILE_SAVING)
+
+    response = call(server, "changes", path=source, context=DIRTY_FILE_SAVING)
+    assert response["error"]["code"] == INVALID_PARAMS
+
+
+def test_filter_and_save(server, source, tmp_path):
+    result(server, "open", path=source)
+    result(server, "filter", path=source, filters=["zeroMarkWidths"])
+    output = str(tmp_path / "Out.babelfont")
+    assert result(server, "save", path=source, output=output) == output
+    assert result(server, "open", path=output)["glyphs"] == 6
+
+    response = call(server, "filter", path=source, filters=["noSuchFilter"])
+    assert "error" in response
+
+
+def test_reload_changed_glyph(server, source):
+    result(server, "open", path=source)
+    font = server.fonts[source].font
+    glyph_a, glyph_b = font.glyphs["A"], font.glyphs["B"]
+    glyph_b.layers[0].width = 650
+    result(server, "changes", path=source)
+
+    filename = os.path.join(source, glyph_a.babelfont_filename)
+    with open(filename) as fh:
+        layers = json.load(fh)
+    layers[0]["width"] = 555
+    with open(filename, "w") as fh:
+        json.dump(layers, fh)
+    touch(filename)
+
+    assert result(server, "reload", path=source) == ["A"]
+    # Only the glyph read again has changed, and the rest were kept
+    assert server.fonts[source].font is font
+    assert font.glyphs["A"] is glyph_a
+    assert glyph_a.layers[0].width == 555
+    assert glyph_a.layers[0]._glyph is glyph_a
+    assert glyph_b.layers[0].width == 650
+    assert not glyph_a.is_dirty(DIRTY_FILE_SAVING)
+    changes = result(server, "changes", path=source, context=DIRTY_CANVAS_RENDER)
+    assert list(changes["glyphs"]) == ["A"]
+
+    assert result(server, "reload", path=source) == []
+
+
+def test_reload_changed_font(server, source):
+    result(server, "open", path=source)
+    font = server.fonts[source].font
+    touch(os.path.join(source, "info.json"))
+    assert len(result(server, "reload", path=source)) == 6
+    assert server.fonts[source].font is not font
+
+
+def test_socket(source, tmp_path):
+    path = str(tmp_path / "context.sock")
+    thread = threading.Thread(target=serve, args=(path,))
+    thread.start()
+    try:
+        for _ in range(500):
+            if os.path.exists(path):
+                break
+            thread.join(0.01)
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(path)
+            stream = client.makefile("rwb")
+            for ix, (method, params) in enumerate(
+                [("open", {"path": source}), ("shutdown", {})]
+            ):
+                request = {"jsonrpc": "2.0", "id": ix, "method": method}
+                stream.write(json.dumps(dict(request, params=params)).encode() + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+                assert response["id"] == ix
+                assert "result" in response
+    finally:
+        thread.join(5)
+    assert not thread.is_alive()
+    assert not os.path.exists(path)
+
+
+def test_socket_path_in_use(tmp_path):
+    path = tmp_path / "context.sock"
+    path.write_text("not a socket")
+    with pytest.raises(FileExistsError):
+        serve(str(path))
+    assert path.read_text() == "not a socket"
+    path.unlink()
+
+    # A socket nobody listens on is replaced, one in use is not
+    with socket.socket(socket.AF_UNIX) as stale:
+        stale.bind(str(path))
+    with socket.socket(socket.AF_UNIX) as running:
+        running.bind(str(tmp_path / "running.sock"))
+        running.listen()
+        with pytest.raises(FileExistsError):
+            serve(str(tmp_path / "running.sock"))
+    thread = threading.Thread(target=serve, args=(str(path),))
+    thread.start()
+    try:
+        for _ in range(500):
+            with socket.socket(socket.AF_UNIX) as client:
+                try:
+                    client.connect(str(path))
+                except OSError:
+                    thread.join(0.01)
+                    continue
+                client.sendall(b'{"jsonrpc": "2.0", "id": 1, "method": "shutdown"}\n')
+                assert b'"result":true' in client.makefile("rb").readline()
+                break
+    finally:
+        thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,58 @@
+import pytest
+from fontTools.pens.recordingPen import RecordingPen
+
+from context import load, stats
+from context.Features import Features
+from context.Layer import Layer
+
+
+@pytest.fixture
+def recording():
+    stats.reset()
+    stats.enable()
+    yield
+    stats.disable()
+    stats.reset()
+
+
+def test_counts_and_times(mark_font, tmp_path, recording):
+    mark_font.default_master
+    mark_font.default_master
+    layer = mark_font.masters[0].get_glyph_layer("A")
+    layer.draw(RecordingPen())
+    layer.width = 650
+    mark_font.features = Features.from_fea(
+        "feature ccmp { sub A acutecomb by B; } ccmp;"
+    )
+    mark_font.features.as_ast(mark_font, readonly=True)
+    mark_font.features.as_ast(mark_font, readonly=True)
+    path = str(tmp_path / "Test.babelfont")
+    mark_font.save(path)
+    load(path)
+
+    snapshot = stats.snapshot()
+    counters, timers = snapshot["counters"], snapshot["timers"]
+    assert counters["Font.default_master.miss"] == 1
+    assert counters["Font.default_master.hit"] >= 1
+    # The layer, then its glyph and the font, in three contexts
+    assert counters["mark_dirty"] >= 9
+    assert counters["mark_dirty.parent_hops"] >= 6
+    assert counters["features.blocks_parsed"] == 1
+    assert counters["features.blocks_reused"] == 1
+    assert counters["nodes.inflated"] == timers["Node.write"]["calls"] == 16
+    assert timers["Master.get_glyph_layer"]["calls"] >= 1
+    assert timers["Layer.draw"]["calls"] == 1
+    assert timers["Layer.drawPoints"]["calls"] == 1
+    assert timers["Features.as_ast"]["calls"] == 2
+
+
+def test_disabled_restores_methods(mark_font):
+    draw = Layer.__dict__["draw"]
+    stats.enable()
+    assert Layer.__dict__["draw"] is not draw
+    stats.disable()
+    assert Layer.__dict__["draw"] is draw
+    stats.reset()
+    mark_font.glyphs["A"].layers[0].width = 10
+    mark_font.default_master
+    assert stats.snapshot() == {"counters": {}, "timers": {}}
@@ -0,0 +1,125 @@
+import pytest
+
+from fontTools.misc.transform import Transform
+
+from context import Anchor, Features, Shape
+from context.BaseObject import DIRTY_FILE_SAVING
+from context.fontFilters.rename import rename
+
+from conftest import add_glyph, make_font, square
+
+FEA = """
+@vowels = [a e];
+@tails = [y z];
+lookup ys {
+    sub x by y;
+} ys;
+feature liga {
+    sub f i by f_i;
+} liga;
+feature calt {
+    sub a' lookup ys x;
+    sub @vowels by c;
+} calt;
+feature ss01 {
+    sub i by z;
+    pos @tails 10;
+} ss01;
+"""
+
+
+def _font():
+    font = make_font()
+    add_glyph(font, ".notdef", m400={})
+    for ix, name in enumerate(["a", "c", "e", "f", "i", "f_i", "x", "y", "z"]):
+        codepoints = [ord(name)] if len(name) == 1 else None
+        add_glyph(font, name, codepoints=codepoints, m400={"width": 100 + ix})
+    add_glyph(
+        font,
+        "aacute",
+        codepoints=[0xE1],
+        m400={
+            "shapes": [Shape(ref="a"), Shape(ref="acutecomb", transform=Transform())]
+        },
+    )
+    add_glyph(font, "acutecomb", category="mark", m400={"anchors": [("_top", 0, 0)]})
+    font.features = Features.from_fea(FEA)
+    font.first_kern_groups = {"vowels": ["a", "e"], "tails": ["y", "z"]}
+    font.masters[0].kerning = {
+        ("a", "c"): -10,
+        ("@vowels", "x"): -20,
+        ("@tails", "a"): -30,
+        ("f", "f_i"): -40,
+    }
+    return font
+
+
+def test_closure():
+    font = _font()
+    subset = font.subset(unicodes=[0xE1])
+    # Components, and everything substituted for them
+    assert list(subset.glyphs.keys()) == [".notdef", "a", "c", "aacute", "acutecomb"]
+    subset = font.subset(glyphs=["f", "i"])
+    assert list(subset.glyphs.keys()) == [".notdef", "f", "i", "f_i", "z"]
+    with pytest.raises(ValueError):
+        font.subset(glyphs=["nope"])
+
+
+def test_subset_font():
+    font = _font()
+    subset = font.subset(glyphs=["e"], unicodes=[ord("x")])
+    # y may be substituted for x, so it is kept, and its kern group with it
+    assert list(subset.glyphs.keys()) == [".notdef", "c", "e", "x", "y"]
+    assert subset.unicode_map[ord("e")] == "e"
+    assert ord("a") not in subset.unicode_map
+
+    assert subset.first_kern_groups == {"vowels": ["e"], "tails": ["y"]}
+    assert subset.masters[0].kerning == {("@vowels", "x"): -20}
+    assert subset.features.classes["vowels"] == ["e"]
+    assert subset.features.features[0] == ("calt", "    sub e by c;\n")
+    assert [tag for tag, _ in subset.features.features] == ["calt", "ss01"]
+    # The original is untouched
+    assert len(font.glyphs) == 12
+    assert len(font.masters[0].kerning) == 4
+    assert len(font.features.features) == 3
+
+
+def test_subset_shares_objects():
+    font = _font()
+    subset = font.subset(glyphs=["aacute"])
+    glyph, layer = subset.glyphs["aacute"], subset.glyphs["aacute"].layers[0]
+    original = font.glyphs["aacute"]
+    assert glyph is not original
+    assert layer._font is subset and layer._glyph is glyph
+    assert layer.shapes[0] is not original.layers[0].shapes[0]
+    assert layer.shapes[0].component_layer._font is subset
+    assert subset.masters[0].font is subset
+    assert subset.masters[0].name is font.masters[0].name
+    assert subset.names.familyName is font.names.familyName
+    assert layer.master is subset.masters[0]
+
+    # Changes to the subset's own objects stay there
+    font.mark_clean(DIRTY_FILE_SAVING, recursive=True)
+    glyph.codepoints = [0xC1]
+    layer.width = 500
+    assert subset.unicode_map[0xC1] == "aacute"
+    assert 0xC1 not in font.unicode_map
+    layer.shapes[1].transform = Transform().translate(10, 0)
+    layer.anchors.append(Anchor(name="top", x=0, y=0))
+    assert original.layers[0].width == 0
+    assert original.layers[0].shapes[1].transform == Transform()
+    assert not original.layers[0].anchors
+    assert not font.is_dirty(DIRTY_FILE_SAVING)
+
+
+def test_rename_subset():
+    font = _font()
+    font.glyphs["a"].layers[0].shapes.append(square(0, 0, 100))
+    subset = font.subset(glyphs=["aacute"])
+    rename(subset, {"a": "uni0061"})
+    assert subset.glyphs["aacute"].layers[0].shapes[0].ref == "uni0061"
+    assert font.glyphs["aacute"].layers[0].shapes[0].ref == "a"
+    assert "a" in font.glyphs and "uni0061" not in font.glyphs
+    # The outlines are shared
+    new_path = subset.glyphs["uni0061"].layers[0].shapes[0]
+    assert new_path.nodes is font.glyphs["a"].layers[0].shapes[0].nodes
@@ -0,0 +1,76 @@
+import json
+import sys
+
+import pytest
+
+from context import __main__ as cli
+from context import trace
+
+
+def test_spans_off_by_default():
+    with trace.span("Nothing") as args:
+        args["ignored"] = True
+    assert not trace.enabled()
+    assert trace.stop() == []
+
+
+def test_nested_spans():
+    trace.start()
+    with trace.span("Outer", glyphs=3):
+        with trace.span("Inner") as args:
+            args["cached"] = True
+    events = [e for e in trace.stop() if e["ph"] == "X"]
+    inner, outer = events
+    assert (inner["name"], outer["name"]) == ("Inner", "Outer")
+    assert inner["args"]["cached"] and outer["args"]["glyphs"] == 3
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_cli_trace(mark_font, tmp_path, monkeypatch):
+    source = str(tmp_path / "In.babelfont")
+    mark_font.save(source)
+    trace_file = tmp_path / "trace.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "context",
+            "--trace",
+            str(trace_file),
+            "--filter",
+            "zeroMarkWidths",
+            "--filter",
+            "zeroBackgroundWidths",
+            source,
+            str(tmp_path / "Out.ttf"),
+        ],
+    )
+    with pytest.raises(SystemExit) as e:
+        cli.main()
+    assert e.value.code == 0
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    for name in ("Load", "Parse JSON", "Inflate objects", "Save", "Compile"):
+        assert name in spans
+    fused = spans["Filter zeroMarkWidths, zeroBackgroundWidths"]
+    assert fused["args"]["glyphs"] == len(mark_font.glyphs)
+    if trace.resource is not None:
+        assert spans["Load"]["args"]["peak_rss_mb"] > 0
+
+
+@pytest.mark.parametrize("option, jobs", [([], 1), (["-j", "0"], None)])
+def test_cli_jobs(mark_font, tmp_path, monkeypatch, option, jobs):
+    # One process unless more are asked for
+    source = str(tmp_path / "In.babelfont")
+    mark_font.save(source)
+    seen = []
+    monkeypatch.setattr(
+        cli, "run_filters", lambda font, filters, jobs: seen.append(jobs)
+    )
+    argv = ["context", *option, source, str(tmp_path / "Out.babelfont")]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as e:
+        cli.main()
+    assert e.value.code == 0
+    assert seen == [jobs]
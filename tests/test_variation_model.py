@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import make_font
+
+
+def test_model_is_cached():
+    font = make_font((400, 900))
+    model = font.variation_model()
+    assert font.variation_model() is model
+    assert font.masters[1].normalized_location == {"wght": 1.0}
+
+
+def test_model_rebuilt_on_change():
+    font = make_font((400, 900))
+    model = font.variation_model()
+    font.axes[0].max = 1000
+    font.masters[1].location = {"wght": 1000}
+    assert font.variation_model() is not model
+    assert font.masters[1].normalized_location == {"wght": 1.0}
+
+    model = font.variation_model()
+    font.masters[1].location["wght"] = 700
+    assert font.variation_model() is not model
+    assert font.masters[1].normalized_location == {"wght": 0.5}
+
+
+def test_interpolate():
+    font = make_font((400, 900, 100))
+    assert font.interpolate([10, 20, 0], {"wght": 400}) == 10
+    assert font.interpolate([10, 20, 0], {"wght": 650}) == pytest.approx(15)
+    assert font.interpolate([10, 20, 0], {"wght": 250}) == pytest.approx(5)
+    assert font.interpolate([10, 20, 0], {}) == 10
+
+
+def test_scalars_cached_per_location():
+    font = make_font((400, 900))
+    scalars = font.variation_scalars({"wght": 650})
+    assert scalars == [1.0, 0.5]
+    assert font.variation_scalars({"wght": 650}) is scalars